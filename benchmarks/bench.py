@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+
+"""
+Latency benchmarks for the note scripts over synthetic daily notes and thought logs.
+
+Every operation is timed two ways: end to end, by running the script as a
+subprocess the way Raycast does (peak memory is the child's max RSS), and
+in-process, by calling the shared helper modules directly (peak memory is the
+traced Python allocation peak). `open`, Zed, TimerPRO and Todoist are stubbed the same way
+tests/thought_log_now.test.py stubs Zed, so nothing outside the temp directory
+is touched.
+
+Usage:
+    python3 benchmarks/bench.py [--sizes 10K,1M,10M,50M] [--runs 15]
+                                [--save-baseline [FILE]] [--baseline FILE]
+
+Timings depend on the machine, so no baseline ships with the repo. Record one
+with --save-baseline, which writes benchmarks/baseline.json by default, and
+commit it; later runs compare against it and exit 1 on regressions.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+DEFAULT_SIZES = "10K,1M,10M,50M"
+REGRESSION_THRESHOLD = 0.20
+UNITS = {"K": 1024, "M": 1024 * 1024}
+
+
+class StubTodoist(BaseHTTPRequestHandler):
+    """Answers Todoist Sync and REST calls as if every command succeeded."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"] or 0)).decode()
+        if self.path.endswith("/sync"):
+            commands = json.loads(parse_qs(body)["commands"][0])
+            reply = {
+                "sync_status": {command["uuid"]: "ok" for command in commands},
+                "temp_id_mapping": {},
+            }
+        else:
+            reply = {"id": "1"}
+        data = json.dumps(reply).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def parse_size(text):
+    """
+    Parse a size such as "10K" or "50M" into bytes.
+    """
+    text = text.strip().upper()
+    if text[-1] in UNITS:
+        return int(float(text[:-1]) * UNITS[text[-1]])
+    return int(text)
+
+
+def make_daily_note(size):
+    """
+    Build a daily note of roughly the given size with now, later and done sections.
+
+    The now and later sections hold a handful of tasks; the done section holds
+    the bulk of the bytes, as it does in a long-lived note.
+    """
+    now = "".join(f"now task {i}\n" for i in range(5))
+    later = "".join(f"later task {i}\n\n" for i in range(20))
+    head = f"now\n---\n{now}\nlater\n---\n{later}done\n---\n"
+    line = "finished a synthetic task - 1-01-20 9:15 AM\n"
+    count = max(0, (size - len(head)) // len(line))
+    return head + line * count
+
+
+def make_thought_log(size, leading_empty_timestamps=2):
+    """
+    Build a newest-first thought log of roughly the given size.
+
+    The newest day is not today and starts with empty timestamps, so
+    thought_log_now.py exercises its previous-day cleanup.
+    """
+    sections = ["1-01-20\n---\n" + "5:00 PM - \n\n\n" * leading_empty_timestamps]
+    entry = "3:00 PM - a synthetic thought about nothing in particular\n\n\n"
+    # Spread the size over about three years of days, as a real log would be.
+    entries_per_day = max(5, size // (3 * 365 * len(entry)))
+    total = len(sections[0])
+    day = date(2019, 12, 31)
+    while total < size:
+        section = f"{day.month}-{day:%d-%y}\n---\n" + entry * entries_per_day
+        sections.append(section)
+        total += len(section)
+        day -= timedelta(days=1)
+    return "".join(sections)
+
+
+def write_stub(path, body):
+    path.write_text("#!/bin/sh\n" + body)
+    path.chmod(0o755)
+
+
+def start_stub_todoist():
+    """
+    Start the stub Todoist server and return (server, base URL).
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubTodoist)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def build_environment(root, todoist_url):
+    """
+    Return the environment for end-to-end runs, with every external app stubbed.
+    """
+    bin_dir = root / "bin"
+    bin_dir.mkdir(exist_ok=True)
+    for name in ("open", "zed", "timerpro", "pgrep", "pkill", "td", "osascript"):
+        write_stub(bin_dir / name, "exit 0\n")
+    # pgrep must report "not running" so now-task.py does not try to quit anything.
+    write_stub(bin_dir / "pgrep", "exit 1\n")
+
+    environment = os.environ.copy()
+    environment.update(
+        {
+            "PATH": f"{bin_dir}{os.pathsep}{os.environ['PATH']}",
+            "DAILY_NOTES_PATH": str(root),
+            "THOUGHT_LOG_PATH": str(root / "thought log.txt"),
+            "NOTE_SCRIPTS_STATE_DIR": str(root / "state"),
+            "NOTE_DAEMON_DISABLE": "1",
+            "ZED_CLI": str(bin_dir / "zed"),
+            "TIMERPRO_BINARY": str(bin_dir / "timerpro"),
+            "TODOIST_API_URL": todoist_url,
+            "TODOIST_API_TOKEN": "benchmark",
+        }
+    )
+    return environment
+
+
+def run_child(argv, environment):
+    """
+    Run one script and return (seconds, peak RSS in bytes).
+    """
+    started = time.perf_counter()
+    child = subprocess.Popen(
+        argv, env=environment, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    _, status, usage = os.wait4(child.pid, 0)
+    elapsed = time.perf_counter() - started
+    child.returncode = os.waitstatus_to_exitcode(status)
+    if child.returncode != 0:
+        raise RuntimeError(f"{argv[1]} exited {child.returncode}: {child.stderr.read().decode()}")
+    child.stderr.close()
+    # ru_maxrss is kilobytes on Linux and bytes on macOS.
+    scale = 1 if sys.platform == "darwin" else 1024
+    return elapsed, usage.ru_maxrss * scale
+
+
+def end_to_end_operations():
+    """
+    Return (name, file kind, argv) for every script-level operation.
+    """
+    return [
+        ("add now", "note", ["now-task.py", "benchmark task", "25"]),
+        ("pop now to done", "note", ["done-task.py"]),
+        ("add later top", "note", ["later-task.py", "benchmark task"]),
+        ("add later bottom", "note", ["later-task.py", "benchmark task -b"]),
+        ("thought log entry", "log", ["thought_log_entry.py", "benchmark thought"]),
+        ("thought log now", "log", ["thought_log_now.py"]),
+    ]
+
+
+def in_process_operations(environment):
+    """
+    Return (name, file kind, function(path)) for the helper-module operations.
+    """
+    import contextlib
+    import runpy
+
+    import daily_note
+    import thought_log_store
+
+    def add_now(path):
+        section = daily_note.index_sections(path)["now"]
+        daily_note.apply_edits(
+            path, [daily_note.Edit(section.start_byte, section.start_byte, "task\n")]
+        )
+
+    def pop_now(path):
+        section = daily_note.index_sections(path)["now"]
+        _, start, line = next(
+            item for item in daily_note.read_section_lines(path, section) if item[2].strip()
+        )
+        end_of_file = os.path.getsize(path)
+        daily_note.apply_edits(
+            path,
+            [
+                daily_note.Edit(*daily_note.line_range(start, line), "\n"),
+                daily_note.Edit(end_of_file, end_of_file, f"{line.strip()} - 1-01-20 9:15 AM\n"),
+            ],
+        )
+
+    def add_later(path, bottom):
+        section = daily_note.index_sections(path)["later"]
+        offset = section.end_byte if bottom else section.start_byte
+        daily_note.apply_edits(path, [daily_note.Edit(offset, offset, "task\n\n")])
+
+    def thought_entry(path):
+        thought_log_store.rewrite_head(path, lambda head: "1-02-20\n---\n9:00 AM - x\n\n\n" + head)
+
+    def thought_now(path):
+        # The previous-day cleanup lives in the script itself, so it is run
+        # the way the note daemon runs it, with the log at THOUGHT_LOG_PATH.
+        saved_argv, saved_env = sys.argv, dict(os.environ)
+        os.environ.update(environment, THOUGHT_LOG_PATH=path)
+        sys.argv = [str(ROOT / "thought_log_now.py")]
+        try:
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                runpy.run_path(sys.argv[0], run_name="__main__")
+        finally:
+            sys.argv = saved_argv
+            os.environ.clear()
+            os.environ.update(saved_env)
+
+    return [
+        ("add now", "note", add_now),
+        ("pop now to done", "note", pop_now),
+        ("add later top", "note", lambda path: add_later(path, False)),
+        ("add later bottom", "note", lambda path: add_later(path, True)),
+        ("thought log entry", "log", thought_entry),
+        ("thought log now", "log", thought_now),
+    ]
+
+
+def summarize(samples, peaks):
+    """
+    Return p50/p95 in milliseconds and the peak memory in megabytes.
+    """
+    ordered = sorted(samples)
+    p95_index = min(len(ordered) - 1, round(0.95 * (len(ordered) - 1)))
+    return {
+        "p50_ms": round(statistics.median(ordered) * 1000, 2),
+        "p95_ms": round(ordered[p95_index] * 1000, 2),
+        "peak_mb": round(max(peaks) / (1024 * 1024), 1),
+    }
+
+
+def run_benchmarks(sizes, runs):
+    """
+    Time every operation at every size and return results keyed by
+    "mode | operation | size".
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        root = Path(directory)
+        server, todoist_url = start_stub_todoist()
+        environment = build_environment(root, todoist_url)
+        os.environ["NOTE_SCRIPTS_STATE_DIR"] = environment["NOTE_SCRIPTS_STATE_DIR"]
+        note_path = root / f"{datetime.now():%-m-%d-%y}.txt"
+        log_path = root / "thought log.txt"
+        templates = {"note": root / "note.template", "log": root / "log.template"}
+        targets = {"note": note_path, "log": log_path}
+
+        try:
+            for size in sizes:
+                templates["note"].write_text(make_daily_note(size))
+                templates["log"].write_text(make_thought_log(size))
+                label = f"{size // 1024}K" if size < 1024 * 1024 else f"{size // (1024 * 1024)}M"
+
+                for name, kind, argv in end_to_end_operations():
+                    samples, peaks = [], []
+                    for _ in range(runs):
+                        shutil.copyfile(templates[kind], targets[kind])
+                        elapsed, peak = run_child(
+                            [sys.executable, str(ROOT / argv[0]), *argv[1:]], environment
+                        )
+                        samples.append(elapsed)
+                        peaks.append(peak)
+                    results[f"end-to-end | {name} | {label}"] = summarize(samples, peaks)
+                    print_result(f"end-to-end | {name} | {label}", results)
+
+                for name, kind, function in in_process_operations(environment):
+                    samples = []
+                    for _ in range(runs):
+                        shutil.copyfile(templates[kind], targets[kind])
+                        started = time.perf_counter()
+                        function(str(targets[kind]))
+                        samples.append(time.perf_counter() - started)
+
+                    # Python allocations are traced in a separate run so the
+                    # tracing overhead does not skew the timings.
+                    shutil.copyfile(templates[kind], targets[kind])
+                    tracemalloc.start()
+                    function(str(targets[kind]))
+                    peaks = [tracemalloc.get_traced_memory()[1]]
+                    tracemalloc.stop()
+                    results[f"in-process | {name} | {label}"] = summarize(samples, peaks)
+                    print_result(f"in-process | {name} | {label}", results)
+        finally:
+            server.shutdown()
+            server.server_close()
+    return results
+
+
+def print_result(key, results):
+    result = results[key]
+    print(
+        f"{key:<45} p50 {result['p50_ms']:>9.2f} ms   p95 {result['p95_ms']:>9.2f} ms"
+        f"   peak {result['peak_mb']:>7.1f} MB",
+        flush=True,
+    )
+
+
+def compare_to_baseline(results, baseline, threshold):
+    """
+    Return a line for every result whose p50 regressed past the threshold.
+    """
+    regressions = []
+    for key, result in results.items():
+        previous = baseline.get(key)
+        if not previous or previous["p50_ms"] <= 0:
+            continue
+        change = result["p50_ms"] / previous["p50_ms"] - 1
+        if change > threshold:
+            regressions.append(
+                f"{key}: p50 {previous['p50_ms']} -> {result['p50_ms']} ms (+{change:.0%})"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated file sizes")
+    parser.add_argument("--runs", type=int, default=15, help="samples per operation")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument(
+        "--save-baseline",
+        type=Path,
+        nargs="?",
+        const=DEFAULT_BASELINE,
+        metavar="FILE",
+        help=f"record this run as the baseline (default {DEFAULT_BASELINE.name})",
+    )
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+
+    sizes = [parse_size(size) for size in args.sizes.split(",")]
+    results = run_benchmarks(sizes, args.runs)
+
+    if args.save_baseline:
+        args.save_baseline.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+        print(f"Saved baseline to {args.save_baseline}")
+    elif args.baseline.exists():
+        regressions = compare_to_baseline(
+            results, json.loads(args.baseline.read_text()), args.threshold
+        )
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}")
+    else:
+        print(
+            f"No baseline at {args.baseline}; record one on this machine with "
+            "`python3 benchmarks/bench.py --save-baseline` and commit it."
+        )
+
+
+if __name__ == "__main__":
+    main()
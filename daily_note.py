@@ -0,0 +1,387 @@
+"""
+Daily note helpers shared by the task scripts.
+
+A section is a heading line followed by a "---" line, for example "now",
+"later" or "done". The note is tokenized once into a table of sections, and the
+table is cached in a sidecar file keyed by the note's path, mtime and size so
+repeat calls against an unchanged note skip the parse; the cached headings are
+checked against the file before the table is trusted.
+"""
+
+import json
+import os
+import re
+from datetime import datetime
+from typing import NamedTuple
+
+import note_trace
+from note_files import copy_range, locked, open_note, pending_contents, replace_file
+from note_state import state_path
+
+DAILY_NOTES_PATH = os.environ.get(
+    "DAILY_NOTES_PATH", "/Users/colin/Dropbox (Maestral)/Daily Notes"
+)
+SECTION_CACHE_FILE = "section-index.json"
+SECTION_CACHE_ENTRIES = 16
+# How far before a section body to look for its heading and "---" lines.
+HEADING_PROBE_BYTES = 256
+# A done-section line: "task - M-DD-YY H:MM AM".
+COMPLETION_PATTERN = re.compile(r"^(.*?) - (\d{1,2}-\d{2}-\d{2} \d{1,2}:\d{2} [AP]M)\s*$")
+
+# Parsed tables kept for the life of the process (the note daemon keeps these warm).
+_section_tables = {}
+
+
+class Section(NamedTuple):
+    """
+    Location of one section's body, excluding its heading and "---" lines.
+
+    Line numbers are zero-based indices into readlines(); byte offsets are
+    positions in the file. Both ranges are half-open.
+    """
+
+    name: str
+    heading_line: int
+    start_line: int
+    end_line: int
+    start_byte: int
+    end_byte: int
+
+
+class Edit(NamedTuple):
+    """
+    Replace the bytes in [start, end) with text. Inserts have start == end.
+    """
+
+    start: int
+    end: int
+    text: str
+
+
+def get_daily_note_path():
+    """
+    Returns the path to the daily note file based on the current date.
+
+    Returns:
+        str: The path to the daily note file.
+    """
+    return os.path.join(DAILY_NOTES_PATH, daily_note_filename(datetime.now()))
+
+
+def daily_note_filename(day):
+    """
+    Returns the daily note file name for a date, for example "3-07-25.txt".
+
+    Args:
+        day (date): The note's date.
+
+    Returns:
+        str: The file name, without a directory.
+    """
+    return f"{day.strftime('%-m-%d-%y')}.txt"
+
+
+def parse_daily_note_filename(filename: str):
+    """
+    Returns the date a daily note file name stands for.
+
+    Args:
+        filename (str): A file name such as "3-07-25.txt".
+
+    Returns:
+        date: The note's date, or None if the name is not a daily note's.
+    """
+    stem, extension = os.path.splitext(filename)
+    if extension != ".txt":
+        return None
+    try:
+        day = datetime.strptime(stem, "%m-%d-%y").date()
+    except ValueError:
+        return None
+    # Only names get_daily_note_path would produce; "03-07-25" is not one.
+    return day if daily_note_filename(day) == filename else None
+
+
+def split_tasks(text: str):
+    """
+    Split pasted input into task names, one per line or semicolon.
+
+    Args:
+        text (str): One task, or several separated by newlines or ";".
+
+    Returns:
+        list: The non-empty task names, stripped, in their original order.
+    """
+    return [task.strip() for task in text.replace(";", "\n").splitlines() if task.strip()]
+
+
+def format_completed_task(task_name: str, completed_at=None):
+    """
+    Return the done-section line for a completed task.
+
+    Args:
+        task_name (str): The name of the completed task.
+        completed_at (datetime): When it was completed; defaults to now.
+
+    Returns:
+        str: The task name and timestamp, ending in a newline.
+    """
+    timestamp = (completed_at or datetime.now()).strftime("%-m-%d-%y %-I:%M %p")
+    return f"{task_name} - {timestamp}\n"
+
+
+def parse_completed_task(line: str):
+    """
+    Split a done-section line written by format_completed_task.
+
+    Returns:
+        tuple: (task name, completion datetime), or None for any other line.
+    """
+    match = COMPLETION_PATTERN.match(line)
+    if match is None:
+        return None
+    try:
+        completed_at = datetime.strptime(match.group(2), "%m-%d-%y %I:%M %p")
+    except ValueError:
+        return None
+    return match.group(1), completed_at
+
+
+def parse_sections(data: bytes):
+    """
+    Walk the note once and build its section table.
+
+    Args:
+        data (bytes): The raw contents of the note.
+
+    Returns:
+        dict: Lowercased heading text mapped to its Section. If a heading
+        appears twice, the first occurrence wins.
+    """
+    lines = data.splitlines(keepends=True)
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line))
+
+    headings = [
+        i
+        for i in range(len(lines) - 1)
+        if lines[i].strip() and lines[i + 1].strip() == b"---"
+    ]
+
+    sections = {}
+    for position, heading in enumerate(headings):
+        end_line = headings[position + 1] if position + 1 < len(headings) else len(lines)
+        start_line = min(heading + 2, end_line)
+        name = lines[heading].strip().decode("utf-8", errors="replace").lower()
+        sections.setdefault(
+            name,
+            Section(
+                name,
+                heading,
+                start_line,
+                end_line,
+                offsets[start_line],
+                offsets[end_line],
+            ),
+        )
+    return sections
+
+
+def load_section_cache():
+    """
+    Read the sidecar section cache, returning an empty cache if it is unusable.
+    """
+    try:
+        with open(state_path(SECTION_CACHE_FILE), "r") as file:
+            cache = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def save_section_cache(cache):
+    """
+    Write the sidecar section cache, keeping only the most recent entries.
+    """
+    newest = sorted(cache.items(), key=lambda item: item[1]["mtime_ns"], reverse=True)
+    cache = dict(newest[:SECTION_CACHE_ENTRIES])
+    path = state_path(SECTION_CACHE_FILE)
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}")
+    with open(temp_path, "w") as file:
+        json.dump(cache, file)
+    os.replace(temp_path, path)
+
+
+def sections_still_match(file, sections):
+    """
+    Check that each section's heading and "---" lines still end where its
+    body starts.
+
+    A table cached by mtime and size alone would survive a same-size save
+    within one mtime tick, and edits at its offsets would land in the wrong
+    place; this catches any such save that moved a section.
+
+    Args:
+        file: The note, open for binary reading.
+        sections (dict): The table to check.
+
+    Returns:
+        bool: True if every heading is where the table says.
+    """
+    for section in sections.values():
+        start = max(0, section.start_byte - HEADING_PROBE_BYTES)
+        file.seek(start)
+        lines = file.read(section.start_byte - start).splitlines()
+        # Unless the probe reached the start of the file, its first line may be cut.
+        if len(lines) < (2 if start == 0 else 3):
+            return False
+        heading = lines[-2].strip().decode("utf-8", errors="replace").lower()
+        if lines[-1].strip() != b"---" or heading != section.name:
+            return False
+    return True
+
+
+def index_sections(note_path: str):
+    """
+    Return the section table for a note, parsing it only if it has changed.
+
+    A cached table is reused when the note's mtime and size match and its
+    headings are still where the table says.
+
+    Args:
+        note_path (str): The path to the daily note file.
+
+    Returns:
+        dict: Lowercased heading text mapped to its Section.
+
+    Raises:
+        FileNotFoundError: If the daily note file does not exist.
+    """
+    note_path = os.path.abspath(note_path)
+    pending = pending_contents(note_path)
+    if pending is not None:
+        # Buffered by write-behind; the file on disk is out of date.
+        return parse_sections(pending)
+
+    stat = os.stat(note_path)
+    key = [stat.st_mtime_ns, stat.st_size]
+
+    cache = None
+    cached = _section_tables.get(note_path)
+    if cached and cached[0] == key:
+        sections = cached[1]
+    else:
+        cache = load_section_cache()
+        entry = cache.get(note_path)
+        sections = None
+        if entry and [entry["mtime_ns"], entry["size"]] == key:
+            sections = {name: Section(*fields) for name, fields in entry["sections"].items()}
+
+    with open(note_path, "rb") as file:
+        if sections is None or not sections_still_match(file, sections):
+            # Key the entry on what was actually read, in case the note changed.
+            stat = os.fstat(file.fileno())
+            key = [stat.st_mtime_ns, stat.st_size]
+            file.seek(0)
+            data = file.read()
+            sections = parse_sections(data)
+            note_trace.count_bytes(read=len(data))
+            if cache is None:
+                cache = load_section_cache()
+            cache[note_path] = {
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "sections": {name: list(section) for name, section in sections.items()},
+            }
+            try:
+                save_section_cache(cache)
+            except OSError:
+                pass  # The cache is only an optimization.
+
+    _section_tables[note_path] = (key, sections)
+    return sections
+
+
+def read_section_lines(note_path: str, section: Section):
+    """
+    Read only the lines of one section's body.
+
+    Args:
+        note_path (str): The path to the daily note file.
+        section (Section): The section to read.
+
+    Returns:
+        list: (line_index, start_byte, line) tuples, with line endings kept.
+    """
+    with open_note(note_path) as file:
+        file.seek(section.start_byte)
+        data = file.read(section.end_byte - section.start_byte)
+    note_trace.count_bytes(read=len(data))
+
+    lines = []
+    offset = section.start_byte
+    for index, line in enumerate(data.splitlines(keepends=True), start=section.start_line):
+        lines.append((index, offset, line.decode()))
+        offset += len(line)
+    return lines
+
+
+def line_range(start_byte: int, line: str):
+    """
+    Return the byte range of a line read by read_section_lines, including its newline.
+    """
+    return start_byte, start_byte + len(line.encode())
+
+
+def apply_edits(note_path: str, edits, sections=None):
+    """
+    Apply byte-range edits to a note as one locked, atomic replace.
+
+    Only the tail from the earliest edit onward is read into memory and
+    patched; the bytes before it are copied into the new file in the kernel.
+    Inserts at the same offset are applied in the order given, before any
+    replacement that starts there.
+
+    Offsets must come from the file as it is now, so callers that read the
+    note to work out their edits should hold locked(note_path) around both.
+
+    Args:
+        note_path (str): The path to the daily note file.
+        edits (list): Edit tuples with offsets into the current file.
+        sections (dict, optional): The section table the offsets came from.
+            It is checked against the note under the lock before writing.
+
+    Raises:
+        ValueError: If two edits overlap, or the note no longer matches
+            sections.
+    """
+    edits = sorted(edits, key=lambda edit: (edit.start, edit.end))
+    if not edits:
+        return
+    for previous, edit in zip(edits, edits[1:]):
+        if edit.start < previous.end:
+            raise ValueError(f"Overlapping edits at byte {edit.start}")
+
+    first = edits[0].start
+    with locked(note_path), open_note(note_path) as source:
+        if sections is not None and not sections_still_match(source, sections):
+            raise ValueError(f"{note_path} changed while it was being edited; try again")
+        source.seek(first)
+        tail = source.read()
+
+        pieces = []
+        cursor = first
+        for edit in edits:
+            pieces.append(tail[cursor - first : edit.start - first])
+            pieces.append(edit.text.encode())
+            cursor = edit.end
+        pieces.append(tail[cursor - first :])
+        data = b"".join(pieces)
+
+        def write(destination):
+            copy_range(source, destination, 0, first)
+            destination.write(data)
+
+        written = replace_file(note_path, write)
+    note_trace.count_bytes(read=first + len(tail), written=written)
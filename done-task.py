@@ -14,45 +14,54 @@
 # @raycast.author masonc789
 # @raycast.authorURL https://raycast.com/masonc789
 
-import json
-import os
-import shutil
-import subprocess
-import sys
-import uuid
-from datetime import datetime
-from urllib.error import HTTPError, URLError
-from urllib.parse import quote, urlencode
-from urllib.request import Request, urlopen
+from note_daemon import forward_to_daemon
 
+if __name__ == "__main__":
+    forward_to_daemon(__file__)
 
-def get_daily_note_path():
-    """
-    Returns the path to the daily note file based on the current date.
+import contextlib
+import os
+import sys
 
-    Returns:
-        str: The path to the daily note file.
+import note_trace
+from daily_note import (
+    Edit,
+    apply_edits,
+    format_completed_task,
+    get_daily_note_path,
+    index_sections,
+    line_range,
+    read_section_lines,
+    split_tasks,
+)
+from note_files import locked, note_exists, note_size, replace_file
+from one_thing import remove_one_thing_task, set_one_thing_task
+
+# Set TODOIST_BACKGROUND=1 to return as soon as the completion is queued and let
+# a detached worker log it to Todoist.
+TODOIST_IN_BACKGROUND = os.environ.get("TODOIST_BACKGROUND") == "1"
+# Slack on top of Todoist's own delivery deadline for the token lookup and the
+# outbox write.
+TODOIST_WAIT_SLACK_SECONDS = 5
+
+
+def append_completed_tasks_to_daily_note(task_names: list, note_path: str):
     """
-    daily_note_directory = "/Users/colin/Dropbox (Maestral)/Daily Notes"
-    current_date = datetime.now().strftime("%-m-%d-%y")
-    daily_note_filename = f"{current_date}.txt"
-    return os.path.join(daily_note_directory, daily_note_filename)
+    Appends completed tasks and their timestamp to a daily note file in one write.
 
-
-def append_completed_task_to_daily_note(task_name: str, note_path: str):
-    """
-    Appends the name of a completed task and its timestamp to a daily note file.
+    If today's note doesn't exist yet, it is created with just these lines.
 
     Args:
-        task_name (str): The name of the completed task.
+        task_names (list): The names of the completed tasks, in order.
         note_path (str): The path to the daily note file.
-
-    Raises:
-        FileNotFoundError: If the daily note file does not exist.
     """
-    timestamp = datetime.now().strftime("%-m-%d-%y %-I:%M %p")
-    with open(note_path, "a") as file:
-        file.write(f"{task_name} - {timestamp}\n")
+    text = "".join(format_completed_task(task_name) for task_name in task_names)
+    with locked(note_path):
+        if not note_exists(note_path):
+            replace_file(note_path, lambda file: file.write(text.encode()))
+            return
+        end_of_file = note_size(note_path)
+        apply_edits(note_path, [Edit(end_of_file, end_of_file, text)])
 
 
 def get_tasks_from_now(note_path: str):
@@ -63,328 +72,203 @@ def get_tasks_from_now(note_path: str):
         note_path (str): The path to the daily note file.
 
     Returns:
-        list: A list of tuples containing task names and their line indices.
+        list: A list of tuples containing task names and the byte ranges of their lines.
 
     Raises:
         ValueError: If the 'now' section is not found in the daily note file.
     """
-    tasks = []
-    with open(note_path, "r") as file:
-        content = file.readlines()
-        now_section_index = next(
-            (i + 2 for i, line in enumerate(content) if line.strip().lower() == "now"),
-            None,
-        )
-        if now_section_index is None:
-            raise ValueError("Could not find 'now' section in daily note.")
-
-        for i in range(now_section_index, len(content)):
-            if content[i].strip().lower() == "later":  # Stop at 'later' section
-                break
-            if content[i].strip():  # Found a non-empty line, which is a task
-                tasks.append((content[i].strip(), i))
-
-    return tasks
-
-
-def remove_task_from_now(note_path: str, task_line_index: int):
-    """
-    Removes a task from the 'now' section of the daily note file and leaves a newline behind.
-
-    Args:
-        note_path (str): The path to the daily note file.
-        task_line_index (int): The index of the task line to be removed.
-    """
-    with open(note_path, "r+") as file:
-        content = file.readlines()
-        content[task_line_index] = "\n"  # Replace the task line with a newline
-        file.seek(0)
-        file.writelines(content)
-        file.truncate()
+    now_section = index_sections(note_path).get("now")
+    if now_section is None:
+        raise ValueError("Could not find 'now' section in daily note.")
+
+    return [
+        (line.strip(), line_range(start_byte, line))
+        for _, start_byte, line in read_section_lines(note_path, now_section)
+        if line.strip()  # Found a non-empty line, which is a task
+    ]
 
 
-def set_one_thing_task(task_name: str):
+def move_task_to_done(task_name: str, task_range: tuple, note_path: str):
     """
-    Sets the task in the One Thing app.
+    Removes a task from the 'now' section, leaving a newline behind, and appends
+    it with a timestamp to the end of the daily note in a single write.
 
     Args:
-        task_name (str): The name of the task to set.
-    """
-    encoded_task_name = quote(task_name)  # URL-encode the task name
-    command = f"open --background 'one-thing:?text={encoded_task_name}'"
-    subprocess.run(command, shell=True)
-
-
-def remove_one_thing_task():
-    """
-    Removes task text from One Thing menubar app.
-    """
-    set_one_thing_task("")
-
-
-TODOIST_API = "https://api.todoist.com/api/v1"
-TD_BINARIES = ("td", "/opt/homebrew/bin/td", "/usr/local/bin/td")
-HTTP_TIMEOUT = 10
-
-
-def find_td():
-    """
-    Return an absolute path to the `td` CLI, or None if it is not installed.
-    """
-    for candidate in TD_BINARIES:
-        if os.path.isabs(candidate) and os.path.isfile(candidate) and os.access(candidate, os.X_OK):
-            return candidate
-        found = shutil.which(candidate)
-        if found:
-            return found
-    return None
-
-
-def get_todoist_token():
-    """
-    Resolve a Todoist API token without embedding one in this public script.
-
-    Prefer the process environment (Raycast inherits launchd env). Fall back to
-    `td auth token view`, which reads the OS credential store.
+        task_name (str): The name of the task being completed.
+        task_range (tuple): The byte range of the task line to be removed.
+        note_path (str): The path to the daily note file.
     """
-    for key in ("TODOIST_API_TOKEN", "TODOIST_API_KEY"):
-        token = os.environ.get(key, "").strip()
-        if token:
-            return token
-
-    td = find_td()
-    if not td:
-        raise RuntimeError("no TODOIST_API_TOKEN and td is not on PATH")
-
-    result = subprocess.run(
-        [td, "--no-spinner", "auth", "token", "view"],
-        capture_output=True,
-        text=True,
-        timeout=HTTP_TIMEOUT,
+    end_of_file = note_size(note_path)
+    apply_edits(
+        note_path,
+        [
+            Edit(*task_range, "\n"),  # Replace the task line with a newline
+            Edit(end_of_file, end_of_file, format_completed_task(task_name)),
+        ],
     )
-    token = (result.stdout or "").strip()
-    if result.returncode != 0 or not token:
-        detail = (result.stderr or result.stdout or "td auth token view failed").strip()
-        raise RuntimeError(detail)
-    return token
 
 
-def todoist_request(method, url, token, payload=None, form=None):
-    """
-    Send an authenticated request to the Todoist API and return parsed JSON or None.
+def start_todoist_logging(task_names: list):
     """
-    headers = {"Authorization": f"Bearer {token}"}
-    data = None
-    if form is not None:
-        headers["Content-Type"] = "application/x-www-form-urlencoded"
-        data = urlencode(form).encode()
-    elif payload is not None:
-        headers["Content-Type"] = "application/json"
-        data = json.dumps(payload).encode()
-
-    request = Request(url, data=data, headers=headers, method=method)
-    try:
-        with urlopen(request, timeout=HTTP_TIMEOUT) as response:
-            body = response.read()
-    except HTTPError as error:
-        detail = error.read().decode("utf-8", errors="replace")[:200].strip()
-        raise RuntimeError(f"HTTP {error.code} {detail}".strip()) from error
-    except URLError as error:
-        raise RuntimeError(f"network error: {error.reason}") from error
-
-    if not body:
-        return None
-    return json.loads(body.decode())
+    Get ready to log the tasks in Todoist while the note is edited.
 
+    A worker thread resolves the token and opens the connection alongside the
+    edit, then waits. Nothing is queued or sent until logging_in_todoist_after
+    hands it the queued tasks, so a failed edit never reaches Todoist. With
+    TODOIST_BACKGROUND=1 there is no thread; a detached worker process
+    delivers the tasks instead.
 
-def log_completed_via_sync(task_name: str, token: str):
-    """
-    Create a due-today task and close it in one Sync request.
+    Returns:
+        tuple: (thread or None, outcome, handoff), where outcome receives the
+        exception that stopped logging, or None, and handoff passes the queued
+        entries, or None after a failed edit, to the thread.
     """
-    temp_id = str(uuid.uuid4())
-    add_uuid = str(uuid.uuid4())
-    close_uuid = str(uuid.uuid4())
-    commands = [
-        {
-            "type": "item_add",
-            "temp_id": temp_id,
-            "uuid": add_uuid,
-            "args": {
-                "content": task_name,
-                "due": {"string": "today", "lang": "en"},
-            },
-        },
-        {
-            "type": "item_close",
-            "uuid": close_uuid,
-            "args": {"id": temp_id},
-        },
-    ]
-    result = todoist_request(
-        "POST",
-        f"{TODOIST_API}/sync",
-        token,
-        form={"commands": json.dumps(commands)},
-    )
-    if not isinstance(result, dict):
-        raise RuntimeError("empty Sync response")
+    import queue
+    import threading
 
-    status = result.get("sync_status") or {}
-    add_status = status.get(add_uuid)
-    close_status = status.get(close_uuid)
-    if add_status != "ok":
-        raise RuntimeError(f"item_add failed: {add_status}")
-    if close_status == "ok":
-        return
+    outcome, handoff = [], queue.Queue(maxsize=1)
+    if TODOIST_IN_BACKGROUND:
+        return None, outcome, handoff
+    try:
+        # Imported here so runs that never reach Todoist skip the HTTP stack.
+        from todoist_client import deliver_completions, warm_up_delivery
+    except Exception as error:
+        outcome.append(error)
+        return None, outcome, handoff
 
-    task_id = (result.get("temp_id_mapping") or {}).get(temp_id)
-    if not task_id:
-        raise RuntimeError(f"item_close failed: {close_status}")
-    close_completed_task(task_id, token)
+    def deliver():
+        with note_trace.phase("todoist_warm_up"):
+            try:
+                warm_up_delivery()
+            except Exception:
+                pass  # Delivery reports whatever is still wrong.
+        entries = handoff.get()
+        if entries is None:
+            return
+        with note_trace.phase("todoist"):
+            try:
+                deliver_completions(entries)
+            except Exception as error:
+                outcome.append(error)
+            else:
+                outcome.append(None)
 
+    # A daemon thread never holds up exit past wait_for_todoist; anything it
+    # has not recorded by then stays queued in the outbox.
+    worker = threading.Thread(target=deliver, name="todoist", daemon=True)
+    worker.start()
+    return worker, outcome, handoff
 
-def close_completed_task(task_id: str, token: str):
-    """
-    Close an existing Todoist task by id.
-    """
-    todoist_request("POST", f"{TODOIST_API}/tasks/{task_id}/close", token)
 
-
-def log_completed_via_rest(task_name: str, token: str):
-    """
-    Create a due-today task, then close it, using REST.
+@contextlib.contextmanager
+def logging_in_todoist_after(todoist, task_names: list):
     """
-    created = todoist_request(
-        "POST",
-        f"{TODOIST_API}/tasks",
-        token,
-        payload={"content": task_name, "due_string": "today"},
-    )
-    if not isinstance(created, dict) or not created.get("id"):
-        raise RuntimeError("create task returned no id")
-    close_completed_task(created["id"], token)
+    Queue the tasks for Todoist once the block, the note edit, succeeds.
 
+    The queued entries go to the worker, or to a detached process with
+    TODOIST_BACKGROUND=1. If the block raises, the worker stops without
+    queueing or sending anything.
 
-def log_completed_via_td(task_name: str):
-    """
-    Create a due-today task and complete it with the official `td` CLI.
+    Args:
+        todoist (tuple): The (thread, outcome, handoff) from start_todoist_logging.
+        task_names (list): The tasks that were completed.
     """
-    td = find_td()
-    if not td:
-        raise RuntimeError("td is not installed")
-
-    add = subprocess.run(
-        [td, "--no-spinner", "task", "add", task_name, "--due", "today", "--json"],
-        capture_output=True,
-        text=True,
-        timeout=HTTP_TIMEOUT,
-    )
-    if add.returncode != 0:
-        detail = (add.stderr or add.stdout or "td task add failed").strip()
-        raise RuntimeError(detail)
+    _, outcome, handoff = todoist
+    try:
+        yield
+    except BaseException:
+        handoff.put(None)
+        raise
 
+    entries = None
     try:
-        created = json.loads(add.stdout)
-        task_id = created.get("id")
-    except json.JSONDecodeError as error:
-        raise RuntimeError("td task add returned non-JSON") from error
-    if not task_id:
-        raise RuntimeError("td task add returned no id")
-
-    complete = subprocess.run(
-        [td, "--no-spinner", "task", "complete", f"id:{task_id}"],
-        capture_output=True,
-        text=True,
-        timeout=HTTP_TIMEOUT,
-    )
-    if complete.returncode != 0:
-        detail = (complete.stderr or complete.stdout or "td task complete failed").strip()
-        raise RuntimeError(detail)
+        from todoist_client import deliver_in_background, enqueue_completions
+
+        entries = enqueue_completions(task_names)
+        if TODOIST_IN_BACKGROUND:
+            deliver_in_background(entries)
+            outcome.append(None)
+    except Exception as error:
+        outcome.append(error)
+    handoff.put(entries)
 
 
-def log_completed_task_to_todoist(task_name: str):
+def wait_for_todoist(worker, outcome, handoff):
     """
-    Record the task as completed today in Todoist.
+    Wait for a worker from start_todoist_logging, up to its delivery deadline
+    plus TODOIST_WAIT_SLACK_SECONDS.
 
-    Uses the Sync API first (one request: add due today, then close). Falls
-    back to REST, then to `td`. Token comes from the environment or `td`.
+    Returns:
+        The exception that stopped logging, or None.
     """
-    errors = []
-
-    try:
-        token = get_todoist_token()
-    except Exception as error:
-        token = None
-        errors.append(f"token: {error}")
-    else:
-        for name, action in (
-            ("sync", log_completed_via_sync),
-            ("rest", log_completed_via_rest),
-        ):
-            try:
-                action(task_name, token)
-                return
-            except Exception as error:
-                errors.append(f"{name}: {error}")
+    if worker is None or outcome:
+        return outcome[0] if outcome else None
+    from todoist_client import DELIVERY_DEADLINE
 
-    try:
-        log_completed_via_td(task_name)
-        return
-    except Exception as error:
-        errors.append(f"td: {error}")
-
-    raise RuntimeError("; ".join(errors))
+    with note_trace.phase("todoist_wait"):
+        worker.join(DELIVERY_DEADLINE + TODOIST_WAIT_SLACK_SECONDS)
+    if worker.is_alive():
+        return TimeoutError("still sending; left in the outbox")
+    return outcome[0]
 
 
 def with_todoist_status(message: str, todoist_error):
     """
     Print a silent-mode HUD line that includes the Todoist outcome.
     """
-    if todoist_error is None:
-        print(f"{message} Logged in Todoist.")
-    else:
+    if todoist_error is not None:
         print(f"{message} Todoist failed: {todoist_error}")
+    elif TODOIST_IN_BACKGROUND:
+        print(f"{message} Logging in Todoist.")
+    else:
+        print(f"{message} Logged in Todoist.")
 
 
 if __name__ == "__main__":
-    task_name = " ".join(sys.argv[1:]).strip()
+    # Several tasks can be completed at once, one per line or separated by ";"
+    task_names = split_tasks(" ".join(sys.argv[1:]))
     daily_note_path = get_daily_note_path()
+    note_trace.start(__file__)
 
-    if not task_name:
+    if not task_names:
         try:
-            tasks = get_tasks_from_now(daily_note_path)
-            if not tasks:
-                raise ValueError("No tasks in 'now' section.")
-            
-            task_name, task_line_index = tasks[0]  # Get the topmost task
-            remove_task_from_now(daily_note_path, task_line_index)
-            append_completed_task_to_daily_note(task_name, daily_note_path)
-            todoist_error = None
-            try:
-                log_completed_task_to_todoist(task_name)
-            except Exception as error:
-                todoist_error = error
+            # Hold the note's lock from reading the task until it has moved
+            with locked(daily_note_path):
+                with note_trace.phase("parse"):
+                    tasks = get_tasks_from_now(daily_note_path)
+                if not tasks:
+                    raise ValueError("No tasks in 'now' section.")
+
+                task_name, task_range = tasks[0]  # Get the topmost task
+                # Todoist warms up alongside the edit and sends once it succeeds
+                todoist = start_todoist_logging([task_name])
+                with logging_in_todoist_after(todoist, [task_name]):
+                    with note_trace.phase("rewrite"):
+                        move_task_to_done(task_name, task_range, daily_note_path)
 
             # Check if there are more tasks in the 'now' section
-            remaining_tasks = get_tasks_from_now(daily_note_path)
-            if remaining_tasks:
-                next_task = remaining_tasks[0][0]  # Get the name of the next task
-                set_one_thing_task(next_task)
-            else:
-                remove_one_thing_task()
+            with note_trace.phase("parse"):
+                remaining_tasks = get_tasks_from_now(daily_note_path)
+            with note_trace.phase("one_thing"):
+                if remaining_tasks:
+                    next_task = remaining_tasks[0][0]  # Get the name of the next task
+                    set_one_thing_task(next_task)
+                else:
+                    remove_one_thing_task()
             with_todoist_status(
-                f"Moved '{task_name}' from 'now' to 'done'.", todoist_error
+                f"Moved '{task_name}' from 'now' to 'done'.", wait_for_todoist(*todoist)
             )
         except ValueError as e:
             print(e)
             sys.exit(1)
     else:
-        append_completed_task_to_daily_note(task_name, daily_note_path)
-        todoist_error = None
-        try:
-            log_completed_task_to_todoist(task_name)
-        except Exception as error:
-            todoist_error = error
-        with_todoist_status(
-            f"Task '{task_name}' added to daily note.", todoist_error
-        )
\ No newline at end of file
+        todoist = start_todoist_logging(task_names)
+        with logging_in_todoist_after(todoist, task_names):
+            with note_trace.phase("rewrite"):
+                append_completed_tasks_to_daily_note(task_names, daily_note_path)
+        todoist_error = wait_for_todoist(*todoist)
+        if len(task_names) == 1:
+            message = f"Task '{task_names[0]}' added to daily note."
+        else:
+            message = f"{len(task_names)} tasks added to daily note."
+        with_todoist_status(message, todoist_error)
\ No newline at end of file
@@ -14,63 +14,27 @@
 # @raycast.author masonc789
 # @raycast.authorURL https://github.com/masonc15
 
-import os
-import sys
-from datetime import datetime
-
-
-def get_daily_note_path():
-    """
-    Get the path to the daily note file.
-
-    Returns:
-        str: The path to the daily note file.
-    """
-    daily_note_directory = "/Users/colin/Dropbox (Maestral)/Daily Notes"
-    current_date = datetime.now().strftime("%-m-%d-%y")
-    daily_note_filename = f"{current_date}.txt"
-    return os.path.join(daily_note_directory, daily_note_filename)
-
-
-def find_later_section(content):
-    """
-    Find the index of the 'later' section heading, confirmed by a following '---' line.
-
-    Args:
-        content (list): List of lines in the file.
+from note_daemon import forward_to_daemon
 
-    Returns:
-        int or None: Index of the 'later' heading, or None if not found.
-    """
-    for i in range(len(content) - 1):
-        if content[i].strip().lower() == "later" and content[i + 1].strip() == "---":
-            return i
-    return None
+if __name__ == "__main__":
+    forward_to_daemon(__file__)
 
+import os
+import sys
 
-def find_next_heading(content, start):
-    """
-    Find the index of the next heading after the given start index.
+import note_trace
+from daily_note import Edit, apply_edits, get_daily_note_path, index_sections, split_tasks
+from note_files import locked
 
-    Args:
-        content (list): List of lines in the file.
-        start (int): Starting index to search from.
 
-    Returns:
-        int: Index of the next heading, or len(content) if none found.
+def add_to_later_section(task_names: list, note_path: str, add_to_bottom: bool = False):
     """
-    for j in range(start + 2, len(content) - 1):
-        if content[j].strip() and content[j + 1].strip() == "---":
-            return j
-    return len(content)
+    Add the tasks to the 'later' section of the daily note, either at the top or bottom.
 
-
-def add_to_later_section(task_name: str, note_path: str, add_to_bottom: bool = False):
-    """
-    Add the task to the 'later' section of the daily note, either at the top or bottom.
+    All tasks go in with one write and keep the order they were given in.
 
     Args:
-        task_name (str): The name of the task to add.
+        task_names (list): The names of the tasks to add.
         note_path (str): Path to the daily note file.
         add_to_bottom (bool): If True, add to the bottom; otherwise, add to the top.
     """
@@ -78,40 +42,39 @@ def add_to_later_section(task_name: str, note_path: str, add_to_bottom: bool = F
         print(f"Daily note for today does not exist at {note_path}")
         sys.exit(1)
 
-    with open(note_path, "r+") as file:
-        content = file.readlines()
-        later_index = find_later_section(content)
-        if later_index is None:
-            raise ValueError("Could not find 'later' section in daily note.")
-
-        section_start = later_index + 2  # Position after '---'
-        next_heading_index = find_next_heading(content, later_index)
+    # Hold the note's lock from reading the offsets until the edit is in place
+    with locked(note_path):
+        sections = index_sections(note_path)
+        later_section = sections.get("later")
+        if later_section is None:
+            raise ValueError(f"Daily note exists but has no 'later' section: {note_path}")
 
         if not add_to_bottom:
             # Add to top, right after the '---' line
-            content.insert(section_start, f"{task_name}\n\n")
+            insertion_point = later_section.start_byte
         else:
             # Add to bottom, before the next heading or at file end
-            content.insert(next_heading_index, f"{task_name}\n\n")
+            insertion_point = later_section.end_byte
 
-        file.seek(0)
-        file.writelines(content)
-        file.truncate()
+        text = "".join(f"{task_name}\n\n" for task_name in task_names)
+        apply_edits(note_path, [Edit(insertion_point, insertion_point, text)], sections)
 
 
 if __name__ == "__main__":
+    note_trace.start(__file__)
+
     # Parse the input to check for the '-b' flag
-    task_input = sys.argv[1].strip()
+    task_input = sys.argv[1].strip() if len(sys.argv) > 1 else ""
     words = task_input.split()
     if words and words[-1] == "-b":
-        task_name = " ".join(words[:-1])
+        task_input = task_input[: task_input.rfind("-b")]
         add_to_bottom = True
     else:
-        task_name = task_input
         add_to_bottom = False
 
-    # Ensure a task name is provided
-    if not task_name:
+    # Several tasks can be pasted at once, one per line or separated by ";"
+    task_names = split_tasks(task_input)
+    if not task_names:
         print("No task provided. Exiting.")
         sys.exit(1)
 
@@ -122,11 +85,14 @@ if __name__ == "__main__":
         sys.exit(1)
 
     try:
-        add_to_later_section(task_name, note_path, add_to_bottom)
-    except ValueError:
-        print(f"Daily note exists but has no 'later' section: {note_path}")
+        with note_trace.phase("rewrite"):
+            add_to_later_section(task_names, note_path, add_to_bottom)
+    except ValueError as error:
+        print(error)
         sys.exit(1)
 
-    print(
-        f"Added task '{task_name}' to {'bottom' if add_to_bottom else 'top'} of later section in daily note."
-    )
+    where = "bottom" if add_to_bottom else "top"
+    if len(task_names) == 1:
+        print(f"Added task '{task_names[0]}' to {where} of later section in daily note.")
+    else:
+        print(f"Added {len(task_names)} tasks to {where} of later section in daily note.")
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+
+# Required parameters:
+# @raycast.schemaVersion 1
+# @raycast.title note flush
+# @raycast.mode silent
+
+# Optional parameters:
+# @raycast.icon 💾
+
+# Documentation:
+# @raycast.description Writes note edits the daemon is holding for write-behind to disk now.
+# @raycast.author masonc789
+# @raycast.authorURL https://raycast.com/masonc789
+
+# Buffered edits live in the resident note daemon, so this has to run there.
+from note_daemon import forward_to_daemon
+
+if __name__ == "__main__":
+    forward_to_daemon(__file__)
+
+import note_files
+import note_trace
+
+if __name__ == "__main__":
+    note_trace.start(__file__)
+    with note_trace.phase("flush"):
+        written = note_files.flush()
+    print(f"Wrote {written} note{'s' if written != 1 else ''}" if written else "Nothing to write")
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+# Required parameters:
+# @raycast.schemaVersion 1
+# @raycast.title note search
+# @raycast.mode fullOutput
+
+# Optional parameters:
+# @raycast.icon 🔎
+# @raycast.argument1 { "type": "text", "placeholder": "words to find" }
+
+# Documentation:
+# @raycast.description Searches daily notes and the thought log, best matches first.
+# @raycast.author masonc789
+# @raycast.authorURL https://raycast.com/masonc789
+
+import os
+import sys
+
+import note_trace
+from note_daemon import flush_daemon_writes
+from note_index import open_index, search, update_index
+
+RESULT_LIMIT = 20
+
+
+def format_hit(hit):
+    """
+    Format a hit as "<day> <file>:<line>  <text>".
+
+    Args:
+        hit (Hit): The matching line.
+
+    Returns:
+        str: One line of output.
+    """
+    day = hit.day.strftime("%-m-%d-%y") if hit.day else "--"
+    name = os.path.splitext(os.path.basename(hit.path))[0]
+    location = f"{name}:{hit.line}" if name != day else f"line {hit.line}"
+    return f"{day:>8}  {location:<20}  {hit.text.strip()}"
+
+
+if __name__ == "__main__":
+    note_trace.start(__file__)
+    query = " ".join(sys.argv[1:]).strip()
+    if not query:
+        print("No search terms provided.")
+        sys.exit(1)
+
+    # The index is built from the files on disk.
+    flush_daemon_writes()
+    connection = open_index()
+    try:
+        with note_trace.phase("index"):
+            update_index(connection)
+        with note_trace.phase("query"):
+            hits = search(connection, query, RESULT_LIMIT)
+    finally:
+        connection.close()
+
+    if not hits:
+        print(f"No notes mention '{query}'.")
+        sys.exit(0)
+    for hit in hits:
+        print(format_hit(hit))
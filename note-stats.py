@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+# Required parameters:
+# @raycast.schemaVersion 1
+# @raycast.title note stats
+# @raycast.mode fullOutput
+
+# Optional parameters:
+# @raycast.icon 📊
+# @raycast.argument1 { "type": "text", "placeholder": "days (28)", "optional": true }
+
+# Documentation:
+# @raycast.description Shows completed tasks per day and week, by hour, and time between completions.
+# @raycast.author masonc789
+# @raycast.authorURL https://raycast.com/masonc789
+
+import sys
+from datetime import date, timedelta
+
+import note_trace
+from note_analytics import (
+    collect_summaries,
+    completion_gaps,
+    completion_times,
+    completions_per_day,
+    completions_per_week,
+    hour_histogram,
+    latency_summary,
+)
+from note_daemon import flush_daemon_writes
+
+DEFAULT_DAYS = 28
+BAR_WIDTH = 30
+
+
+def bar(count: int, largest: int):
+    """
+    Return a bar scaled so the largest count fills BAR_WIDTH characters.
+
+    Args:
+        count (int): The value to draw.
+        largest (int): The largest value in the chart.
+
+    Returns:
+        str: The bar followed by the count.
+    """
+    length = round(count / largest * BAR_WIDTH) if largest else 0
+    return f"{'█' * length} {count}"
+
+
+def print_chart(title: str, rows):
+    """
+    Print a titled bar chart from (label, count) rows.
+    """
+    print(title)
+    largest = max((count for _, count in rows), default=0)
+    for label, count in rows:
+        print(f"  {label:>8}  {bar(count, largest)}")
+    print()
+
+
+if __name__ == "__main__":
+    note_trace.start(__file__)
+    argument = " ".join(sys.argv[1:]).strip()
+    if argument and not argument.isdigit():
+        print("Usage: [number of days]")
+        sys.exit(1)
+    days = int(argument) if argument else DEFAULT_DAYS
+
+    # Summaries are read from the files on disk.
+    flush_daemon_writes()
+    with note_trace.phase("parse"):
+        summaries, parsed = collect_summaries()
+    note_trace.note(notes=len(summaries), parsed=parsed)
+
+    today = date.today()
+    first_day = today - timedelta(days=days - 1)
+    times = [stamp for stamp in completion_times(summaries) if stamp.date() >= first_day]
+    if not times:
+        print(f"No completed tasks in the last {days} days.")
+        sys.exit(0)
+
+    per_day = completions_per_day(times)
+    print_chart(
+        f"Completed per day (last {days} days, {len(times)} total)",
+        [
+            (f"{day:%a %-m-%d}", per_day.get(day, 0))
+            for day in (first_day + timedelta(days=n) for n in range(days))
+        ],
+    )
+
+    per_week = completions_per_week(times)
+    print_chart(
+        "Completed per week",
+        [(f"{monday:%-m-%d-%y}", per_week[monday]) for monday in sorted(per_week)],
+    )
+
+    per_hour = hour_histogram(times)
+    hours = range(min(per_hour), max(per_hour) + 1)
+    print_chart("Completed by hour", [(f"{hour:02d}:00", per_hour.get(hour, 0)) for hour in hours])
+
+    latency = latency_summary(completion_gaps(times))
+    if latency is None:
+        print("Not enough completions to estimate time per task.")
+    else:
+        median, p90 = latency
+        print(
+            f"Time between completions (approximates now-to-done): "
+            f"median {median:.0f} min, p90 {p90:.0f} min"
+        )
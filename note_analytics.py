@@ -0,0 +1,204 @@
+"""
+Productivity analytics over the daily-note archive.
+
+Each note is reduced to a compact summary: the completion timestamps in its
+"done" section and how many tasks were left in "now". Summaries are cached in
+the state directory keyed by each note's mtime and size, and only new or
+changed notes are parsed, across a process pool when there are enough of them.
+"""
+
+import json
+import os
+import statistics
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from daily_note import (
+    DAILY_NOTES_PATH,
+    parse_completed_task,
+    parse_daily_note_filename,
+    parse_sections,
+)
+from note_state import state_path
+
+SUMMARY_CACHE_FILE = "note-stats.json"
+# Below this many notes to parse, starting worker processes costs more than it saves.
+PARALLEL_THRESHOLD = 8
+
+
+def summarize_note(path: str):
+    """
+    Parse one daily note into its summary.
+
+    Runs in a worker process, so it only takes and returns plain data.
+
+    Args:
+        path (str): The daily note file.
+
+    Returns:
+        tuple: (path, mtime_ns, size, summary), where summary holds the note's
+        "day", its "completed" timestamps as "YYYY-MM-DDTHH:MM" strings in
+        file order, and the number of tasks still "open" in now.
+    """
+    with open(path, "rb") as file:
+        stat = os.fstat(file.fileno())
+        data = file.read()
+    sections = parse_sections(data)
+    lines = data.decode("utf-8", errors="replace").splitlines()
+
+    completed = []
+    done = sections.get("done")
+    if done is not None:
+        for line in lines[done.start_line : done.end_line]:
+            parsed = parse_completed_task(line)
+            if parsed is not None:
+                completed.append(parsed[1].strftime("%Y-%m-%dT%H:%M"))
+
+    now = sections.get("now")
+    open_tasks = 0
+    if now is not None:
+        open_tasks = sum(1 for line in lines[now.start_line : now.end_line] if line.strip())
+
+    day = parse_daily_note_filename(os.path.basename(path))
+    summary = {"day": day.isoformat(), "completed": completed, "open": open_tasks}
+    return path, stat.st_mtime_ns, stat.st_size, summary
+
+
+def load_summary_cache():
+    """
+    Read the summary cache, returning an empty cache if it is unusable.
+    """
+    try:
+        with open(state_path(SUMMARY_CACHE_FILE), "r") as file:
+            cache = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def save_summary_cache(cache):
+    """
+    Write the summary cache atomically.
+    """
+    path = state_path(SUMMARY_CACHE_FILE)
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}")
+    with open(temp_path, "w") as file:
+        json.dump(cache, file, separators=(",", ":"))
+    os.replace(temp_path, path)
+
+
+def note_paths():
+    """
+    Return every dated daily note in the notes folder.
+    """
+    try:
+        names = os.listdir(DAILY_NOTES_PATH)
+    except FileNotFoundError:
+        return []
+    return [
+        os.path.join(DAILY_NOTES_PATH, name)
+        for name in names
+        if parse_daily_note_filename(name) is not None
+    ]
+
+
+def collect_summaries(paths=None, max_workers=None):
+    """
+    Return the summary of every note, parsing only notes that changed.
+
+    Args:
+        paths (list): Notes to cover; defaults to note_paths().
+        max_workers (int): Worker processes for the parse; None uses the CPU count.
+
+    Returns:
+        tuple: ({path: summary}, number of notes parsed)
+    """
+    paths = note_paths() if paths is None else paths
+    cache = load_summary_cache()
+    summaries, stale = {}, []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entry = cache.get(path)
+        if entry and [entry["mtime_ns"], entry["size"]] == [stat.st_mtime_ns, stat.st_size]:
+            summaries[path] = entry["summary"]
+        else:
+            stale.append(path)
+
+    if len(stale) >= PARALLEL_THRESHOLD:
+        workers = max_workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunksize = max(1, len(stale) // (4 * workers))
+            results = list(pool.map(summarize_note, stale, chunksize=chunksize))
+    else:
+        results = [summarize_note(path) for path in stale]
+
+    fresh = {path: cache[path] for path in summaries}
+    for path, mtime_ns, size, summary in results:
+        summaries[path] = summary
+        fresh[path] = {"mtime_ns": mtime_ns, "size": size, "summary": summary}
+    if fresh != cache:
+        save_summary_cache(fresh)
+    return summaries, len(results)
+
+
+def completion_times(summaries):
+    """
+    Return every completion timestamp across the summaries, oldest first.
+    """
+    return sorted(
+        datetime.strptime(stamp, "%Y-%m-%dT%H:%M")
+        for summary in summaries.values()
+        for stamp in summary["completed"]
+    )
+
+
+def completions_per_day(times):
+    """
+    Count completions per calendar day.
+    """
+    return Counter(stamp.date() for stamp in times)
+
+
+def completions_per_week(times):
+    """
+    Count completions per ISO week, keyed by the week's Monday.
+    """
+    return Counter(
+        stamp.date() - timedelta(days=stamp.weekday()) for stamp in times
+    )
+
+
+def hour_histogram(times):
+    """
+    Count completions per hour of the day.
+    """
+    return Counter(stamp.hour for stamp in times)
+
+
+def completion_gaps(times):
+    """
+    Approximate now-to-done latency as the minutes between consecutive
+    completions on the same day.
+
+    Notes only record when a task was finished, not when it entered "now", so
+    the time since the previous completion is the closest available measure of
+    how long the next task took. The first completion of each day is skipped.
+    """
+    gaps = []
+    for previous, current in zip(times, times[1:]):
+        if previous.date() == current.date():
+            gaps.append((current - previous).total_seconds() / 60)
+    return gaps
+
+
+def latency_summary(gaps):
+    """
+    Return the median and 90th percentile of the gaps, or None if there are too few.
+    """
+    if len(gaps) < 2:
+        return None
+    return statistics.median(gaps), statistics.quantiles(gaps, n=10)[-1]
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+
+"""
+Optional resident daemon that runs the note scripts in one warm interpreter.
+
+Start it with `python3 note_daemon.py` (for example from a launchd agent). Each
+script calls forward_to_daemon() before its heavy imports; when the daemon is
+listening the script sends its arguments over a Unix socket, prints the reply
+and exits, and when it is not the script carries on in-process as before.
+Commands run one at a time, so long-running ones (search, stats, backfill)
+never forward and only ask the daemon to flush its buffered edits.
+
+Inside the daemon the standard library, the shared helper modules, their
+compiled regexes and any module-level caches stay loaded between commands.
+"""
+
+import os
+import socket
+import sys
+
+from note_state import STATE_DIR
+
+SOCKET_PATH = os.environ.get("NOTE_DAEMON_SOCKET") or str(STATE_DIR / "daemon.sock")
+
+# Connecting and sending only wait on the daemon's accept queue; a daemon that
+# can't take a request this quickly is treated as not running.
+SEND_TIMEOUT_SECONDS = 2
+REPLY_TIMEOUT_SECONDS = 45
+
+# Set inside the daemon so scripts it runs do not forward back to it.
+SERVING = False
+
+
+def reply_timeout():
+    """
+    Return how long to wait for the daemon's reply, from NOTE_DAEMON_TIMEOUT.
+    """
+    try:
+        return float(os.environ.get("NOTE_DAEMON_TIMEOUT", REPLY_TIMEOUT_SECONDS))
+    except ValueError:
+        return REPLY_TIMEOUT_SECONDS
+
+
+def send_request(script_path: str, argv):
+    """
+    Ask the daemon to run a script and wait for its reply.
+
+    Args:
+        script_path (str): The script to run.
+        argv (list[str]): Its arguments.
+
+    Returns:
+        dict | None: The reply, or None if no daemon took the request, in
+        which case it was never sent and may be run locally.
+
+    Raises:
+        TimeoutError: The request was sent but no reply came in time.
+        ConnectionError: The daemon closed the connection without replying.
+    """
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    with client:
+        client.settimeout(SEND_TIMEOUT_SECONDS)
+        try:
+            client.connect(SOCKET_PATH)
+        except OSError:
+            return None
+
+        # Only loaded once a daemon is listening.
+        import json
+
+        request = {
+            "script": os.path.abspath(script_path),
+            "argv": list(argv),
+            "cwd": os.getcwd(),
+            "env": dict(os.environ),
+        }
+        try:
+            client.sendall(json.dumps(request).encode() + b"\n")
+        except OSError:
+            return None
+
+        timeout = reply_timeout()
+        client.settimeout(timeout)
+        try:
+            with client.makefile("rb") as stream:
+                line = stream.readline()
+        except socket.timeout:
+            raise TimeoutError(
+                f"Note daemon did not reply within {timeout:g}s; "
+                "the command may still run there"
+            ) from None
+
+    if not line:
+        raise ConnectionError("Note daemon closed the connection before replying")
+    return json.loads(line)
+
+
+def forward_to_daemon(script_path: str):
+    """
+    Run the calling script inside the daemon if one is listening.
+
+    Returns only when no daemon took the request; otherwise prints the
+    script's output and exits with its status.
+
+    Args:
+        script_path (str): The calling script's __file__.
+    """
+    if SERVING or os.environ.get("NOTE_DAEMON_DISABLE") == "1":
+        return
+
+    try:
+        reply = send_request(script_path, sys.argv[1:])
+    except (TimeoutError, ConnectionError) as error:
+        # The request may already have been applied, so never rerun it locally.
+        print(error, file=sys.stderr)
+        sys.exit(1)
+    if reply is None:
+        return
+
+    sys.stdout.write(reply["stdout"])
+    sys.stderr.write(reply["stderr"])
+    sys.exit(reply["code"])
+
+
+def flush_daemon_writes():
+    """
+    Have the daemon write out its buffered edits, for commands that read the
+    notes from disk without running inside it.
+    """
+    if SERVING or os.environ.get("NOTE_DAEMON_DISABLE") == "1":
+        return
+
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "note-flush.py")
+    try:
+        reply = send_request(script, [])
+    except (TimeoutError, ConnectionError) as error:
+        print(f"Could not flush the note daemon: {error}", file=sys.stderr)
+        return
+    if reply is not None and reply["code"] != 0:
+        sys.stderr.write(reply["stderr"])
+
+
+def local_module_names():
+    """
+    Return the names of loaded modules that live next to this file.
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    return [
+        name
+        for name, module in list(sys.modules.items())
+        if name not in ("__main__", "note_daemon")
+        and os.path.dirname(os.path.abspath(getattr(module, "__file__", None) or "/"))
+        == directory
+    ]
+
+
+def flush_pending_writes():
+    """
+    Write out any edits note_files is holding for write-behind.
+
+    Returns:
+        bool: False if a note stayed locked, in which case its edits are still
+        buffered and the loaded modules must be kept.
+    """
+    note_files = sys.modules.get("note_files")
+    if note_files is None:
+        return True
+    try:
+        note_files.flush()
+    except TimeoutError as error:
+        print(f"note daemon: {error}", file=sys.stderr)
+        return False
+    return True
+
+
+def run_request(request, last_env):
+    """
+    Run one forwarded script with its argv, cwd and environment.
+
+    Helper modules read their configuration from the environment at import
+    time, so they are reloaded whenever a client's environment differs from
+    the previous one.
+
+    Returns:
+        dict: The reply with captured stdout, stderr and exit code.
+    """
+    import contextlib
+    import io
+    import runpy
+    import traceback
+
+    if request["env"] != last_env and flush_pending_writes():
+        for name in local_module_names():
+            del sys.modules[name]
+
+    stdout, stderr = io.StringIO(), io.StringIO()
+    saved_argv, saved_env, saved_cwd = sys.argv, dict(os.environ), os.getcwd()
+    code = 0
+    try:
+        os.environ.clear()
+        os.environ.update(request["env"])
+        os.chdir(request["cwd"])
+        sys.argv = [request["script"], *request["argv"]]
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            try:
+                runpy.run_path(request["script"], run_name="__main__")
+            except SystemExit as exit_request:
+                if isinstance(exit_request.code, int):
+                    code = exit_request.code
+                elif exit_request.code is not None:
+                    print(exit_request.code, file=sys.stderr)
+                    code = 1
+            except Exception:
+                traceback.print_exc()
+                code = 1
+            finally:
+                # Scripts' atexit hooks never run here; write their trace now.
+                note_trace = sys.modules.get("note_trace")
+                if note_trace is not None:
+                    note_trace.finish()
+    finally:
+        sys.argv = saved_argv
+        os.environ.clear()
+        os.environ.update(saved_env)
+        os.chdir(saved_cwd)
+
+    return {"stdout": stdout.getvalue(), "stderr": stderr.getvalue(), "code": code}
+
+
+def serve():
+    """
+    Listen on the daemon socket and run forwarded scripts one at a time.
+    """
+    import json
+    import signal
+    import socketserver
+
+    global SERVING
+    SERVING = True
+    # Scripts import this module by name; make them see the serving instance.
+    sys.modules["note_daemon"] = sys.modules[__name__]
+
+    last_env = {}
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            nonlocal last_env
+            line = self.rfile.readline()
+            if not line:
+                return
+            request = json.loads(line)
+            reply = run_request(request, last_env)
+            last_env = request["env"]
+            self.wfile.write(json.dumps(reply).encode() + b"\n")
+
+    os.makedirs(os.path.dirname(SOCKET_PATH), exist_ok=True)
+    if os.path.exists(SOCKET_PATH):
+        os.unlink(SOCKET_PATH)
+
+    server = socketserver.UnixStreamServer(SOCKET_PATH, Handler)
+    os.chmod(SOCKET_PATH, 0o600)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        server.serve_forever()
+    finally:
+        flush_pending_writes()
+        server.server_close()
+        if os.path.exists(SOCKET_PATH):
+            os.unlink(SOCKET_PATH)
+
+
+if __name__ == "__main__":
+    try:
+        serve()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,381 @@
+"""
+Locked, atomic rewrites for the daily notes and the thought log.
+
+Every writer holds an advisory fcntl lock on a per-file lock file in the state
+directory while it reads, edits and writes. The holder removes the lock file
+before releasing it, and a waiter that then gets the lock checks that its file
+is still the one on disk, so lock files don't pile up. The new contents are built in a
+temp file next to the target, fsynced and swapped in with os.replace(), so
+readers and sync clients never see a half-written file. Two commands fired
+together queue on the lock instead of losing an edit.
+
+Inside the note daemon, NOTE_WRITE_BEHIND=<seconds> turns on write-behind:
+replacements are kept in memory and written once the file has been quiet for
+that long, or when flush() is called, so a burst of edits uploads once. Reads
+through open_note() and note_size() see the buffered contents in the meantime.
+"""
+
+import _thread
+import contextlib
+import fcntl
+import io
+import os
+import stat
+import sys
+import time
+import zlib
+from datetime import datetime
+from pathlib import Path
+
+from note_state import state_path
+
+LOCK_DIRECTORY = "locks"
+LOCK_TIMEOUT = float(os.environ.get("NOTE_LOCK_TIMEOUT", "10"))
+LOCK_POLL_SECONDS = 0.005
+COPY_CHUNK_BYTES = 8 * 1024 * 1024
+
+# Locks held in this process, keyed by (thread, lock file), so nested locked()
+# calls for one file don't deadlock while other threads still wait their turn.
+_held = {}
+
+# Write-behind state: file path -> buffered contents, the file's on-disk
+# signature when buffering began, and the pending flush timer.
+_pending = {}
+_disk_signatures = {}
+_timers = {}
+
+
+def lock_path(path):
+    """
+    Return the lock file for a note, named after its file name and real path.
+    """
+    directory = state_path(LOCK_DIRECTORY)
+    directory.mkdir(exist_ok=True)
+    real_path = os.path.realpath(path)
+    checksum = zlib.crc32(real_path.encode())
+    return directory / f"{os.path.basename(real_path)}.{checksum:08x}.lock"
+
+
+@contextlib.contextmanager
+def locked(path, timeout=None):
+    """
+    Hold the exclusive lock for a file for the duration of the block.
+
+    Waits up to `timeout` seconds (NOTE_LOCK_TIMEOUT, 10 by default) for
+    another command to finish. Re-entering for a file this process already
+    holds is a no-op.
+
+    Raises:
+        TimeoutError: If the lock stayed busy for the whole timeout.
+    """
+    key = (_thread.get_ident(), lock_path(path))
+    if key in _held:
+        yield
+        return
+
+    timeout = LOCK_TIMEOUT if timeout is None else timeout
+    deadline = time.monotonic() + timeout
+    lock_file = open(key[1], "a")
+    try:
+        while True:
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(
+                        f"{path} is still being written by another command"
+                    ) from None
+                time.sleep(LOCK_POLL_SECONDS)
+                continue
+            if is_current_lock_file(key[1], lock_file):
+                break
+            # The previous holder removed the file after we opened it; lock
+            # whichever file is there now instead.
+            lock_file.close()
+            lock_file = open(key[1], "a")
+
+        _held[key] = lock_file
+        try:
+            yield
+        finally:
+            del _held[key]
+            # Remove the lock file while still holding it, so locks/ doesn't
+            # keep a file for every note ever written.
+            try:
+                os.unlink(key[1])
+            except FileNotFoundError:
+                pass
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+    finally:
+        lock_file.close()
+
+
+def is_current_lock_file(path, lock_file):
+    """
+    Return True if an open lock file is still the one at its path.
+    """
+    try:
+        on_disk = os.stat(path)
+    except FileNotFoundError:
+        return False
+    opened = os.fstat(lock_file.fileno())
+    return (on_disk.st_dev, on_disk.st_ino) == (opened.st_dev, opened.st_ino)
+
+
+def replace_file(path, write):
+    """
+    Atomically replace a file with contents produced by `write`.
+
+    `write` is called with a binary temp file in the same directory. The temp
+    file takes the original's permissions, is fsynced and then renamed over
+    the original; on any error the original is left untouched.
+
+    Returns:
+        int: The size of the new file in bytes.
+    """
+    delay = write_behind_delay()
+    if delay > 0:
+        buffer = io.BytesIO()
+        write(buffer)
+        return buffer_contents(path, buffer.getvalue(), delay)
+    return write_to_disk(path, write)
+
+
+def write_to_disk(path, write):
+    """
+    Do replace_file's temp file, fsync and rename, bypassing write-behind.
+    """
+    path = Path(path)
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}.{time.monotonic_ns()}")
+    descriptor = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            write(file)
+            file.flush()
+            os.fsync(file.fileno())
+            size = file.tell()
+        try:
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            umask = os.umask(0)
+            os.umask(umask)
+            mode = 0o666 & ~umask
+        os.chmod(temp_path, mode)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+    # Make the rename itself durable.
+    try:
+        directory = os.open(path.parent, os.O_RDONLY)
+    except OSError:
+        return size
+    try:
+        os.fsync(directory)
+    except OSError:
+        pass
+    finally:
+        os.close(directory)
+    return size
+
+
+def copy_range(source, destination, offset, count=None):
+    """
+    Copy `count` bytes (or everything to EOF) from offset in source onto the
+    end of destination.
+
+    Uses in-kernel copies where the platform supports them and falls back to a
+    large buffered copy, so the bytes are never all held in memory.
+    """
+    destination.flush()
+    try:
+        source_fd, destination_fd = source.fileno(), destination.fileno()
+    except (AttributeError, io.UnsupportedOperation):
+        source_fd = destination_fd = None  # In-memory buffers; copy in Python.
+
+    def chunk(copied):
+        if count is None:
+            return COPY_CHUNK_BYTES
+        return min(COPY_CHUNK_BYTES, count - copied)
+
+    if source_fd is not None and hasattr(os, "copy_file_range"):
+        copied = 0
+        try:
+            while chunk(copied) > 0:
+                copied_now = os.copy_file_range(
+                    source_fd, destination_fd, chunk(copied), offset + copied
+                )
+                if copied_now == 0:
+                    return
+                copied += copied_now
+            return
+        except OSError:
+            if copied:
+                raise
+
+    if source_fd is not None and hasattr(os, "sendfile"):
+        copied = 0
+        try:
+            while chunk(copied) > 0:
+                copied_now = os.sendfile(
+                    destination_fd, source_fd, offset + copied, chunk(copied)
+                )
+                if copied_now == 0:
+                    return
+                copied += copied_now
+            return
+        except OSError:
+            # macOS only sends to sockets; anything copied so far is kept.
+            if copied:
+                raise
+
+    source.seek(offset)
+    if count is None:
+        import shutil
+
+        shutil.copyfileobj(source, destination, COPY_CHUNK_BYTES)
+        return
+    remaining = count
+    while remaining > 0:
+        data = source.read(min(COPY_CHUNK_BYTES, remaining))
+        if not data:
+            return
+        destination.write(data)
+        remaining -= len(data)
+
+
+def write_behind_delay():
+    """
+    Return the write-behind quiet period in seconds, or 0 when it is off.
+
+    Only the note daemon outlives a command, so anywhere else writes go
+    straight to disk whatever NOTE_WRITE_BEHIND says.
+    """
+    daemon = sys.modules.get("note_daemon")
+    if daemon is None or not getattr(daemon, "SERVING", False):
+        return 0
+    try:
+        return max(float(os.environ.get("NOTE_WRITE_BEHIND", "0") or 0), 0)
+    except ValueError:
+        return 0
+
+
+def disk_signature(path):
+    """
+    Return what identifies a file's current on-disk version, or None if absent.
+    """
+    try:
+        stat_result = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat_result.st_ino, stat_result.st_mtime_ns, stat_result.st_size
+
+
+def buffer_contents(path, data: bytes, delay: float):
+    """
+    Keep new contents in memory and (re)start the file's quiet-period timer.
+
+    Returns:
+        int: The size of the buffered contents in bytes.
+    """
+    import threading
+
+    key = os.path.abspath(path)
+    if key not in _pending:
+        _disk_signatures[key] = disk_signature(key)
+    _pending[key] = data
+
+    timer = _timers.pop(key, None)
+    if timer is not None:
+        timer.cancel()
+    timer = threading.Timer(delay, flush_when_quiet, (key, delay))
+    timer.daemon = True
+    _timers[key] = timer
+    timer.start()
+    return len(data)
+
+
+def flush_when_quiet(key, delay):
+    """
+    Timer callback: flush one file, trying again later if it is busy.
+    """
+    try:
+        flush(key)
+    except TimeoutError:
+        if key in _pending and key not in _timers:
+            buffer_contents(key, _pending[key], delay)
+
+
+def flush(path=None):
+    """
+    Write buffered contents to disk now, for one file or for every file.
+
+    If the file changed on disk since its edits were buffered, the other
+    writer's version is kept and the buffered one is saved beside it as
+    "<name> (unsaved edits <time>)<ext>".
+
+    Returns:
+        int: The number of files written.
+    """
+    keys = list(_pending) if path is None else [os.path.abspath(path)]
+    written = 0
+    for key in keys:
+        timer = _timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        with locked(key):
+            data = _pending.get(key)
+            if data is None:
+                continue
+            target = key
+            if disk_signature(key) != _disk_signatures.get(key):
+                stem, extension = os.path.splitext(key)
+                target = f"{stem} (unsaved edits {datetime.now():%Y-%m-%d %H.%M.%S}){extension}"
+                print(
+                    f"{key} changed on disk while edits were buffered; saved them to {target}",
+                    file=sys.stderr,
+                )
+            write_to_disk(target, lambda file: file.write(data))
+            del _pending[key]
+            _disk_signatures.pop(key, None)
+            written += 1
+    return written
+
+
+def pending_contents(path):
+    """
+    Return a file's buffered contents, or None if nothing is waiting to be written.
+    """
+    if not _pending:
+        return None
+    return _pending.get(os.path.abspath(path))
+
+
+def open_note(path):
+    """
+    Open a note for binary reading, seeing any buffered contents first.
+
+    Raises:
+        FileNotFoundError: If the note neither exists nor is buffered.
+    """
+    data = pending_contents(path)
+    if data is not None:
+        return io.BytesIO(data)
+    return open(path, "rb")
+
+
+def note_size(path):
+    """
+    Return a note's size in bytes, counting any buffered contents.
+    """
+    data = pending_contents(path)
+    return len(data) if data is not None else os.path.getsize(path)
+
+
+def note_exists(path):
+    """
+    Return True if a note exists on disk or is waiting to be written.
+    """
+    return pending_contents(path) is not None or os.path.exists(path)
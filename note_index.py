@@ -0,0 +1,280 @@
+"""
+Incremental full-text index over the daily notes and the thought log.
+
+Every line is split into lowercase word tokens and stored in a SQLite database
+in the state directory as token -> (file, line) postings, alongside each line's
+text and day. Files are re-tokenized only when their mtime or size changes, so
+refreshing the index before a query costs one stat() per file.
+"""
+
+import math
+import os
+import re
+import sqlite3
+from datetime import datetime
+from typing import NamedTuple
+
+from daily_note import DAILY_NOTES_PATH, parse_daily_note_filename
+from note_state import state_path
+from thought_log_store import archive_directory, parse_day
+
+INDEX_FILE = "note-search.sqlite3"
+SCHEMA_VERSION = 1
+TOKEN_PATTERN = re.compile(r"\w{2,}")
+THOUGHT_LOG_PATH = os.path.expanduser(
+    os.environ.get(
+        "THOUGHT_LOG_PATH",
+        "/Users/colin/Dropbox (Maestral)/Daily Notes/thought log.txt",
+    )
+)
+DAY_LINE_PATTERN = re.compile(r"^\d{1,2}-\d{2}-\d{2}$")
+
+SCHEMA = """
+CREATE TABLE files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE lines (
+    file_id INTEGER NOT NULL,
+    line INTEGER NOT NULL,
+    day TEXT,
+    text TEXT NOT NULL,
+    PRIMARY KEY (file_id, line)
+) WITHOUT ROWID;
+CREATE TABLE postings (
+    token TEXT NOT NULL,
+    file_id INTEGER NOT NULL,
+    line INTEGER NOT NULL,
+    PRIMARY KEY (token, file_id, line)
+) WITHOUT ROWID;
+CREATE INDEX postings_by_file ON postings (file_id);
+CREATE TABLE meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+"""
+
+
+class Hit(NamedTuple):
+    """
+    One matching line. Line numbers are 1-based; day is None before any header.
+    """
+
+    path: str
+    day: object
+    line: int
+    text: str
+    matched: int
+    score: float
+
+
+def tokenize(text: str):
+    """
+    Return the distinct lowercase word tokens in a piece of text.
+    """
+    return set(TOKEN_PATTERN.findall(text.lower()))
+
+
+def open_index(path=None):
+    """
+    Open the index database, creating or rebuilding it if the schema changed.
+
+    Args:
+        path (str): Database file; defaults to one in the state directory.
+
+    Returns:
+        sqlite3.Connection: The open index.
+    """
+    connection = sqlite3.connect(path or state_path(INDEX_FILE))
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("PRAGMA synchronous = NORMAL")
+    (version,) = connection.execute("PRAGMA user_version").fetchone()
+    if version != SCHEMA_VERSION:
+        with connection:
+            for table in ("files", "lines", "postings", "meta"):
+                connection.execute(f"DROP TABLE IF EXISTS {table}")
+            connection.executescript(SCHEMA)
+            connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return connection
+
+
+def indexed_paths():
+    """
+    Return every file the index covers: dated daily notes, the thought log and
+    its monthly archives.
+    """
+    paths = []
+    try:
+        names = os.listdir(DAILY_NOTES_PATH)
+    except FileNotFoundError:
+        names = []
+    for name in names:
+        if parse_daily_note_filename(name) is not None:
+            paths.append(os.path.join(DAILY_NOTES_PATH, name))
+
+    if os.path.exists(THOUGHT_LOG_PATH):
+        paths.append(THOUGHT_LOG_PATH)
+    archives = archive_directory(THOUGHT_LOG_PATH)
+    if archives.is_dir():
+        paths.extend(str(path) for path in archives.glob("*.txt"))
+    return paths
+
+
+def dated_lines(path: str, text: str):
+    """
+    Yield (line number, day, text) for each line of a file.
+
+    Daily notes take their day from the file name; thought log lines take it
+    from the nearest day header above them.
+    """
+    lines = text.splitlines()
+    note_day = parse_daily_note_filename(os.path.basename(path))
+    day = note_day
+    for index, line in enumerate(lines):
+        if (
+            note_day is None
+            and DAY_LINE_PATTERN.match(line)
+            and index + 1 < len(lines)
+            and lines[index + 1].rstrip() == "---"
+        ):
+            day = parse_day(line) or day
+        yield index + 1, day, line
+
+
+def update_index(connection, paths=None):
+    """
+    Bring the index up to date, re-tokenizing only files that changed.
+
+    Args:
+        connection (sqlite3.Connection): The open index.
+        paths (list): Files to cover; defaults to indexed_paths().
+
+    Returns:
+        tuple: (number of files re-indexed, number of files removed)
+    """
+    paths = indexed_paths() if paths is None else paths
+    known = {
+        path: (file_id, mtime_ns, size)
+        for file_id, path, mtime_ns, size in connection.execute(
+            "SELECT id, path, mtime_ns, size FROM files"
+        )
+    }
+
+    changed = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entry = known.pop(path, None)
+        if entry is None or entry[1:] != (stat.st_mtime_ns, stat.st_size):
+            changed.append((path, entry[0] if entry else None))
+
+    if not changed and not known:
+        return 0, 0
+
+    with connection:
+        for file_id, _, _ in known.values():
+            forget_file(connection, file_id)
+        for path, file_id in changed:
+            if file_id is not None:
+                forget_file(connection, file_id)
+            index_file(connection, path)
+        (line_count,) = connection.execute("SELECT COUNT(*) FROM lines").fetchone()
+        connection.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('line_count', ?)",
+            (line_count,),
+        )
+    return len(changed), len(known)
+
+
+def forget_file(connection, file_id: int):
+    """
+    Delete a file's row, lines and postings.
+    """
+    connection.execute("DELETE FROM postings WHERE file_id = ?", (file_id,))
+    connection.execute("DELETE FROM lines WHERE file_id = ?", (file_id,))
+    connection.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+
+def index_file(connection, path: str):
+    """
+    Tokenize one file and insert its lines and postings.
+    """
+    with open(path, "rb") as file:
+        stat = os.fstat(file.fileno())
+        text = file.read().decode("utf-8", errors="replace")
+
+    cursor = connection.execute(
+        "INSERT INTO files (path, mtime_ns, size) VALUES (?, ?, ?)",
+        (path, stat.st_mtime_ns, stat.st_size),
+    )
+    file_id = cursor.lastrowid
+    rows, postings = [], []
+    for line, day, line_text in dated_lines(path, text):
+        tokens = tokenize(line_text)
+        if not tokens:
+            continue
+        rows.append((file_id, line, day.isoformat() if day else None, line_text))
+        postings.extend((token, file_id, line) for token in tokens)
+    connection.executemany("INSERT INTO lines VALUES (?, ?, ?, ?)", rows)
+    connection.executemany("INSERT INTO postings VALUES (?, ?, ?)", postings)
+
+
+def search(connection, query: str, limit: int = 20):
+    """
+    Return the lines that best match a query.
+
+    Lines matching more of the query's words rank first, then lines whose
+    words are rarer across the notes, then more recent days.
+
+    Args:
+        connection (sqlite3.Connection): The open, up-to-date index.
+        query (str): Free text; each word is matched as a whole token.
+        limit (int): Maximum number of hits.
+
+    Returns:
+        list: Hit tuples, best first.
+    """
+    tokens = sorted(tokenize(query))
+    if not tokens:
+        return []
+
+    row = connection.execute("SELECT value FROM meta WHERE key = 'line_count'").fetchone()
+    line_count = row[0] if row else 0
+    weights = []
+    for token in tokens:
+        (frequency,) = connection.execute(
+            "SELECT COUNT(*) FROM postings WHERE token = ?", (token,)
+        ).fetchone()
+        if frequency:
+            weights.append((token, math.log(1 + line_count / frequency)))
+    if not weights:
+        return []
+
+    values = ", ".join("(?, ?)" for _ in weights)
+    rows = connection.execute(
+        f"""
+        WITH weights (token, idf) AS (VALUES {values})
+        SELECT files.path, lines.day, lines.line, lines.text,
+               COUNT(*) AS matched, SUM(weights.idf) AS score
+        FROM postings
+        JOIN weights ON weights.token = postings.token
+        JOIN lines ON lines.file_id = postings.file_id AND lines.line = postings.line
+        JOIN files ON files.id = postings.file_id
+        GROUP BY postings.file_id, postings.line
+        ORDER BY matched DESC, score DESC, lines.day DESC, lines.line
+        LIMIT ?
+        """,
+        [value for weight in weights for value in weight] + [limit],
+    ).fetchall()
+    return [
+        Hit(
+            path,
+            datetime.strptime(day, "%Y-%m-%d").date() if day else None,
+            line,
+            text,
+            matched,
+            score,
+        )
+        for path, day, line, text, matched, score in rows
+    ]
@@ -0,0 +1,30 @@
+"""
+Local state shared by the note scripts.
+
+State lives outside the synced Daily Notes folder so caches, queues and sockets
+never get uploaded.
+"""
+
+import os
+from pathlib import Path
+
+STATE_DIR = Path(
+    os.environ.get(
+        "NOTE_SCRIPTS_STATE_DIR",
+        "~/Library/Application Support/raycast-note-scripts",
+    )
+).expanduser()
+
+
+def state_path(name):
+    """
+    Return the path of a file in the state directory, creating the directory.
+
+    Args:
+        name (str): File name inside the state directory.
+
+    Returns:
+        Path: The full path to the state file.
+    """
+    STATE_DIR.mkdir(parents=True, exist_ok=True)
+    return STATE_DIR / name
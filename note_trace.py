@@ -0,0 +1,140 @@
+"""
+Opt-in per-phase tracing and profiling for the note scripts.
+
+Set NOTE_TRACE=1 (or a file path) to append one JSON line per invocation with
+each named phase's duration, bytes read and written, and any noted fields such
+as which Todoist path succeeded. Set NOTE_PROFILE=1 (or a file path) to dump
+cProfile stats for the run. When neither is set every call here returns almost
+immediately.
+"""
+
+import atexit
+import contextlib
+import os
+import time
+
+TRACE_FILE = "trace.jsonl"
+
+# State for the invocation being traced, or None when tracing is off.
+_trace = None
+_profiler = None
+_registered = False
+_disabled_phase = contextlib.nullcontext()
+
+
+def start(script_path: str):
+    """
+    Begin tracing and/or profiling this invocation if the environment asks for it.
+
+    Args:
+        script_path (str): The calling script's __file__.
+    """
+    global _trace, _profiler, _registered
+    finish()
+
+    if os.environ.get("NOTE_TRACE"):
+        _trace = {
+            "script": os.path.basename(script_path),
+            "started_at": time.time(),
+            "started": time.perf_counter(),
+            "phases": {},
+            "bytes_read": 0,
+            "bytes_written": 0,
+            "fields": {},
+        }
+    if os.environ.get("NOTE_PROFILE"):
+        import cProfile
+
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+        _profiler.script = os.path.basename(script_path)
+    if (_trace or _profiler) and not _registered:
+        atexit.register(finish)
+        _registered = True
+
+
+def phase(name: str):
+    """
+    Return a context manager that adds its duration to the named phase.
+    """
+    if _trace is None:
+        return _disabled_phase
+    return _timed_phase(name)
+
+
+@contextlib.contextmanager
+def _timed_phase(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if _trace is not None:
+            phases = _trace["phases"]
+            phases[name] = phases.get(name, 0) + (time.perf_counter() - started) * 1000
+
+
+def count_bytes(read: int = 0, written: int = 0):
+    """
+    Add to the invocation's bytes read and written.
+    """
+    if _trace is not None:
+        _trace["bytes_read"] += read
+        _trace["bytes_written"] += written
+
+
+def note(**fields):
+    """
+    Attach extra fields, such as the Todoist path that succeeded, to the trace.
+    """
+    if _trace is not None:
+        _trace["fields"].update(fields)
+
+
+def finish():
+    """
+    Write the trace line and profile for this invocation, then reset.
+
+    Runs at exit, and the note daemon calls it after every forwarded command.
+    """
+    global _trace, _profiler
+    trace, profiler = _trace, _profiler
+    _trace = _profiler = None
+
+    if profiler is not None:
+        profiler.disable()
+        default_name = f"{profiler.script}-{int(time.time())}.prof"
+        try:
+            profiler.dump_stats(output_path("NOTE_PROFILE", default_name))
+        except OSError:
+            pass
+
+    if trace is not None:
+        import json
+
+        record = {
+            "script": trace["script"],
+            "started_at": round(trace["started_at"], 3),
+            "total_ms": round((time.perf_counter() - trace["started"]) * 1000, 2),
+            "phases": {name: round(ms, 2) for name, ms in trace["phases"].items()},
+            "bytes_read": trace["bytes_read"],
+            "bytes_written": trace["bytes_written"],
+            **trace["fields"],
+        }
+        try:
+            with open(output_path("NOTE_TRACE", TRACE_FILE), "a") as file:
+                file.write(json.dumps(record) + "\n")
+        except OSError:
+            pass
+
+
+def output_path(variable: str, default_name: str):
+    """
+    Return the file named by an env var, or a default file in the state directory.
+    """
+    configured = os.environ.get(variable, "")
+    if configured and configured != "1":
+        return os.path.expanduser(configured)
+
+    from note_state import state_path
+
+    return state_path(default_name)
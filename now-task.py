@@ -15,112 +15,188 @@
 # @raycast.author masonc789
 # @raycast.authorURL https://raycast.com/masonc789
 
+from note_daemon import forward_to_daemon
+
+if __name__ == "__main__":
+    forward_to_daemon(__file__)
+
 import sys
 import os
+import json
+import signal
 import subprocess
-from datetime import datetime
-from urllib.parse import quote
-from typing import Any
-
 
-def get_daily_note_path():
+import note_trace
+from daily_note import (
+    Edit,
+    apply_edits,
+    get_daily_note_path,
+    index_sections,
+    read_section_lines,
+    split_tasks,
+)
+from note_files import locked
+from note_state import state_path
+from one_thing import set_one_thing_task
+
+TIMERPRO_BINARY = os.environ.get(
+    "TIMERPRO_BINARY", "/Applications/AS TimerPRO.app/Contents/MacOS/AS TimerPRO"
+)
+# The PID and start time of the instance this script launched last.
+TIMERPRO_STATE_FILE = "timerpro.json"
+# Set TIMERPRO_REUSE=1 to run the binary with the command while the recorded
+# instance is up instead of restarting the app. Only do this if your setup hands
+# the command to the running app and exits, or instances pile up.
+TIMERPRO_REUSE = os.environ.get("TIMERPRO_REUSE") == "1"
+# libproc's PROC_PIDTBSDINFO flavor, and where pbi_start_tvsec/pbi_start_tvusec
+# sit in its 136-byte struct proc_bsdinfo.
+PROC_PIDTBSDINFO = 3
+PROC_BSDINFO_SIZE = 136
+PROC_BSDINFO_START_OFFSET = 120
+
+
+def add_to_now_section(task_names: list, note_path: str):
     """
-    Get the path to the daily note file.
-
-    Returns:
-        str: The path to the daily note file.
-    """
-    daily_note_directory = "/Users/colin/Dropbox (Maestral)/Daily Notes"
-    current_date = datetime.now().strftime("%-m-%d-%y")
-    daily_note_filename = f"{current_date}.txt"
-    return os.path.join(daily_note_directory, daily_note_filename)
-
+    Add the tasks to the top of the 'now' section of the daily note file.
 
-def add_to_now_section(task_name: str, note_path: str):
-    """
-    Add the task to the 'now' section of the daily note file.
+    All tasks go in with one write and keep the order they were given in, so
+    the first one becomes the topmost task.
 
     Args:
-        task_name (str): The name of the task to add.
+        task_names (list): The names of the tasks to add.
         note_path (str): The path to the daily note file.
     """
     if not os.path.exists(note_path):
         print(f"Daily note for today does not exist at {note_path}")
         sys.exit(1)
 
-    with open(note_path, "r+") as file:
-        insert_task_into_now_section(file, task_name)
+    # Hold the note's lock from reading the offsets until the edit is in place
+    with locked(note_path):
+        sections = index_sections(note_path)
+        now_section = sections.get("now")
+        if now_section is None:
+            print("Could not find 'now' section in daily note.")
+            sys.exit(1)
+
+        # Insert right after the '---' line
+        insertion_point = now_section.start_byte
+        text = "".join(f"{task_name}\n" for task_name in task_names)
+        apply_edits(note_path, [Edit(insertion_point, insertion_point, text)], sections)
 
 
-def insert_task_into_now_section(file: Any, task_name: str) -> None:
+def get_topmost_now_task(note_path: str) -> str:
     """
-    Insert a task into the 'now' section of the daily note file.
+    Get the topmost task in the 'now' section of the daily note file.
 
     Args:
-        file (Any): The file object representing the daily note file.
-        task_name (str): The name of the task to insert.
+        note_path (str): The path to the daily note file.
+
+    Returns:
+        str: The topmost task in the 'now' section.
     """
-    content = file.readlines()
-    now_section_index = next(
-        (i + 2 for i, line in enumerate(content) if line.strip().lower() == "now"),
-        None,
-    )
-    if now_section_index is None:
-        print("Could not find 'now' section in daily note.")
-        sys.exit(1)
+    try:
+        now_section = index_sections(note_path).get("now")
+    except FileNotFoundError as e:
+        raise FileNotFoundError(
+            f"Daily note for today does not exist at {note_path}"
+        ) from e
+    if now_section is None:
+        raise ValueError("Could not find 'now' section in daily note.")
 
-    content.insert(now_section_index, f"{task_name}\n")
-    file.seek(0)
-    file.writelines(content)
+    for _, _, task_line in read_section_lines(note_path, now_section):
+        if task_line.strip():  # Found a non-empty line, which is our task
+            return task_line.strip()
+    return ""  # No tasks found in 'now' section
 
 
-def set_one_thing_task(task_name: str):
+def timerpro_command(duration_minutes: int) -> str:
     """
-    Set the task in the One Thing app.
-
-    Args:
-        task_name (str): The name of the task to set.
+    Return the AS TimerPRO command that starts a countdown of the given length.
     """
-    encoded_task_name = quote(task_name)  # URL-encode the task name
-    command = f"open --background 'one-thing:?text={encoded_task_name}'"
-    subprocess.run(command, shell=True, check=True)
+    hours, minutes = divmod(duration_minutes, 60)
+    return f"{{Timer#0:H{hours:02d}M{minutes:02d}S00 ModeTimer Start}}"
 
 
-def get_topmost_now_task(note_path: str) -> str:
+def process_start_time(pid: int):
     """
-    Get the topmost task in the 'now' section of the daily note file.
+    Return a process's start time as a string, or None if it has exited or
+    the platform can't tell.
 
-    Args:
-        note_path (str): The path to the daily note file.
+    Asks libproc on macOS and reads /proc elsewhere, so no subprocess is
+    started. Together with the PID this identifies one process, even after
+    the PID is reused by another.
+    """
+    if sys.platform == "darwin":
+        import ctypes
+        import struct
+
+        proc_pidinfo = ctypes.CDLL(None).proc_pidinfo
+        proc_pidinfo.argtypes = [
+            ctypes.c_int,
+            ctypes.c_int,
+            ctypes.c_uint64,
+            ctypes.c_void_p,
+            ctypes.c_int,
+        ]
+        info = ctypes.create_string_buffer(PROC_BSDINFO_SIZE)
+        if proc_pidinfo(pid, PROC_PIDTBSDINFO, 0, info, PROC_BSDINFO_SIZE) != PROC_BSDINFO_SIZE:
+            return None
+        seconds, microseconds = struct.unpack_from("QQ", info, PROC_BSDINFO_START_OFFSET)
+        return f"{seconds}.{microseconds:06d}"
+
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as file:
+            fields = file.read().rsplit(b")", 1)[1].split()
+        return fields[19].decode()  # starttime, in clock ticks since boot
+    except (OSError, IndexError):
+        return None
+
+
+def recorded_timerpro_pid():
+    """
+    Return the PID of the AS TimerPRO instance this script launched, if it is
+    still that same process.
 
     Returns:
-        str: The topmost task in the 'now' section.
+        int: The PID, or None if there is no record or it is stale.
     """
     try:
-        with open(note_path, "r") as file:
-            content = file.readlines()
-            now_section_index = next(
-                (i for i, line in enumerate(content) if line.strip().lower() == "now"),
-                None,
-            )
-            if now_section_index is None:
-                raise ValueError("Could not find 'now' section in daily note.")
-            for task_line in content[now_section_index + 2 :]:
-                if task_line.strip().lower() == "later":  # Stop at 'later' section
-                    break
-                if task_line.strip():  # Found a non-empty line, which is our task
-                    return task_line.strip()
-            return ""  # No tasks found in 'now' section
-    except FileNotFoundError as e:
-        raise FileNotFoundError(
-            f"Daily note for today does not exist at {note_path}"
-        ) from e
+        with open(state_path(TIMERPRO_STATE_FILE), "r") as file:
+            record = json.load(file)
+        pid, started = int(record["pid"]), record["started"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+    try:
+        os.kill(pid, 0)  # Signal 0 only checks that the process exists.
+    except OSError:
+        return None
+    if process_start_time(pid) != started:
+        return None
+    return pid
+
+
+def record_timerpro_pid(pid: int):
+    """
+    Remember the PID and start time of a newly launched AS TimerPRO.
+    """
+    started = process_start_time(pid)
+    if started is None:
+        return
+    path = state_path(TIMERPRO_STATE_FILE)
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}")
+    with open(temp_path, "w") as file:
+        json.dump({"pid": pid, "started": started}, file)
+    os.replace(temp_path, path)
 
 
 def is_timerpro_running() -> bool:
     """
     Check if AS TimerPRO.app is already running.
 
+    This scans every process's command line, so it is only used when there is
+    no usable PID record.
+
     Returns:
         bool: True if the app is running, False otherwise.
     """
@@ -130,53 +206,94 @@ def is_timerpro_running() -> bool:
     return result.stdout != ""
 
 
-def quit_timerpro():
+def quit_timerpro(pid=None):
     """
-    Quit AS TimerPRO.app if it's running.
+    Quit AS TimerPRO.app, by PID when it is known.
+
+    Args:
+        pid (int): The recorded instance to stop; None matches by command line.
     """
-    subprocess.run(["pkill", "-f", "AS TimerPRO.app"])
+    if pid is None:
+        subprocess.run(["pkill", "-f", "AS TimerPRO.app"])
+        return
+    try:
+        os.kill(pid, signal.SIGTERM)
+    except ProcessLookupError:
+        pass
+
+
+def run_timerpro(timer_command: str):
+    """
+    Run the AS TimerPRO binary with a command, without waiting for it.
+
+    Returns:
+        subprocess.Popen: The launched process.
+    """
+    return subprocess.Popen(
+        [TIMERPRO_BINARY, timer_command],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
 
 
 def start_timerpro_timer(duration_minutes: int):
     """
     Start a countdown timer in AS TimerPRO.app for the given duration in minutes.
 
+    The instance this script launched last is quit by its recorded PID, or,
+    without a usable record, any running instance is found by command line
+    and quit. A fresh one is then launched with the command and recorded.
+    With TIMERPRO_REUSE=1, a recorded instance that is still up is left
+    running and the binary is only run with the command.
+
     Args:
         duration_minutes (int): The duration of the timer in minutes.
     """
-    hours, minutes = divmod(duration_minutes, 60)
-    timer_command = f"{{Timer#0:H{hours:02d}M{minutes:02d}S00 ModeTimer Start}}"
-    subprocess.Popen(
-        ["/Applications/AS TimerPRO.app/Contents/MacOS/AS TimerPRO", timer_command],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-    )
+    timer_command = timerpro_command(duration_minutes)
+    pid = recorded_timerpro_pid()
+    if pid is not None and TIMERPRO_REUSE:
+        run_timerpro(timer_command)
+        return
+
+    if pid is not None:
+        quit_timerpro(pid)
+    elif is_timerpro_running():
+        quit_timerpro()
+    record_timerpro_pid(run_timerpro(timer_command).pid)
 
 
 if __name__ == "__main__":
-    task_name = sys.argv[1].strip() if len(sys.argv) > 1 else ""
+    # Several tasks can be pasted at once, one per line or separated by ";"
+    task_names = split_tasks(sys.argv[1]) if len(sys.argv) > 1 else []
     task_duration = (
         int(sys.argv[2].strip())
         if len(sys.argv) > 2 and sys.argv[2].strip().isdigit()
         else None
     )
     daily_note_path = get_daily_note_path()
+    note_trace.start(__file__)
 
-    if task_name:
-        add_to_now_section(task_name, daily_note_path)
-        print(f"Task '{task_name}' added to 'now' section of daily note.")
+    if task_names:
+        with note_trace.phase("rewrite"):
+            add_to_now_section(task_names, daily_note_path)
+        task_name = task_names[0]
+        if len(task_names) == 1:
+            print(f"Task '{task_name}' added to 'now' section of daily note.")
+        else:
+            print(f"{len(task_names)} tasks added to 'now' section of daily note.")
 
         if task_duration is not None:
-            if is_timerpro_running():
-                quit_timerpro()
-            start_timerpro_timer(task_duration)
+            with note_trace.phase("timerpro"):
+                start_timerpro_timer(task_duration)
             print(f"Timer set for {task_duration} minutes.")
 
     else:
         try:
-            task_name = get_topmost_now_task(daily_note_path)
+            with note_trace.phase("parse"):
+                task_name = get_topmost_now_task(daily_note_path)
         except (ValueError, FileNotFoundError) as e:
             print(e)
             sys.exit(1)
 
-    set_one_thing_task(task_name)
+    with note_trace.phase("one_thing"):
+        set_one_thing_task(task_name, check=True)
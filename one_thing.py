@@ -0,0 +1,76 @@
+"""
+Shows the current task in the One Thing menubar app.
+
+One Thing is driven by its URL scheme through `open`, which starts a process
+and wakes the app every time. The text last sent is remembered in the state
+directory, so asking for the text the menubar already shows costs one small
+read instead. Delete the state file if the menubar is ever changed by hand.
+"""
+
+import os
+import subprocess
+from urllib.parse import quote
+
+from note_state import state_path
+
+STATE_FILE = "one-thing.txt"
+
+
+def last_sent_text():
+    """
+    Return the text last sent to One Thing, or None if it isn't known.
+    """
+    try:
+        with open(state_path(STATE_FILE), "r", encoding="utf-8") as file:
+            return file.read()
+    except OSError:
+        return None
+
+
+def record_sent_text(text: str):
+    """
+    Remember the text One Thing was just given.
+    """
+    path = state_path(STATE_FILE)
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}")
+    with open(temp_path, "w", encoding="utf-8") as file:
+        file.write(text)
+    os.replace(temp_path, path)
+
+
+def set_one_thing_task(task_name: str, check: bool = False):
+    """
+    Set the task in the One Thing app, unless it already shows it.
+
+    Args:
+        task_name (str): The name of the task to set; "" clears the menubar.
+        check (bool): If True, raise when `open` fails instead of ignoring it.
+
+    Returns:
+        bool: True if `open` was run, False if the text was unchanged.
+
+    Raises:
+        subprocess.CalledProcessError: If check is True and `open` failed.
+    """
+    if task_name == last_sent_text():
+        return False
+
+    result = subprocess.run(
+        ["open", "--background", f"one-thing:?text={quote(task_name)}"], check=check
+    )
+    if result.returncode == 0:
+        try:
+            record_sent_text(task_name)
+        except OSError:
+            pass  # Without a record the next call just runs `open` again.
+    return True
+
+
+def remove_one_thing_task():
+    """
+    Remove the task text from the One Thing menubar app.
+
+    Returns:
+        bool: True if `open` was run, False if the menubar was already clear.
+    """
+    return set_one_thing_task("")
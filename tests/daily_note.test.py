@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+NOTE = (
+    "now\n"
+    "---\n"
+    "first task\n"
+    "second task\n"
+    "\n"
+    "later\n"
+    "---\n"
+    "someday\n"
+    "\n"
+    "done\n"
+    "---\n"
+)
+
+
+class DailyNoteTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = Path(self.directory.name)
+        self.note_path = self.root / f"{datetime.now():%-m-%d-%y}.txt"
+        self.note_path.write_text(NOTE)
+        self.state_dir = self.root / "state"
+        # In-process calls lock and cache in the state directory too.
+        import note_state
+
+        self.addCleanup(setattr, note_state, "STATE_DIR", note_state.STATE_DIR)
+        note_state.STATE_DIR = self.state_dir
+        bin_dir = self.root / "bin"
+        bin_dir.mkdir()
+        open_stub = bin_dir / "open"
+        open_stub.write_text('#!/bin/sh\nprintf "%s\\n" "$@" >> "$OPEN_STUB_LOG"\n')
+        open_stub.chmod(0o755)
+
+        self.environment = os.environ.copy()
+        self.environment.update(
+            {
+                "DAILY_NOTES_PATH": str(self.root),
+                "NOTE_SCRIPTS_STATE_DIR": str(self.state_dir),
+                "NOTE_DAEMON_DISABLE": "1",
+                "OPEN_STUB_LOG": str(self.root / "open.log"),
+                "PATH": f"{bin_dir}{os.pathsep}{os.environ['PATH']}",
+            }
+        )
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def run_script(self, name, *args):
+        return subprocess.run(
+            [sys.executable, str(ROOT / name), *args],
+            capture_output=True,
+            text=True,
+            env=self.environment,
+        )
+
+    def test_parse_sections_builds_line_and_byte_ranges(self):
+        import daily_note
+
+        data = NOTE.encode()
+        sections = daily_note.parse_sections(data)
+
+        self.assertEqual(list(sections), ["now", "later", "done"])
+        now = sections["now"]
+        self.assertEqual((now.heading_line, now.start_line, now.end_line), (0, 2, 5))
+        self.assertEqual(data[now.start_byte : now.end_byte], b"first task\nsecond task\n\n")
+        done = sections["done"]
+        self.assertEqual((done.start_line, done.end_line), (11, 11))
+        self.assertEqual(done.start_byte, len(data))
+
+    def test_index_is_cached_until_the_note_changes(self):
+        os.environ["NOTE_SCRIPTS_STATE_DIR"] = str(self.state_dir)
+        self.addCleanup(os.environ.pop, "NOTE_SCRIPTS_STATE_DIR")
+        import importlib
+        import daily_note
+        import note_state
+
+        importlib.reload(note_state)
+        importlib.reload(daily_note)
+        first = daily_note.index_sections(str(self.note_path))
+        self.assertTrue((self.state_dir / daily_note.SECTION_CACHE_FILE).exists())
+
+        daily_note._section_tables.clear()
+        calls = []
+        parse = daily_note.parse_sections
+        daily_note.parse_sections = lambda data: calls.append(data) or parse(data)
+        self.addCleanup(setattr, daily_note, "parse_sections", parse)
+        self.assertEqual(daily_note.index_sections(str(self.note_path)), first)
+        self.assertEqual(calls, [])
+
+        self.note_path.write_text("later\n---\n")
+        self.assertEqual(list(daily_note.index_sections(str(self.note_path))), ["later"])
+        self.assertEqual(len(calls), 1)
+
+    def test_same_size_save_in_one_mtime_tick_is_not_trusted(self):
+        import daily_note
+
+        note = str(self.note_path)
+        stale = daily_note.index_sections(note)
+        stat = os.stat(note)
+        # Same size and mtime, but the now section shrank and later moved up.
+        text = NOTE.replace("second task", "second", 1).replace("someday", "someday, yes", 1)
+        self.assertEqual(len(text), len(NOTE))
+        self.note_path.write_text(text)
+        os.utime(note, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+        fresh = daily_note.index_sections(note)
+        self.assertEqual(fresh, daily_note.parse_sections(text.encode()))
+        self.assertNotEqual(fresh["later"], stale["later"])
+        later = stale["later"]
+        with self.assertRaises(ValueError):
+            daily_note.apply_edits(
+                note, [daily_note.Edit(later.start_byte, later.start_byte, "x\n")], stale
+            )
+        self.assertEqual(self.note_path.read_text(), text)
+
+    def test_apply_edits_merges_into_one_ordered_write(self):
+        import daily_note
+
+        data = NOTE.encode()
+        now = daily_note.parse_sections(data)["now"]
+        daily_note.apply_edits(
+            str(self.note_path),
+            [
+                daily_note.Edit(len(data), len(data), "tail\n"),
+                daily_note.Edit(now.start_byte, now.start_byte + len(b"first task\n"), "\n"),
+                daily_note.Edit(now.start_byte, now.start_byte, "new\n"),
+            ],
+        )
+
+        text = self.note_path.read_text()
+        self.assertTrue(text.startswith("now\n---\nnew\n\nsecond task\n"))
+        self.assertTrue(text.endswith("done\n---\ntail\n"))
+        with self.assertRaises(ValueError):
+            daily_note.apply_edits(
+                str(self.note_path),
+                [daily_note.Edit(0, 5, ""), daily_note.Edit(3, 4, "")],
+            )
+
+    def test_done_task_moves_top_now_task_to_done(self):
+        result = self.run_script("done-task.py")
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("Moved 'first task' from 'now' to 'done'.", result.stdout)
+        lines = self.note_path.read_text().splitlines()
+        self.assertEqual(lines[2:4], ["", "second task"])
+        self.assertRegex(lines[-1], r"^first task - \d{1,2}-\d{2}-\d{2} \d{1,2}:\d{2} [AP]M$")
+        self.assertIn("one-thing:?text=second%20task", (self.root / "open.log").read_text())
+
+    def test_done_task_creates_a_missing_note(self):
+        self.note_path.unlink()
+        result = self.run_script("done-task.py", "call mom")
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("Task 'call mom' added to daily note.", result.stdout)
+        self.assertRegex(
+            self.note_path.read_text(), r"^call mom - \d{1,2}-\d{2}-\d{2} \d{1,2}:\d{2} [AP]M\n$"
+        )
+
+    def test_done_task_ignores_a_malformed_todoist_deadline(self):
+        self.environment["TODOIST_DEADLINE"] = "soon"
+        result = self.run_script("done-task.py", "call mom")
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("Task 'call mom' added to daily note.", result.stdout)
+        self.assertIn("call mom - ", self.note_path.read_text())
+
+    def test_later_task_adds_to_top_and_bottom(self):
+        top = self.run_script("later-task.py", "top item")
+        bottom = self.run_script("later-task.py", "bottom item -b")
+
+        self.assertEqual(top.returncode, 0, top.stderr)
+        self.assertEqual(bottom.returncode, 0, bottom.stderr)
+        lines = self.note_path.read_text().splitlines()
+        self.assertEqual(lines[7], "top item")
+        self.assertEqual(lines[lines.index("done") - 2], "bottom item")
+
+    def test_now_task_inserts_at_top_of_now(self):
+        result = self.run_script("now-task.py", "urgent")
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(self.note_path.read_text().splitlines()[2], "urgent")
+        self.assertIn("one-thing:?text=urgent", (self.root / "open.log").read_text())
+
+    def test_one_thing_is_only_opened_when_its_text_changes(self):
+        for _ in range(2):
+            result = self.run_script("now-task.py")
+            self.assertEqual(result.returncode, 0, result.stderr)
+        self.run_script("now-task.py", "urgent")
+
+        calls = (self.root / "open.log").read_text().splitlines()
+        self.assertEqual(
+            [call for call in calls if call.startswith("one-thing:")],
+            ["one-thing:?text=first%20task", "one-thing:?text=urgent"],
+        )
+        self.assertEqual((self.state_dir / "one-thing.txt").read_text(), "urgent")
+
+    def timerpro_stub(self, body):
+        timerpro = self.root / "timerpro-stub"
+        timerpro.write_text('#!/bin/sh\nprintf "%s\\n" "$@" >> "$TIMERPRO_LOG"\n' + body)
+        timerpro.chmod(0o755)
+        log_path = self.root / "timerpro.log"
+        self.environment.update(
+            {"TIMERPRO_BINARY": str(timerpro), "TIMERPRO_LOG": str(log_path)}
+        )
+        return log_path
+
+    def start_timers(self, log_path):
+        """Start a 25 then a 90 minute timer; return both recorded instances."""
+        records = []
+        for sent, (task, minutes) in enumerate((("focus", "25"), ("longer", "90")), 1):
+            result = self.run_script("now-task.py", task, minutes)
+            self.assertEqual(result.returncode, 0, result.stderr)
+            record = json.loads((self.state_dir / "timerpro.json").read_text())
+            if record not in records:
+                self.addCleanup(subprocess.run, ["kill", str(record["pid"])])
+                records.append(record)
+            deadline = time.monotonic() + 10
+            while len(log_path.read_text().splitlines()) < sent:
+                self.assertLess(time.monotonic(), deadline, "timer command not sent")
+                time.sleep(0.05)
+        self.assertEqual(
+            log_path.read_text().splitlines(),
+            [
+                "{Timer#0:H00M25S00 ModeTimer Start}",
+                "{Timer#0:H01M30S00 ModeTimer Start}",
+            ],
+        )
+        return records
+
+    def test_timer_restarts_the_recorded_timerpro_instance(self):
+        log_path = self.timerpro_stub("exec sleep 30\n")
+
+        first, second = self.start_timers(log_path)
+
+        self.assertNotEqual(first["pid"], second["pid"])
+        # The first instance was quit by its PID; at most a zombie is left.
+        deadline = time.monotonic() + 10
+        while True:
+            state = subprocess.run(
+                ["ps", "-o", "stat=", "-p", str(first["pid"])], capture_output=True, text=True
+            ).stdout.strip()
+            if not state or state.startswith("Z"):
+                break
+            self.assertLess(time.monotonic(), deadline, "first instance was not quit")
+            time.sleep(0.05)
+        os.kill(second["pid"], 0)
+
+    def test_timer_goes_to_the_running_instance_when_reuse_is_on(self):
+        # The first call stays up like the app; later calls log and exit.
+        log_path = self.timerpro_stub(
+            '[ -e "$TIMERPRO_LOG.up" ] && exit 0\ntouch "$TIMERPRO_LOG.up"\nexec sleep 30\n'
+        )
+        self.environment["TIMERPRO_REUSE"] = "1"
+
+        (record,) = self.start_timers(log_path)
+
+        os.kill(record["pid"], 0)  # Still the first instance; not restarted.
+
+    def test_split_tasks_accepts_newlines_and_semicolons(self):
+        import daily_note
+
+        self.assertEqual(
+            daily_note.split_tasks("one; two\n\nthree ;"), ["one", "two", "three"]
+        )
+
+    def test_batches_keep_their_order_in_one_write(self):
+        later = self.run_script("later-task.py", "a\nb; c -b")
+        now = self.run_script("now-task.py", "x; y")
+        done = self.run_script("done-task.py", "p\nq")
+
+        for result in (later, now, done):
+            self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("Added 3 tasks to bottom", later.stdout)
+        self.assertIn("2 tasks added to daily note.", done.stdout)
+        lines = self.note_path.read_text().splitlines()
+        self.assertEqual(lines[2:4], ["x", "y"])
+        done_index = lines.index("done")
+        self.assertEqual(lines[done_index - 6 : done_index : 2], ["a", "b", "c"])
+        self.assertEqual([line.split(" - ")[0] for line in lines[-2:]], ["p", "q"])
+        self.assertIn("one-thing:?text=x", (self.root / "open.log").read_text())
+
+    def test_concurrent_writers_queue_instead_of_losing_edits(self):
+        processes = [
+            subprocess.Popen(
+                [sys.executable, str(ROOT / "later-task.py"), f"parallel {index}"],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                env=self.environment,
+            )
+            for index in range(8)
+        ]
+        for process in processes:
+            self.assertEqual(process.wait(), 0, process.stderr.read())
+            process.stderr.close()
+
+        lines = self.note_path.read_text().splitlines()
+        self.assertEqual(
+            sorted(line for line in lines if line.startswith("parallel")),
+            [f"parallel {index}" for index in range(8)],
+        )
+        self.assertEqual([path.name for path in self.root.iterdir() if path.name.startswith(".")], [])
+        self.assertEqual(list((self.state_dir / "locks").iterdir()), [])
+
+    def test_lock_times_out_while_another_writer_holds_it(self):
+        import fcntl
+
+        import note_files
+
+        with open(note_files.lock_path(self.note_path), "a") as holder:
+            fcntl.flock(holder.fileno(), fcntl.LOCK_EX)
+            with self.assertRaises(TimeoutError):
+                with note_files.locked(self.note_path, timeout=0.05):
+                    pass
+
+        with note_files.locked(self.note_path, timeout=0.05):
+            with note_files.locked(self.note_path):
+                pass  # Re-entering from the same process does not deadlock.
+
+    def test_trace_records_phases_and_bytes_when_enabled(self):
+        self.environment["NOTE_TRACE"] = "1"
+        self.environment["NOTE_PROFILE"] = str(self.root / "later.prof")
+        result = self.run_script("later-task.py", "traced item")
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        lines = (self.state_dir / "trace.jsonl").read_text().splitlines()
+        self.assertEqual(len(lines), 1)
+        record = json.loads(lines[0])
+        self.assertEqual(record["script"], "later-task.py")
+        self.assertIn("rewrite", record["phases"])
+        self.assertGreater(record["bytes_read"], 0)
+        self.assertGreater(record["bytes_written"], 0)
+        self.assertTrue((self.root / "later.prof").exists())
+
+    def test_trace_is_off_by_default(self):
+        result = self.run_script("later-task.py", "untraced item")
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertFalse((self.state_dir / "trace.jsonl").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
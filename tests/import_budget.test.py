@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+"""
+Startup import budget for the Raycast entry points.
+
+Each script runs under `python -X importtime` and must stay within the module
+count and cumulative import time recorded in import_budget.json. After an
+intentional change, re-record with `python3 tests/import_budget.test.py --record`.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+BUDGET_PATH = Path(__file__).resolve().parent / "import_budget.json"
+RUNS = 5
+RECORD_SAMPLES = 3
+MODULE_SLACK = 2
+TIME_MARGIN = 1.25
+MS_NOISE = 10
+
+NOTE = "now\n---\n\nlater\n---\n\ndone\n---\n"
+
+# Scenario name -> (script, arguments). The note's now section starts empty, so
+# done-task.py without an argument stops before reaching Todoist.
+SCENARIOS = {
+    "done-task.py (nothing to do)": ("done-task.py", []),
+    "done-task.py": ("done-task.py", ["shipped it"]),
+    "now-task.py": ("now-task.py", ["focus"]),
+    "later-task.py": ("later-task.py", ["someday"]),
+    "thought_log_entry.py": ("thought_log_entry.py", ["an idea"]),
+    "thought_log_now.py": ("thought_log_now.py", []),
+    "todoist-outbox.py": ("todoist-outbox.py", []),
+}
+
+
+def parse_importtime(stderr: str):
+    """
+    Return (module names, cumulative milliseconds) from -X importtime output.
+    """
+    names, cumulative_us = [], 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|", 2)
+        names.append(name.strip())
+        if not name[1:].startswith(" "):  # Top level; nested imports are indented.
+            cumulative_us += int(cumulative)
+    return names, cumulative_us / 1000
+
+
+def import_script(script: str, arguments):
+    """
+    Run a script once in a scratch note tree and return its parsed import log.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        root = Path(directory)
+        (root / f"{datetime.now():%-m-%d-%y}.txt").write_text(NOTE)
+        bin_dir = root / "bin"
+        bin_dir.mkdir()
+        for stub in ("open", "zed"):
+            (bin_dir / stub).write_text("#!/bin/sh\n")
+            (bin_dir / stub).chmod(0o755)
+        environment = os.environ.copy()
+        environment.update(
+            {
+                "DAILY_NOTES_PATH": str(root),
+                "THOUGHT_LOG_PATH": str(root / "thought log.txt"),
+                "NOTE_SCRIPTS_STATE_DIR": str(root / "state"),
+                "NOTE_DAEMON_DISABLE": "1",
+                "ZED_CLI": str(bin_dir / "zed"),
+                "TODOIST_API_URL": "http://127.0.0.1:9",
+                "TODOIST_API_TOKEN": "budget-token",
+                "TODOIST_DEADLINE": "1",
+                "PATH": f"{bin_dir}{os.pathsep}{os.environ['PATH']}",
+            }
+        )
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", str(ROOT / script), *arguments],
+            capture_output=True,
+            text=True,
+            env=environment,
+            cwd=root,
+        )
+    return parse_importtime(result.stderr)
+
+
+def measure(script: str, arguments):
+    """
+    Return a script's (module count, import_ms); the time is the fastest of RUNS.
+    """
+    results = [import_script(script, arguments) for _ in range(RUNS)]
+    return len(results[0][0]), min(milliseconds for _, milliseconds in results)
+
+
+def python_version():
+    return f"{sys.version_info.major}.{sys.version_info.minor}"
+
+
+def record_budget():
+    """
+    Measure every scenario and write the budget with a little headroom.
+
+    The margin is kept tight so a regression of a few modules or a quarter of
+    the import time fails the test; MS_NOISE only absorbs timer jitter.
+    """
+    scripts = {}
+    for name, (script, arguments) in SCENARIOS.items():
+        # The slowest of a few fastest-of-RUNS, so one lucky run can't set it.
+        samples = [measure(script, arguments) for _ in range(RECORD_SAMPLES)]
+        modules = samples[0][0]
+        milliseconds = max(sample_ms for _, sample_ms in samples)
+        scripts[name] = {
+            "modules": modules + MODULE_SLACK,
+            "import_ms": round(milliseconds * TIME_MARGIN + MS_NOISE),
+        }
+        print(f"{name}: {modules} modules, {milliseconds:.1f} ms")
+    budget = {"python": python_version(), "scripts": scripts}
+    BUDGET_PATH.write_text(json.dumps(budget, indent=2) + "\n")
+
+
+class ImportBudgetTests(unittest.TestCase):
+    def setUp(self):
+        self.budget = json.loads(BUDGET_PATH.read_text())
+        if self.budget["python"] != python_version():
+            self.skipTest(f"budget was recorded on Python {self.budget['python']}")
+
+    def test_parse_importtime_counts_modules_and_top_level_time(self):
+        stderr = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       100 |        100 |   _io\n"
+            "import time:       200 |        300 | io\n"
+            "import time:        50 |         50 | json\n"
+        )
+        self.assertEqual(parse_importtime(stderr), (["_io", "io", "json"], 0.35))
+
+    def test_entry_points_stay_within_budget(self):
+        for name, (script, arguments) in SCENARIOS.items():
+            with self.subTest(name):
+                limit = self.budget["scripts"][name]
+                modules, milliseconds = measure(script, arguments)
+                self.assertLessEqual(modules, limit["modules"])
+                self.assertLessEqual(milliseconds, limit["import_ms"])
+
+    def test_done_task_skips_todoist_when_it_is_not_reached(self):
+        names, _ = import_script("done-task.py", [])
+
+        self.assertIn("daily_note", names)
+        self.assertNotIn("todoist_client", names)
+        self.assertNotIn("http.client", names)
+
+
+if __name__ == "__main__":
+    if "--record" in sys.argv:
+        record_budget()
+    else:
+        unittest.main()
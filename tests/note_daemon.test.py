@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+DAEMON = ROOT / "note_daemon.py"
+SCRIPT = ROOT / "thought_log_now.py"
+NOTE = "later\n---\nsomeday\n\ndone\n---\n"
+
+
+class NoteDaemonTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        root = Path(self.directory.name)
+        self.log_path = root / "thought log.txt"
+        self.args_path = root / "zed-args.txt"
+        self.socket_path = root / "daemon.sock"
+        zed_path = root / "zed-stub"
+        zed_path.write_text(
+            "#!/bin/sh\n"
+            'printf "%s\\n" "$@" > "$THOUGHT_LOG_ZED_ARGS"\n'
+        )
+        zed_path.chmod(0o755)
+
+        self.environment = os.environ.copy()
+        self.environment.update(
+            {
+                "THOUGHT_LOG_PATH": str(self.log_path),
+                "DAILY_NOTES_PATH": str(root),
+                "ZED_CLI": str(zed_path),
+                "THOUGHT_LOG_ZED_ARGS": str(self.args_path),
+                "NOTE_SCRIPTS_STATE_DIR": str(root / "state"),
+                "NOTE_DAEMON_SOCKET": str(self.socket_path),
+            }
+        )
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def start_daemon(self):
+        daemon = subprocess.Popen([sys.executable, str(DAEMON)], env=self.environment)
+        self.addCleanup(daemon.wait)
+        self.addCleanup(daemon.terminate)
+        deadline = time.monotonic() + 10
+        while not self.socket_path.exists():
+            self.assertLess(time.monotonic(), deadline, "daemon did not start")
+            time.sleep(0.05)
+
+    def run_script(self):
+        return subprocess.run(
+            [sys.executable, "-X", "importtime", str(SCRIPT)],
+            capture_output=True,
+            text=True,
+            env=self.environment,
+        )
+
+    def test_runs_script_inside_daemon(self):
+        self.start_daemon()
+        first = self.run_script()
+        second = self.run_script()
+
+        self.assertEqual(first.returncode, 0, first.stderr)
+        self.assertEqual(second.returncode, 0, second.stderr)
+        self.assertIn("Replaced empty timestamp with new one", second.stdout)
+        self.assertNotIn("thought_log_store", second.stderr)
+        self.assertEqual(
+            self.args_path.read_text().splitlines()[1], f"{self.log_path}:3"
+        )
+
+    def test_falls_back_when_daemon_is_not_running(self):
+        result = self.run_script()
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("thought_log_store", result.stderr)
+        self.assertTrue(self.log_path.exists())
+
+    def test_gives_up_on_a_daemon_that_never_replies(self):
+        wedged = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.addCleanup(wedged.close)
+        wedged.bind(str(self.socket_path))
+        wedged.listen()
+        self.environment["NOTE_DAEMON_TIMEOUT"] = "1"
+
+        result = self.run_script()
+
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("Note daemon did not reply within 1s", result.stderr)
+        # The request was sent, so it is not also run locally.
+        self.assertFalse(self.log_path.exists())
+
+    def run_later_task(self, task):
+        return subprocess.run(
+            [sys.executable, str(ROOT / "later-task.py"), task],
+            capture_output=True,
+            text=True,
+            env=self.environment,
+        )
+
+    def test_write_behind_holds_edits_until_flushed(self):
+        note_path = Path(self.directory.name) / f"{datetime.now():%-m-%d-%y}.txt"
+        note_path.write_text(NOTE)
+        self.environment["NOTE_WRITE_BEHIND"] = "60"
+        self.start_daemon()
+
+        for task in ("first", "second"):
+            result = self.run_later_task(task)
+            self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(note_path.read_text(), NOTE)
+
+        flushed = subprocess.run(
+            [sys.executable, str(ROOT / "note-flush.py")],
+            capture_output=True,
+            text=True,
+            env=self.environment,
+        )
+        self.assertEqual(flushed.returncode, 0, flushed.stderr)
+        self.assertIn("Wrote 1 note", flushed.stdout)
+        # The second edit read the buffered first one.
+        self.assertEqual(
+            note_path.read_text(), NOTE.replace("someday", "second\n\nfirst\n\nsomeday")
+        )
+
+    def test_search_runs_outside_daemon_after_flushing_it(self):
+        note_path = Path(self.directory.name) / f"{datetime.now():%-m-%d-%y}.txt"
+        note_path.write_text(NOTE)
+        self.environment["NOTE_WRITE_BEHIND"] = "60"
+        self.start_daemon()
+        self.assertEqual(self.run_later_task("buffered").returncode, 0)
+
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", str(ROOT / "note-search.py"), "buffered"],
+            capture_output=True,
+            text=True,
+            env=self.environment,
+        )
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("note_index", result.stderr)
+        self.assertIn("buffered", result.stdout)
+        self.assertIn("buffered", note_path.read_text())
+
+    def test_write_behind_keeps_external_edits(self):
+        note_path = Path(self.directory.name) / f"{datetime.now():%-m-%d-%y}.txt"
+        note_path.write_text(NOTE)
+        self.environment["NOTE_WRITE_BEHIND"] = "60"
+        self.start_daemon()
+
+        result = self.run_later_task("buffered")
+        self.assertEqual(result.returncode, 0, result.stderr)
+        note_path.write_text("edited elsewhere\n")
+        flushed = subprocess.run(
+            [sys.executable, str(ROOT / "note-flush.py")],
+            capture_output=True,
+            text=True,
+            env=self.environment,
+        )
+
+        self.assertEqual(flushed.returncode, 0, flushed.stderr)
+        self.assertIn("changed on disk", flushed.stderr)
+        self.assertEqual(note_path.read_text(), "edited elsewhere\n")
+        (conflict,) = Path(self.directory.name).glob("* (unsaved edits *).txt")
+        self.assertIn("buffered", conflict.read_text())
+
+    def test_write_behind_flushes_after_quiet_period(self):
+        note_path = Path(self.directory.name) / f"{datetime.now():%-m-%d-%y}.txt"
+        note_path.write_text(NOTE)
+        self.environment["NOTE_WRITE_BEHIND"] = "0.2"
+        self.start_daemon()
+
+        result = self.run_later_task("soon")
+        self.assertEqual(result.returncode, 0, result.stderr)
+        deadline = time.monotonic() + 10
+        while note_path.read_text() == NOTE:
+            self.assertLess(time.monotonic(), deadline, "edit was never written")
+            time.sleep(0.05)
+        self.assertEqual(note_path.read_text(), NOTE.replace("someday", "soon\n\nsomeday"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from datetime import date
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+SCRIPT = ROOT / "note-search.py"
+
+
+class NoteSearchTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = Path(self.directory.name)
+        (self.root / "3-07-25.txt").write_text(
+            "now\n---\nfix the bike brakes\n\ndone\n---\nbuy coffee - 3-07-25 9:00 AM\n"
+        )
+        (self.root / "3-08-25.txt").write_text("now\n---\nbike ride to the lake\n")
+        (self.root / "notes.txt").write_text("bike bike bike\n")
+        self.log_path = self.root / "thought log.txt"
+        self.log_path.write_text(
+            "3-09-25\n---\n8:00 AM - brakes squeal again\n\n\n"
+            "3-06-25\n---\n7:00 PM - thinking about brakes\n\n\n"
+        )
+
+        self.environment = os.environ.copy()
+        self.environment.update(
+            {
+                "DAILY_NOTES_PATH": str(self.root),
+                "THOUGHT_LOG_PATH": str(self.log_path),
+                "NOTE_SCRIPTS_STATE_DIR": str(self.root / "state"),
+                "NOTE_DAEMON_DISABLE": "1",
+            }
+        )
+        for key in ("DAILY_NOTES_PATH", "THOUGHT_LOG_PATH", "NOTE_SCRIPTS_STATE_DIR"):
+            os.environ[key] = self.environment[key]
+        sys.path.insert(0, str(ROOT))
+        for name in ("daily_note", "note_state", "thought_log_store", "note_index"):
+            sys.modules.pop(name, None)
+        import note_index
+
+        self.note_index = note_index
+        self.connection = note_index.open_index()
+
+    def tearDown(self):
+        self.connection.close()
+        self.directory.cleanup()
+
+    def test_indexes_dated_notes_and_the_thought_log(self):
+        indexed, removed = self.note_index.update_index(self.connection)
+
+        self.assertEqual((indexed, removed), (3, 0))
+        hits = self.note_index.search(self.connection, "bike")
+        self.assertEqual(
+            [(hit.day, hit.line) for hit in hits],
+            [(date(2025, 3, 8), 3), (date(2025, 3, 7), 3)],
+        )
+
+    def test_ranks_lines_matching_more_words_first(self):
+        self.note_index.update_index(self.connection)
+
+        hits = self.note_index.search(self.connection, "bike brakes")
+
+        self.assertEqual(hits[0].text, "fix the bike brakes")
+        self.assertEqual(hits[0].matched, 2)
+        # "bike" is on fewer lines than "brakes", so its line outranks theirs.
+        self.assertEqual(
+            [hit.day for hit in hits[1:]],
+            [date(2025, 3, 8), date(2025, 3, 9), date(2025, 3, 6)],
+        )
+
+    def test_only_changed_files_are_reindexed(self):
+        self.note_index.update_index(self.connection)
+        self.assertEqual(self.note_index.update_index(self.connection), (0, 0))
+
+        note = self.root / "3-08-25.txt"
+        note.write_text("now\n---\nswim at the lake\n")
+        os.utime(note, ns=(time.time_ns(), time.time_ns() + 1_000_000))
+        (self.root / "3-07-25.txt").unlink()
+
+        self.assertEqual(self.note_index.update_index(self.connection), (1, 1))
+        self.assertEqual(self.note_index.search(self.connection, "bike"), [])
+        self.assertEqual(self.note_index.search(self.connection, "swim")[0].line, 3)
+
+    def test_script_prints_ranked_hits(self):
+        result = subprocess.run(
+            [sys.executable, str(SCRIPT), "brakes"],
+            capture_output=True,
+            text=True,
+            env=self.environment,
+        )
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        lines = result.stdout.splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertIn("thought log:3", lines[0])
+        self.assertIn("brakes squeal again", lines[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from datetime import date, timedelta
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+SCRIPT = ROOT / "note-stats.py"
+
+
+def note_text(day, completions, open_tasks=()):
+    done = "".join(
+        f"task {index} - {day.month}-{day:%d-%y} {stamp}\n"
+        for index, stamp in enumerate(completions)
+    )
+    return "now\n---\n" + "".join(f"{task}\n" for task in open_tasks) + "\ndone\n---\n" + done
+
+
+class NoteStatsTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = Path(self.directory.name)
+        self.today = date.today()
+        for offset in range(10):
+            day = self.today - timedelta(days=offset)
+            (self.root / f"{day.month}-{day:%d-%y}.txt").write_text(
+                note_text(day, ["9:00 AM", "9:30 AM", "11:00 AM"], ["left over"])
+            )
+        (self.root / "not a note.txt").write_text("done\n---\nx - 1-01-20 9:00 AM\n")
+
+        self.environment = os.environ.copy()
+        self.environment.update(
+            {
+                "DAILY_NOTES_PATH": str(self.root),
+                "NOTE_SCRIPTS_STATE_DIR": str(self.root / "state"),
+                "NOTE_DAEMON_DISABLE": "1",
+            }
+        )
+        for key in ("DAILY_NOTES_PATH", "NOTE_SCRIPTS_STATE_DIR"):
+            os.environ[key] = self.environment[key]
+        sys.path.insert(0, str(ROOT))
+        for name in ("daily_note", "note_state", "note_analytics"):
+            sys.modules.pop(name, None)
+        import note_analytics
+
+        self.note_analytics = note_analytics
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_summarizes_completions_and_open_tasks(self):
+        path = str(self.root / f"{self.today.month}-{self.today:%d-%y}.txt")
+
+        _, _, _, summary = self.note_analytics.summarize_note(path)
+
+        self.assertEqual(summary["day"], self.today.isoformat())
+        self.assertEqual(summary["open"], 1)
+        self.assertEqual(
+            summary["completed"],
+            [f"{self.today.isoformat()}T{time}" for time in ("09:00", "09:30", "11:00")],
+        )
+
+    def test_parses_in_parallel_then_only_changed_notes(self):
+        summaries, parsed = self.note_analytics.collect_summaries(max_workers=2)
+        self.assertEqual((len(summaries), parsed), (10, 10))
+
+        tomorrow = self.today + timedelta(days=1)
+        (self.root / f"{tomorrow.month}-{tomorrow:%d-%y}.txt").write_text(
+            note_text(tomorrow, ["8:00 PM"])
+        )
+        summaries, parsed = self.note_analytics.collect_summaries()
+        self.assertEqual((len(summaries), parsed), (11, 1))
+
+        self.assertEqual(self.note_analytics.collect_summaries()[1], 0)
+
+    def test_aggregates_days_weeks_hours_and_gaps(self):
+        summaries, _ = self.note_analytics.collect_summaries()
+        times = self.note_analytics.completion_times(summaries)
+
+        self.assertEqual(self.note_analytics.completions_per_day(times)[self.today], 3)
+        self.assertEqual(sum(self.note_analytics.completions_per_week(times).values()), 30)
+        self.assertEqual(self.note_analytics.hour_histogram(times), {9: 20, 11: 10})
+        gaps = self.note_analytics.completion_gaps(times)
+        self.assertEqual(sorted(set(gaps)), [30, 90])
+        self.assertEqual(len(gaps), 20)
+
+    def test_script_prints_charts(self):
+        result = subprocess.run(
+            [sys.executable, str(SCRIPT), "7"],
+            capture_output=True,
+            text=True,
+            env=self.environment,
+        )
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("Completed per day (last 7 days, 21 total)", result.stdout)
+        self.assertIn("median 60 min", result.stdout)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+
+SCRIPT = Path(__file__).resolve().parents[1] / "thought_log_entry.py"
+
+
+class ThoughtLogEntryTests(unittest.TestCase):
+    def run_script(self, root, entry):
+        log_path = Path(root) / "thought log.txt"
+        environment = os.environ.copy()
+        environment["THOUGHT_LOG_PATH"] = str(log_path)
+        environment["NOTE_SCRIPTS_STATE_DIR"] = str(Path(root) / "state")
+        environment["NOTE_DAEMON_DISABLE"] = "1"
+        result = subprocess.run(
+            [sys.executable, str(SCRIPT), entry],
+            capture_output=True,
+            text=True,
+            env=environment,
+        )
+        return result, log_path
+
+    def test_creates_log_with_first_entry(self):
+        with tempfile.TemporaryDirectory() as directory:
+            result, log_path = self.run_script(directory, "first")
+
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertIn("New log file created", result.stdout)
+            lines = log_path.read_text().splitlines()
+            self.assertRegex(lines[0], r"^\d{1,2}-\d{2}-\d{2}$")
+            self.assertRegex(lines[2], r"^\d{1,2}:\d{2} [AP]M - first$")
+
+    def test_adds_under_today_and_keeps_older_days(self):
+        with tempfile.TemporaryDirectory() as directory:
+            log_path = Path(directory) / "thought log.txt"
+            older = "1-01-20\n---\n4:00 PM - An old entry\n\n\n"
+            log_path.write_text(older)
+            self.run_script(directory, "first")
+            result, log_path = self.run_script(directory, "second")
+
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertIn("under today's date", result.stdout)
+            text = log_path.read_text()
+            self.assertLess(text.index("second"), text.index("first"))
+            self.assertTrue(text.endswith(older))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from datetime import date, timedelta
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+SCRIPT = ROOT / "thought_log_jump.py"
+sys.path.insert(0, str(ROOT))
+
+import thought_log_store  # noqa: E402
+
+
+def build_log(days):
+    """
+    Return newest-first log text and each day's header offset.
+    """
+    parts, offsets = ["notes\n---not a header\n\n"], {}
+    position = len(parts[0])
+    for index, day in enumerate(sorted(days, reverse=True)):
+        section = (
+            f"{day.month}-{day:%d-%y}\n---\n"
+            f"9:0{index % 10} AM - entry {index}\n---\n\n"
+        )
+        offsets[day] = position
+        parts.append(section)
+        position += len(section)
+    return "".join(parts), offsets
+
+
+class ThoughtLogJumpTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = Path(self.directory.name)
+        self.log_path = self.root / "thought log.txt"
+        start = date(2022, 1, 1)
+        self.days = [start + timedelta(days=n) for n in range(0, 900, 3)]
+        content, self.offsets = build_log(self.days)
+        self.log_path.write_text(content)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_finds_every_day_and_falls_back_to_the_nearest_older_day(self):
+        for day in self.days:
+            self.assertEqual(
+                thought_log_store.find_day_header(self.log_path, day),
+                (self.offsets[day], day),
+            )
+        self.assertEqual(
+            thought_log_store.find_day_header(self.log_path, self.days[1] + timedelta(days=1)),
+            (self.offsets[self.days[1]], self.days[1]),
+        )
+        self.assertIsNone(
+            thought_log_store.find_day_header(self.log_path, self.days[0] - timedelta(days=1))
+        )
+
+    def test_line_number_matches_offset(self):
+        offset = self.offsets[self.days[40]]
+        content = self.log_path.read_text()
+        self.assertEqual(
+            thought_log_store.line_number_at(self.log_path, offset),
+            content[:offset].count("\n") + 1,
+        )
+
+    def run_script(self, *args):
+        zed_path = self.root / "zed-stub"
+        args_path = self.root / "zed-args.txt"
+        zed_path.write_text('#!/bin/sh\nprintf "%s\\n" "$@" > "$THOUGHT_LOG_ZED_ARGS"\n')
+        zed_path.chmod(0o755)
+        environment = os.environ.copy()
+        environment.update(
+            {
+                "THOUGHT_LOG_PATH": str(self.log_path),
+                "DAILY_NOTES_PATH": str(self.root),
+                "ZED_CLI": str(zed_path),
+                "THOUGHT_LOG_ZED_ARGS": str(args_path),
+                "NOTE_SCRIPTS_STATE_DIR": str(self.root / "state"),
+                "NOTE_DAEMON_DISABLE": "1",
+            }
+        )
+        result = subprocess.run(
+            [sys.executable, str(SCRIPT), *args],
+            capture_output=True,
+            text=True,
+            env=environment,
+        )
+        return result, args_path
+
+    def test_opens_zed_at_the_requested_day(self):
+        day = self.days[100]
+        result, args_path = self.run_script(day.strftime("%Y-%m-%d"))
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        line = self.log_path.read_text()[: self.offsets[day]].count("\n") + 1
+        self.assertEqual(
+            args_path.read_text().splitlines(), [str(self.root), f"{self.log_path}:{line}"]
+        )
+
+    def test_searches_the_monthly_archive(self):
+        archived = date(2019, 5, 14)
+        archive = thought_log_store.archive_path(self.log_path, archived)
+        archive.parent.mkdir()
+        archive.write_text("5-20-19\n---\nlater\n\n\n5-14-19\n---\nthat day\n\n\n")
+
+        result, args_path = self.run_script("5/14/19")
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(args_path.read_text().splitlines()[1], f"{archive}:6")
+
+    def test_falls_back_to_an_older_months_archive(self):
+        directory = thought_log_store.archive_directory(self.log_path)
+        directory.mkdir()
+        older = thought_log_store.archive_path(self.log_path, date(2019, 3, 1))
+        older.write_text("3-30-19\n---\nend of march\n\n\n")
+        oldest = thought_log_store.archive_path(self.log_path, date(2019, 1, 1))
+        oldest.write_text("1-10-19\n---\njanuary\n\n\n")
+        # May has an archive, but nothing as early as the 2nd; April has none.
+        thought_log_store.archive_path(self.log_path, date(2019, 5, 1)).write_text(
+            "5-20-19\n---\nlater\n\n\n"
+        )
+
+        result, args_path = self.run_script("5/2/19")
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("opened the nearest earlier day, 3-30-19", result.stdout)
+        self.assertEqual(args_path.read_text().splitlines()[1], f"{older}:1")
+
+    def test_rejects_text_that_is_not_a_date(self):
+        result, _ = self.run_script("someday")
+
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("Expected a date", result.stdout)
+
+
+if __name__ == "__main__":
+    unittest.main()
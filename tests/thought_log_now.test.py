@@ -5,14 +5,16 @@ import subprocess
 import sys
 import tempfile
 import unittest
+from datetime import datetime, timedelta
 from pathlib import Path
 
 
 SCRIPT = Path(__file__).resolve().parents[1] / "thought_log_now.py"
+sys.path.insert(0, str(SCRIPT.parent))
 
 
 class ThoughtLogNowTests(unittest.TestCase):
-    def run_script(self, root, zed_exit=0):
+    def run_script(self, root, zed_exit=0, extra_env=None):
         root = Path(root)
         log_path = root / "thought log.txt"
         args_path = root / "zed-args.txt"
@@ -31,8 +33,11 @@ class ThoughtLogNowTests(unittest.TestCase):
                 "DAILY_NOTES_PATH": str(root),
                 "ZED_CLI": str(zed_path),
                 "THOUGHT_LOG_ZED_ARGS": str(args_path),
+                "NOTE_SCRIPTS_STATE_DIR": str(root / "state"),
+                "NOTE_DAEMON_DISABLE": "1",
             }
         )
+        environment.update(extra_env or {})
         result = subprocess.run(
             [sys.executable, str(SCRIPT)],
             capture_output=True,
@@ -105,6 +110,133 @@ class ThoughtLogNowTests(unittest.TestCase):
             self.assertIn("4:00 PM - A real entry", text)
             self.assertIn("3:00 PM -", text)
 
+    def test_month_rotation_moves_older_days_into_archive(self):
+        with tempfile.TemporaryDirectory() as directory:
+            log_path = Path(directory) / "thought log.txt"
+            log_path.write_text(
+                "1-02-20\n"
+                "---\n"
+                "4:00 PM - Newer entry\n"
+                "\n"
+                "\n"
+                "1-01-20\n"
+                "---\n"
+                "3:00 PM - Older entry\n"
+                "\n"
+                "\n"
+            )
+            result, log_path, args_path = self.run_script(
+                directory, extra_env={"THOUGHT_LOG_ROTATE": "month"}
+            )
+
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertIn("Archived 2 older day(s)", result.stdout)
+            text = log_path.read_text()
+            self.assertNotIn("entry", text)
+            archive = Path(directory) / "thought log archive" / "thought log 2020-01.txt"
+            self.assertEqual(
+                archive.read_text().index("1-02-20"), 0, "archive stays newest-first"
+            )
+            self.assertIn("3:00 PM - Older entry", archive.read_text())
+            self.assertEqual(args_path.read_text().splitlines()[1], f"{log_path}:3")
+
+    def test_month_rotation_archives_previous_day_cleaned(self):
+        with tempfile.TemporaryDirectory() as directory:
+            log_path = Path(directory) / "thought log.txt"
+            log_path.write_text(
+                "1-31-20\n"
+                "---\n"
+                "5:00 PM - \n"
+                "\n"
+                "\n"
+                "4:00 PM - Last entry of the month\n"
+                "\n"
+                "\n"
+            )
+            result, log_path, _ = self.run_script(
+                directory, extra_env={"THOUGHT_LOG_ROTATE": "month"}
+            )
+
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertIn("Cleaned 1 empty timestamp from 1-31-20", result.stdout)
+            self.assertIn("Archived 1 older day(s)", result.stdout)
+            archive = Path(directory) / "thought log archive" / "thought log 2020-01.txt"
+            self.assertNotIn("5:00 PM -", archive.read_text())
+            self.assertIn("4:00 PM - Last entry of the month", archive.read_text())
+
+    def test_size_rotation_keeps_newest_day(self):
+        with tempfile.TemporaryDirectory() as directory:
+            log_path = Path(directory) / "thought log.txt"
+            log_path.write_text(
+                "1-01-20\n---\n" + "3:00 PM - " + "x" * 200 + "\n\n\n"
+            )
+            result, log_path, _ = self.run_script(
+                directory, extra_env={"THOUGHT_LOG_MAX_BYTES": "100"}
+            )
+
+            self.assertEqual(result.returncode, 0, result.stderr)
+            archive = Path(directory) / "thought log archive" / "thought log 2020-01.txt"
+            self.assertIn("x" * 200, archive.read_text())
+            self.assertNotIn("1-01-20", log_path.read_text())
+
+    def test_size_rotation_skips_undated_sections(self):
+        with tempfile.TemporaryDirectory() as directory:
+            log_path = Path(directory) / "thought log.txt"
+            log_path.write_text(
+                "1-02-20\n---\n3:00 PM - " + "x" * 100 + "\n\n\n"
+                "1-01-20\n---\n3:00 PM - " + "y" * 100 + "\n\n\n"
+                "13-45-19\n---\nnot a real day\n\n\n"
+            )
+            result, log_path, _ = self.run_script(
+                directory, extra_env={"THOUGHT_LOG_MAX_BYTES": "100"}
+            )
+
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertIn("Archived 2 older day(s)", result.stdout)
+            text = log_path.read_text()
+            self.assertIn("13-45-19", text)
+            self.assertNotIn("1-01-20", text)
+            self.assertNotIn("1-02-20", text)
+
+    def test_size_rotation_is_not_retried_the_same_day_once_stuck(self):
+        with tempfile.TemporaryDirectory() as directory:
+            state_dir = Path(directory) / "state"
+            log_path = Path(directory) / "thought log.txt"
+            log_path.write_text("13-45-19\n---\n" + "z" * 200 + "\n\n\n")
+            result, log_path, _ = self.run_script(
+                directory, extra_env={"THOUGHT_LOG_MAX_BYTES": "100"}
+            )
+            self.assertEqual(result.returncode, 0, result.stderr)
+
+            import note_state
+            import thought_log_store
+
+            self.addCleanup(setattr, note_state, "STATE_DIR", note_state.STATE_DIR)
+            self.addCleanup(setattr, thought_log_store, "MAX_BYTES", thought_log_store.MAX_BYTES)
+            note_state.STATE_DIR = state_dir
+            thought_log_store.MAX_BYTES = 100
+            today = datetime.now().date()
+            self.assertFalse(thought_log_store.needs_rotation(log_path, today))
+            self.assertTrue(
+                thought_log_store.needs_rotation(log_path, today + timedelta(days=1))
+            )
+
+    def test_streams_older_days_unchanged(self):
+        with tempfile.TemporaryDirectory() as directory:
+            log_path = Path(directory) / "thought log.txt"
+            older = "".join(
+                f"12-{day:02d}-19\n---\n3:00 PM - " + "y" * 100_000 + "\n\n\n"
+                for day in range(31, 20, -1)
+            )
+            log_path.write_text("1-01-20\n---\n5:00 PM - \n\n\n" + older)
+            result, log_path, args_path = self.run_script(directory)
+
+            self.assertEqual(result.returncode, 0, result.stderr)
+            text = log_path.read_text()
+            self.assertTrue(text.endswith(older))
+            self.assertNotIn("5:00 PM", text)
+            self.assertEqual(args_path.read_text().splitlines()[1], f"{log_path}:3")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs
+
+
+ROOT = Path(__file__).resolve().parents[1]
+SCRIPT = ROOT / "todoist-backfill.py"
+FIRST_DAY = date(2024, 1, 1)
+
+
+class BackfillTodoist(BaseHTTPRequestHandler):
+    """Accepts Sync commands, except for requests given a scripted answer."""
+
+    protocol_version = "HTTP/1.1"
+    scripted = {}  # request number -> (status, headers) to answer with instead
+    rejected = set()  # Task names whose commands get an error status
+    batches = []  # Commands of every request, accepted or not
+
+    def do_POST(self):
+        form = parse_qs(self.rfile.read(int(self.headers["Content-Length"] or 0)).decode())
+        commands = json.loads(form["commands"][0])
+        self.batches.append(commands)
+        if len(self.batches) in self.scripted:
+            status, headers = self.scripted[len(self.batches)]
+            body = b"{}"
+        else:
+            status, headers = 200, {}
+            refused = {
+                command["temp_id"]
+                for command in commands
+                if command["type"] == "item_add" and command["args"]["content"] in self.rejected
+            }
+            body = json.dumps(
+                {
+                    "sync_status": {
+                        command["uuid"]: (
+                            {"error": "refused"}
+                            if refused & {command.get("temp_id"), command["args"].get("id")}
+                            else "ok"
+                        )
+                        for command in commands
+                    }
+                }
+            ).encode()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TodoistBackfillTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.root = Path(self.directory.name)
+        # 40 completions on each of three days, then a day that is already in Todoist.
+        for offset in range(4):
+            day = FIRST_DAY + timedelta(days=offset)
+            lines = [f"task {offset}-{index} - {day:%-m-%d-%y} 9:{index:02d} AM" for index in range(40)]
+            (self.root / f"{day:%-m-%d-%y}.txt").write_text(
+                "now\n---\n\ndone\n---\n" + "\n".join(lines) + "\n"
+            )
+
+        BackfillTodoist.scripted = {}
+        BackfillTodoist.rejected = set()
+        BackfillTodoist.batches = []
+        server = ThreadingHTTPServer(("127.0.0.1", 0), BackfillTodoist)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        self.environment = os.environ.copy()
+        self.environment.update(
+            {
+                "DAILY_NOTES_PATH": str(self.root),
+                "NOTE_SCRIPTS_STATE_DIR": str(self.root / "state"),
+                "NOTE_DAEMON_DISABLE": "1",
+                "TODOIST_API_URL": f"http://127.0.0.1:{server.server_port}",
+                "TODOIST_API_TOKEN": "token",
+            }
+        )
+
+    def backfill(self, *args):
+        return subprocess.run(
+            [sys.executable, str(SCRIPT), *args],
+            capture_output=True,
+            text=True,
+            env=self.environment,
+        )
+
+    def test_packs_full_requests_and_resumes_after_failure(self):
+        BackfillTodoist.scripted = {1: (429, {"Retry-After": "1"}), 3: (500, {})}
+        started = time.monotonic()
+        first = self.backfill("1-04-24")
+        elapsed = time.monotonic() - started
+
+        self.assertEqual(first.returncode, 1, first.stdout)
+        self.assertIn("Rate limited; waiting 1s.", first.stdout)
+        self.assertIn("Sent 50 completion(s) this run", first.stdout)
+        self.assertGreaterEqual(elapsed, 1)
+
+        second = self.backfill("1-04-24")
+        self.assertEqual(second.returncode, 0, second.stdout)
+        self.assertIn("Resuming after 2024-01-02 line 15.", second.stdout)
+        self.assertIn("Sent 70 completion(s) in 2 request(s).", second.stdout)
+
+        # 429, batch 1, failed batch 2, then batch 2 replayed with the same uuids and batch 3.
+        batches = BackfillTodoist.batches
+        self.assertEqual([len(commands) for commands in batches], [100, 100, 100, 100, 40])
+        self.assertEqual(batches[2], batches[3])
+        accepted = [batches[1], batches[3], batches[4]]
+        adds = [c for commands in accepted for c in commands if c["type"] == "item_add"]
+        self.assertEqual(len(adds), 120)
+        self.assertEqual(len({command["args"]["content"] for command in adds}), 120)
+        self.assertFalse(any(command["args"]["content"].startswith("task 3-") for command in adds))
+
+        add, complete = batches[1][:2]
+        self.assertEqual(add["args"], {"content": "task 0-0", "due": {"date": "2024-01-01"}})
+        self.assertEqual(complete["type"], "item_complete")
+        self.assertEqual(complete["args"]["id"], add["temp_id"])
+        expected = datetime(2024, 1, 1, 9, 0).astimezone(timezone.utc)
+        self.assertEqual(complete["args"]["date_completed"], f"{expected:%Y-%m-%dT%H:%M:%SZ}")
+
+    def test_turned_down_completions_are_retried_on_the_next_run(self):
+        BackfillTodoist.rejected = {"task 0-3"}
+        first = self.backfill("1-02-24")
+
+        self.assertEqual(first.returncode, 1, first.stdout)
+        self.assertIn("Sent 39 completion(s) in 1 request(s).", first.stdout)
+        self.assertIn("Todoist turned down 1; they are retried on the next run:", first.stdout)
+        self.assertIn("2024-01-01 line 9 'task 0-3': item_add", first.stdout)
+
+        BackfillTodoist.rejected = set()
+        second = self.backfill("1-02-24")
+        self.assertEqual(second.returncode, 0, second.stdout)
+        self.assertIn("Retrying 1 completion(s) Todoist turned down before.", second.stdout)
+        self.assertIn("Sent 1 completion(s) in 1 request(s).", second.stdout)
+        retried = BackfillTodoist.batches[1]
+        self.assertEqual(
+            [command["uuid"] for command in retried],
+            [command["uuid"] for command in BackfillTodoist.batches[0][6:8]],
+        )
+
+        third = self.backfill("1-02-24")
+        self.assertIn("Sent 0 completion(s) in 0 request(s).", third.stdout)
+        self.assertEqual(len(BackfillTodoist.batches), 2)
+
+    def test_dry_run_counts_without_sending(self):
+        result = self.backfill("1-03-24", "dry-run")
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("Would send 80 completion(s) from 2 note(s).", result.stdout)
+        self.assertEqual(BackfillTodoist.batches, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,677 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import socket
+import stat
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import note_state  # noqa: E402
+import todoist_client  # noqa: E402
+
+
+class StubTodoist(BaseHTTPRequestHandler):
+    """Answers /sync like Todoist, applying every command it is sent."""
+
+    protocol_version = "HTTP/1.1"
+    requests = []
+    clients = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"] or 0)).decode()
+        commands = json.loads(parse_qs(body)["commands"][0])
+        self.requests.append((self.path, commands))
+        self.clients.append(self.client_address)
+        reply = json.dumps(
+            {
+                "sync_status": {command["uuid"]: "ok" for command in commands},
+                "temp_id_mapping": {
+                    command["temp_id"]: f"task-{index}"
+                    for index, command in enumerate(commands)
+                    if "temp_id" in command
+                },
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, *args):
+        pass
+
+
+class TodoistOutboxTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.patch(note_state, "STATE_DIR", Path(self.directory.name))
+        self.patch(todoist_client, "find_td", lambda: None)
+        self.addCleanup(todoist_client._connections.clear)
+        self.addCleanup(lambda: [c.close() for c in todoist_client._connections.values()])
+        StubTodoist.requests = []
+        StubTodoist.clients = []
+
+    def patch(self, owner, name, value):
+        self.addCleanup(setattr, owner, name, getattr(owner, name))
+        setattr(owner, name, value)
+
+    def start_server(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StubTodoist)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.patch(todoist_client, "TODOIST_API", f"http://127.0.0.1:{server.server_port}")
+
+    def test_offline_completion_stays_queued(self):
+        self.patch(todoist_client, "TODOIST_API", "http://127.0.0.1:9")
+        self.patch(todoist_client, "get_todoist_token", lambda deadline=None: "token")
+
+        with self.assertRaisesRegex(RuntimeError, "queued for retry"):
+            todoist_client.log_completed_task_to_todoist("write report")
+
+        pending = todoist_client.pending_completions()
+        self.assertEqual([entry["content"] for entry in pending], ["write report"])
+
+    def test_flush_sends_queued_completions_in_one_request(self):
+        self.start_server()
+        entries = [todoist_client.enqueue_completion(f"task {i}") for i in range(3)]
+
+        recorded_ids, errors = todoist_client.flush_outbox("token")
+
+        self.assertEqual(errors, [])
+        self.assertEqual(recorded_ids, {entry["id"] for entry in entries})
+        self.assertEqual(len(StubTodoist.requests), 1)
+        path, commands = StubTodoist.requests[0]
+        self.assertEqual(path, "/sync")
+        self.assertEqual(
+            [command["type"] for command in commands], ["item_add", "item_close"] * 3
+        )
+        self.assertEqual(todoist_client.pending_completions(), [])
+        self.assertEqual((Path(self.directory.name) / todoist_client.OUTBOX_FILE).read_text(), "")
+
+    def test_batch_of_completions_goes_out_in_one_sync_request(self):
+        self.start_server()
+        self.patch(todoist_client, "get_todoist_token", lambda deadline=None: "token")
+
+        todoist_client.log_completed_tasks_to_todoist(["one", "two", "three"])
+
+        self.assertEqual(len(StubTodoist.requests), 1)
+        _, commands = StubTodoist.requests[0]
+        self.assertEqual(
+            [command["args"]["content"] for command in commands if command["type"] == "item_add"],
+            ["one", "two", "three"],
+        )
+        self.assertEqual(todoist_client.pending_completions(), [])
+
+    def test_flush_splits_at_the_command_limit(self):
+        self.start_server()
+        for i in range(todoist_client.SYNC_COMMAND_LIMIT // 2 + 1):
+            todoist_client.enqueue_completion(f"task {i}")
+
+        todoist_client.flush_outbox("token")
+
+        self.assertEqual(
+            [len(commands) for _, commands in StubTodoist.requests],
+            [todoist_client.SYNC_COMMAND_LIMIT, 2],
+        )
+        # Both requests travel over the same keep-alive connection.
+        self.assertEqual(len(set(StubTodoist.clients)), 1)
+
+    def test_finishing_keeps_the_records_of_other_pending_completions(self):
+        first, second = todoist_client.enqueue_completions(["one", "two"])
+        todoist_client.append_outbox([{"op": "sync_sent", "id": second["id"]}])
+
+        todoist_client.finish_completions([first], "recorded", via="sync")
+
+        records = todoist_client.read_outbox()
+        self.assertEqual({record["id"] for record in records}, {second["id"]})
+        pending = todoist_client.pending_completions()
+        self.assertEqual(
+            [(entry["content"], entry["sync_in_doubt"]) for entry in pending], [("two", True)]
+        )
+
+    def test_completion_queued_during_compaction_is_kept(self):
+        first = todoist_client.enqueue_completion("one")
+        read_outbox = todoist_client.read_outbox
+        compacting = threading.Event()
+
+        def slow_read_outbox():
+            records = read_outbox()
+            compacting.set()
+            time.sleep(0.2)
+            return records
+
+        self.patch(todoist_client, "read_outbox", slow_read_outbox)
+        finisher = threading.Thread(
+            target=todoist_client.finish_completions, args=([first], "recorded")
+        )
+        finisher.start()
+        compacting.wait()
+        second = todoist_client.enqueue_completion("two")
+        finisher.join()
+
+        self.assertEqual(
+            [entry["id"] for entry in todoist_client.pending_completions()], [second["id"]]
+        )
+
+    def test_reconnects_when_idle_connection_was_closed(self):
+        self.start_server()
+        todoist_client.enqueue_completion("first")
+        todoist_client.flush_outbox("token")
+        next(iter(todoist_client._connections.values())).sock.shutdown(socket.SHUT_RDWR)
+        todoist_client.enqueue_completion("second")
+
+        recorded_ids, errors = todoist_client.flush_outbox("token")
+
+        self.assertEqual((len(recorded_ids), errors), (1, []))
+
+    def test_only_replayable_requests_are_resent_after_a_dropped_connection(self):
+        class DropsFirstPost(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            posts = []
+
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header("Content-Length", "2")
+                self.end_headers()
+                self.wfile.write(b"{}")
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers["Content-Length"] or 0))
+                self.posts.append(self.path)
+                if self.posts.count(self.path) == 1:
+                    self.close_connection = True  # Hang up without answering.
+                    return
+                self.do_GET()
+
+            def log_message(self, *args):
+                pass
+
+        self.serve(DropsFirstPost)
+        api = todoist_client.TODOIST_API
+
+        todoist_client.todoist_request("GET", f"{api}/projects", "token")
+        with self.assertRaises(RuntimeError) as raised:
+            todoist_client.todoist_request("POST", f"{api}/tasks", "token", payload={})
+        self.assertNotIsInstance(raised.exception, todoist_client.TodoistUnsentError)
+        self.assertEqual(DropsFirstPost.posts, ["/tasks"])
+
+        todoist_client.todoist_request("GET", f"{api}/projects", "token")
+        todoist_client.todoist_request("POST", f"{api}/sync", "token", form={}, replayable=True)
+        self.assertEqual(DropsFirstPost.posts, ["/tasks", "/sync", "/sync"])
+
+    def test_background_mode_returns_before_worker_reports(self):
+        self.start_server()
+        root = Path(self.directory.name)
+        note_path = root / f"{datetime.now():%-m-%d-%y}.txt"
+        note_path.write_text("now\n---\n\nlater\n---\n")
+        environment = os.environ.copy()
+        environment.update(
+            {
+                "DAILY_NOTES_PATH": str(root),
+                "NOTE_SCRIPTS_STATE_DIR": str(root),
+                "NOTE_DAEMON_DISABLE": "1",
+                "TODOIST_API_URL": todoist_client.TODOIST_API,
+                "TODOIST_API_TOKEN": "token",
+                "TODOIST_BACKGROUND": "1",
+            }
+        )
+        result = subprocess.run(
+            [sys.executable, str(ROOT / "done-task.py"), "shipped it"],
+            capture_output=True,
+            text=True,
+            env=environment,
+        )
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("Logging in Todoist.", result.stdout)
+        status_path = root / todoist_client.STATUS_FILE
+        deadline = time.monotonic() + 10
+        while not status_path.exists():
+            self.assertLess(time.monotonic(), deadline, "worker never reported")
+            time.sleep(0.05)
+        status = json.loads(status_path.read_text())
+        self.assertEqual((status["content"], status["ok"]), ("shipped it", True))
+        self.assertEqual(todoist_client.pending_completions(), [])
+
+    def test_done_task_updates_note_while_todoist_is_in_flight(self):
+        class SlowTodoist(StubTodoist):
+            answered = []
+
+            def do_POST(self):
+                time.sleep(1)
+                super().do_POST()
+                self.answered.append(time.time())
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), SlowTodoist)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        root = Path(self.directory.name)
+        note_path = root / f"{datetime.now():%-m-%d-%y}.txt"
+        note_path.write_text("now\n---\nfirst\nsecond\n\ndone\n---\n")
+        bin_dir = root / "bin"
+        bin_dir.mkdir()
+        (bin_dir / "open").write_text('#!/bin/sh\ndate +%s.%N >> "$OPEN_STUB_LOG"\n')
+        (bin_dir / "open").chmod(0o755)
+        environment = os.environ.copy()
+        environment.update(
+            {
+                "DAILY_NOTES_PATH": str(root),
+                "NOTE_SCRIPTS_STATE_DIR": str(root),
+                "NOTE_DAEMON_DISABLE": "1",
+                "TODOIST_API_URL": f"http://127.0.0.1:{server.server_port}",
+                "TODOIST_API_TOKEN": "token",
+                "OPEN_STUB_LOG": str(root / "open.log"),
+                "PATH": f"{bin_dir}{os.pathsep}{os.environ['PATH']}",
+            }
+        )
+
+        result = subprocess.run(
+            [sys.executable, str(ROOT / "done-task.py")],
+            capture_output=True,
+            text=True,
+            env=environment,
+        )
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("Logged in Todoist.", result.stdout)
+        self.assertEqual(len(SlowTodoist.answered), 1)
+        # One Thing was updated before Todoist had even answered.
+        opened = float((root / "open.log").read_text().split()[0])
+        self.assertLess(opened, SlowTodoist.answered[0])
+
+    def test_done_task_sends_nothing_when_the_note_edit_fails(self):
+        self.serve(StubTodoist)
+        root = Path(self.directory.name)
+        environment = os.environ.copy()
+        environment.update(
+            {
+                "DAILY_NOTES_PATH": str(root / "missing"),
+                "NOTE_SCRIPTS_STATE_DIR": str(root),
+                "NOTE_DAEMON_DISABLE": "1",
+                "TODOIST_API_URL": todoist_client.TODOIST_API,
+                "TODOIST_API_TOKEN": "token",
+            }
+        )
+
+        result = subprocess.run(
+            [sys.executable, str(ROOT / "done-task.py"), "shipped it"],
+            capture_output=True,
+            text=True,
+            env=environment,
+        )
+
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn("FileNotFoundError", result.stderr)
+        # Todoist never gets a completion the note doesn't have.
+        self.assertEqual(StubTodoist.requests, [])
+        self.assertEqual(todoist_client.read_outbox(), [])
+
+    def serve(self, handler):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.patch(todoist_client, "TODOIST_API", f"http://127.0.0.1:{server.server_port}")
+        self.patch(todoist_client, "get_todoist_token", lambda deadline=None: "token")
+
+    def test_sync_timeout_is_replayed_through_sync_only(self):
+        class AppliesThenStalls(StubTodoist):
+            applied = set()
+            paths = []
+
+            def do_POST(self):
+                self.paths.append(self.path)
+                if self.path == "/sync" and len(self.paths) == 1:
+                    time.sleep(1)  # Applied, but the answer arrives too late.
+                try:
+                    super().do_POST()
+                except BrokenPipeError:
+                    pass  # The client gave up waiting.
+                for _, commands in self.requests[-1:]:
+                    self.applied.update(command["uuid"] for command in commands)
+
+        self.serve(AppliesThenStalls)
+        self.patch(todoist_client, "time_left", lambda deadline: 0.3)
+        with self.assertRaisesRegex(RuntimeError, "rest: skipped, Sync may have recorded them"):
+            todoist_client.log_completed_task_to_todoist("exactly once")
+        (entry,) = todoist_client.pending_completions()
+        self.assertTrue(entry["sync_in_doubt"])
+
+        time.sleep(1)
+        todoist_client.deliver_completions([entry])
+
+        self.assertEqual(AppliesThenStalls.paths, ["/sync", "/sync"])
+        first, second = (commands for _, commands in StubTodoist.requests)
+        self.assertEqual(first, second)
+        self.assertEqual(len(AppliesThenStalls.applied), 2)
+        self.assertEqual(todoist_client.pending_completions(), [])
+
+    def test_rejected_sync_falls_back_to_rest(self):
+        class RejectsSync(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            paths = []
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers["Content-Length"] or 0))
+                self.paths.append(self.path)
+                if self.path == "/sync":
+                    self.send_response(400)
+                    reply = b"bad request"
+                else:
+                    self.send_response(200)
+                    reply = json.dumps({"id": "task-1"}).encode()
+                self.send_header("Content-Length", str(len(reply)))
+                self.end_headers()
+                self.wfile.write(reply)
+
+            def log_message(self, *args):
+                pass
+
+        self.serve(RejectsSync)
+        todoist_client.log_completed_task_to_todoist("via rest")
+
+        self.assertEqual(RejectsSync.paths, ["/sync", "/tasks", "/tasks/task-1/close"])
+        self.assertEqual(todoist_client.pending_completions(), [])
+
+    def test_breaker_skips_paths_that_keep_failing(self):
+        self.patch(todoist_client, "TODOIST_API", "http://127.0.0.1:9")
+        self.patch(todoist_client, "get_todoist_token", lambda deadline=None: "token")
+
+        for _ in range(todoist_client.BREAKER_THRESHOLD):
+            with self.assertRaises(RuntimeError):
+                todoist_client.log_completed_task_to_todoist("offline")
+        with self.assertRaisesRegex(RuntimeError, "sync: skipped after repeated failures"):
+            todoist_client.log_completed_task_to_todoist("offline")
+
+        breaker = todoist_client.load_breaker()
+        self.assertGreater(breaker["rest"]["open_until"], time.time())
+        self.assertEqual(len(todoist_client.pending_completions()), 4)
+
+    def test_delivery_order_prefers_recently_fastest_path(self):
+        self.assertEqual(todoist_client.delivery_order({}), ["sync", "rest", "td"])
+        breaker = {"td": {"latency": 0.4}, "sync": {"latency": 0.9}}
+        self.assertEqual(todoist_client.delivery_order(breaker), ["td", "sync", "rest"])
+
+    def test_shared_deadline_stops_further_attempts(self):
+        self.patch(todoist_client, "DELIVERY_DEADLINE", 0)
+
+        with self.assertRaisesRegex(RuntimeError, "sync: deadline exceeded"):
+            todoist_client.log_completed_task_to_todoist("late")
+        self.assertEqual(todoist_client.load_breaker(), {})
+
+
+class ReconcileTodoist(BaseHTTPRequestHandler):
+    """Serves Sync reads with numbered sync_tokens and the completed-tasks list."""
+
+    protocol_version = "HTTP/1.1"
+    completed = []  # Tasks Todoist already had when the first full sync ran.
+    changes = {}  # sync_token -> changed tasks returned for it
+    refused = {}  # sync_token -> (status, body) to answer with instead
+    reads = []
+    commands = []
+
+    def do_GET(self):
+        self.reads.append(self.path.split("?")[0])
+        self.reply({"items": self.completed, "next_cursor": None})
+
+    def do_POST(self):
+        form = parse_qs(self.rfile.read(int(self.headers["Content-Length"] or 0)).decode())
+        if "commands" in form:
+            commands = json.loads(form["commands"][0])
+            self.commands.extend(commands)
+            self.reply({"sync_status": {command["uuid"]: "ok" for command in commands}})
+            return
+        sync_token = form["sync_token"][0]
+        self.reads.append(f"sync {sync_token}")
+        if sync_token in self.refused:
+            status, body = self.refused[sync_token]
+            self.reply(body, status)
+            return
+        next_token = "1" if sync_token == "*" else str(int(sync_token) + 1)
+        self.reply({"items": self.changes.get(sync_token, []), "sync_token": next_token})
+
+    def reply(self, body, status=200):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def completed_item(task_id, content, hour):
+    stamp = datetime.now().replace(hour=hour, minute=5, second=0, microsecond=0)
+    return {
+        "id": task_id,
+        "content": content,
+        "checked": True,
+        "completed_at": stamp.astimezone().isoformat(),
+    }
+
+
+class TodoistReconcileTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.root = Path(self.directory.name)
+        self.addCleanup(setattr, note_state, "STATE_DIR", note_state.STATE_DIR)
+        note_state.STATE_DIR = self.root
+        ReconcileTodoist.completed = [completed_item("1", "write report", 9)]
+        ReconcileTodoist.changes = {}
+        ReconcileTodoist.refused = {}
+        ReconcileTodoist.reads = []
+        ReconcileTodoist.commands = []
+        server = ThreadingHTTPServer(("127.0.0.1", 0), ReconcileTodoist)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.api = f"http://127.0.0.1:{server.server_port}"
+        self.addCleanup(setattr, todoist_client, "TODOIST_API", todoist_client.TODOIST_API)
+        todoist_client.TODOIST_API = self.api
+        self.addCleanup(todoist_client._connections.clear)
+        self.addCleanup(lambda: [c.close() for c in todoist_client._connections.values()])
+
+    def test_later_runs_fetch_only_changes(self):
+        today = datetime.now().date()
+        completed, transferred = todoist_client.sync_completed_snapshot("token", today)
+        self.assertEqual([entry["content"] for entry in completed.values()], ["write report"])
+        self.assertEqual(transferred, 1)
+
+        ReconcileTodoist.changes = {
+            "1": [
+                completed_item("2", "call back", 11),
+                {"id": "1", "content": "write report", "checked": False, "completed_at": None},
+            ]
+        }
+        completed, transferred = todoist_client.sync_completed_snapshot("token", today)
+
+        self.assertEqual([entry["content"] for entry in completed.values()], ["call back"])
+        self.assertEqual(transferred, 2)
+        self.assertEqual(
+            ReconcileTodoist.reads,
+            ["sync *", "/tasks/completed/by_completion_date", "sync 1"],
+        )
+
+    def test_only_a_refused_sync_token_starts_over(self):
+        today = datetime.now().date()
+        todoist_client.sync_completed_snapshot("token", today)
+        ReconcileTodoist.reads = []
+
+        ReconcileTodoist.refused = {"1": (429, {"error": "Too many requests"})}
+        with self.assertRaises(todoist_client.TodoistRateLimitError):
+            todoist_client.sync_completed_snapshot("token", today)
+        self.assertEqual(ReconcileTodoist.reads, ["sync 1"])
+
+        invalid = {"error": "Invalid argument value", "error_extra": {"argument": "sync_token"}}
+        ReconcileTodoist.refused = {"1": (400, invalid)}
+        completed, _ = todoist_client.sync_completed_snapshot("token", today)
+        self.assertEqual([entry["content"] for entry in completed.values()], ["write report"])
+        self.assertEqual(
+            ReconcileTodoist.reads,
+            ["sync 1", "sync 1", "sync *", "/tasks/completed/by_completion_date"],
+        )
+
+    def test_reconcile_reports_and_repairs_both_directions(self):
+        note_path = self.root / f"{datetime.now():%-m-%d-%y}.txt"
+        note_path.write_text(
+            "now\n---\n\ndone\n---\n"
+            f"write report - {datetime.now():%-m-%d-%y} 9:05 AM\n"
+            f"water plants - {datetime.now():%-m-%d-%y} 10:00 AM\n"
+        )
+        ReconcileTodoist.completed.append(completed_item("2", "call back", 11))
+        environment = os.environ.copy()
+        environment.update(
+            {
+                "DAILY_NOTES_PATH": str(self.root),
+                "NOTE_SCRIPTS_STATE_DIR": str(self.root),
+                "NOTE_DAEMON_DISABLE": "1",
+                "TODOIST_API_URL": self.api,
+                "TODOIST_API_TOKEN": "token",
+            }
+        )
+
+        def reconcile(*args):
+            return subprocess.run(
+                [sys.executable, str(ROOT / "todoist-reconcile.py"), *args],
+                capture_output=True,
+                text=True,
+                env=environment,
+            )
+
+        report = reconcile()
+        self.assertEqual(report.returncode, 0, report.stderr)
+        self.assertIn("Missing from Todoist (1):\n  10:00 AM  water plants", report.stdout)
+        self.assertIn("Missing from the done section (1):\n  11:05 AM  call back", report.stdout)
+        self.assertEqual(ReconcileTodoist.commands, [])
+
+        repair = reconcile("repair")
+        self.assertEqual(repair.returncode, 0, repair.stderr)
+        self.assertTrue(
+            note_path.read_text().endswith(f"call back - {datetime.now():%-m-%d-%y} 11:05 AM\n")
+        )
+        self.assertEqual(
+            [c["args"]["content"] for c in ReconcileTodoist.commands if c["type"] == "item_add"],
+            ["water plants"],
+        )
+        # The second run only asked Sync for what changed since the first.
+        self.assertEqual(ReconcileTodoist.reads[-1], "sync 1")
+        self.assertEqual(ReconcileTodoist.reads.count("/tasks/completed/by_completion_date"), 1)
+
+
+class TodoistTokenCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        root = Path(self.directory.name)
+        self.patch(note_state, "STATE_DIR", root / "state")
+        for key in ("TODOIST_API_TOKEN", "TODOIST_API_KEY"):
+            if key in os.environ:
+                self.addCleanup(os.environ.__setitem__, key, os.environ.pop(key))
+
+        self.calls_path = root / "td-calls"
+        td_path = root / "td"
+        td_path.write_text(f'#!/bin/sh\necho call >> "{self.calls_path}"\necho fresh-token\n')
+        td_path.chmod(0o755)
+        self.patch(todoist_client, "find_td", lambda: str(td_path))
+
+    def patch(self, owner, name, value):
+        self.addCleanup(setattr, owner, name, getattr(owner, name))
+        setattr(owner, name, value)
+
+    def td_calls(self):
+        return len(self.calls_path.read_text().splitlines()) if self.calls_path.exists() else 0
+
+    def test_td_runs_once_and_cache_is_private(self):
+        self.assertEqual(todoist_client.get_todoist_token(), "fresh-token")
+        self.assertEqual(todoist_client.get_todoist_token(), "fresh-token")
+
+        self.assertEqual(self.td_calls(), 1)
+        cache = note_state.STATE_DIR / todoist_client.TOKEN_CACHE_FILE
+        self.assertEqual(stat.S_IMODE(cache.stat().st_mode), 0o600)
+
+    def test_expired_or_rejected_token_is_fetched_again(self):
+        todoist_client.get_todoist_token()
+        self.patch(todoist_client, "TOKEN_CACHE_TTL", 0)
+        todoist_client.get_todoist_token()
+        self.assertEqual(self.td_calls(), 2)
+
+        self.patch(todoist_client, "TOKEN_CACHE_TTL", 3600)
+        todoist_client.forget_cached_token()
+        todoist_client.get_todoist_token()
+        todoist_client.get_todoist_token()
+        self.assertEqual(self.td_calls(), 3)
+
+    def test_unauthorized_response_clears_cache(self):
+        class Unauthorized(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.send_response(401)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(("127.0.0.1", 0), Unauthorized)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        token = todoist_client.get_todoist_token()
+        with self.assertRaises(todoist_client.TodoistAuthError):
+            todoist_client.todoist_request(
+                "POST", f"http://127.0.0.1:{server.server_port}/sync", token, form={}
+            )
+        self.assertIsNone(todoist_client.read_cached_token())
+
+
+    def test_rejected_environment_token_is_not_retried(self):
+        class Unauthorized(BaseHTTPRequestHandler):
+            requests = 0
+
+            def do_POST(self):
+                Unauthorized.requests += 1
+                self.send_response(401)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(("127.0.0.1", 0), Unauthorized)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.patch(todoist_client, "TODOIST_API", f"http://127.0.0.1:{server.server_port}")
+        self.addCleanup(todoist_client._connections.clear)
+        self.addCleanup(lambda: [c.close() for c in todoist_client._connections.values()])
+        os.environ["TODOIST_API_TOKEN"] = "revoked"
+        self.addCleanup(os.environ.pop, "TODOIST_API_TOKEN")
+        entry = todoist_client.enqueue_completion("refused")
+
+        with self.assertRaises(todoist_client.TodoistAuthError):
+            todoist_client.deliver_via_sync([entry], time.monotonic() + 5)
+        self.assertEqual(Unauthorized.requests, 1)
+        self.assertEqual(self.td_calls(), 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -14,12 +14,25 @@
 # @raycast.author masonc789
 # @raycast.authorURL https://raycast.com/masonc789
 
+from note_daemon import forward_to_daemon
+
+if __name__ == "__main__":
+    forward_to_daemon(__file__)
+
 import sys
 from datetime import datetime
 import os
 
+import note_trace
+from note_files import note_exists
+from thought_log_store import rewrite_head, rotate_thought_log
+
+note_trace.start(__file__)
+
 # Constants
-LOG_FILE_PATH = "/Users/colin/Dropbox (Maestral)/Daily Notes/thought log.txt"
+LOG_FILE_PATH = os.environ.get(
+    "THOUGHT_LOG_PATH", "/Users/colin/Dropbox (Maestral)/Daily Notes/thought log.txt"
+)
 
 # Get the current date and time
 current_date = datetime.now().strftime("%-m-%d-%y")
@@ -30,11 +43,17 @@ header = f"{current_date}\n---\n"
 entry = sys.argv[1].strip()
 formatted_entry = f"{current_time} - {entry}\n"
 
-# Read the existing log file
-if os.path.exists(LOG_FILE_PATH):
-    with open(LOG_FILE_PATH, "r") as file:
-        content = file.read()
+# Archive older days first so only the hot file is read and rewritten below
+with note_trace.phase("rotate"):
+    rotated_count = rotate_thought_log(LOG_FILE_PATH, datetime.now().date())
+if rotated_count > 0:
+    print(f"Archived {rotated_count} older day(s) from the thought log.")
 
+
+def add_entry(content):
+    """
+    Add the formatted entry under today's header in the head of the log.
+    """
     # Check if today's date is already in the log file
     if header in content:
         # Find the index of today's date and insert the entry
@@ -44,12 +63,15 @@ if os.path.exists(LOG_FILE_PATH):
         # Prepend the new date, entry, and three blank lines to the log file
         content = header + formatted_entry + "\n\n\n" + content
         print(f"New date ({current_date}) added to log with entry at {current_time}.")
+    return content
+
 
-    # Write the updated content back to the log file
-    with open(LOG_FILE_PATH, "w") as file:
-        file.write(content)
-else:
-    # Create a new log file with the entry
-    with open(LOG_FILE_PATH, "w") as file:
-        file.write(header + formatted_entry + "\n\n\n")
-    print(f"New log file created with first entry at {current_time}.")
+with note_trace.phase("rewrite"):
+    if note_exists(LOG_FILE_PATH):
+        # Only the newest day section is read and rewritten; the rest of the log
+        # is streamed across unchanged.
+        rewrite_head(LOG_FILE_PATH, add_entry)
+    else:
+        # Create a new log file with the entry
+        rewrite_head(LOG_FILE_PATH, lambda _: header + formatted_entry + "\n\n\n")
+        print(f"New log file created with first entry at {current_time}.")
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+# Required parameters:
+# @raycast.schemaVersion 1
+# @raycast.title Thought Log Jump
+# @raycast.mode silent
+
+# Optional parameters:
+# @raycast.icon 📓
+# @raycast.argument1 { "type": "text", "placeholder": "M-DD-YY" }
+
+# Documentation:
+# @raycast.description Opens the thought log in Zed at a given day's header.
+# @raycast.author Colin Mason
+
+from note_daemon import forward_to_daemon
+
+if __name__ == "__main__":
+    forward_to_daemon(__file__)
+
+import os
+import subprocess
+import sys
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import note_files
+import note_trace
+from thought_log_store import (
+    archive_path,
+    archive_paths_before,
+    find_day_header,
+    find_zed_binary,
+    line_number_at,
+)
+
+LOG_FILE_PATH = Path(
+    os.environ.get(
+        "THOUGHT_LOG_PATH",
+        "/Users/colin/Dropbox (Maestral)/Daily Notes/thought log.txt",
+    )
+).expanduser()
+NOTES_PATH = Path(
+    os.environ.get("DAILY_NOTES_PATH", str(LOG_FILE_PATH.parent))
+).expanduser()
+DATE_FORMATS = ("%m-%d-%y", "%m/%d/%y", "%m-%d-%Y", "%m/%d/%Y", "%Y-%m-%d")
+
+
+def parse_date(text: str):
+    """
+    Parse the requested day.
+
+    Args:
+        text (str): "today", "yesterday", or a date such as 3-07-25, 3/7/25 or
+            2025-03-07.
+
+    Returns:
+        date: The requested day, or None if the text is not a date.
+    """
+    text = text.strip().lower()
+    if text in ("today", ""):
+        return date.today()
+    if text == "yesterday":
+        return date.today() - timedelta(days=1)
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+def locate_day(day: date):
+    """
+    Find a day's header in the thought log or in its monthly archive.
+
+    If neither has the day or an earlier one, the archives of earlier months
+    are searched newest first for the nearest earlier day.
+
+    Returns:
+        tuple: (path, offset, found_date) for the exact day if any file has it,
+        otherwise for the newest earlier day, or None if there is none.
+    """
+    nearest = None
+    for path in (LOG_FILE_PATH, archive_path(LOG_FILE_PATH, day)):
+        found = find_day_header(path, day)
+        if found is None:
+            continue
+        offset, found_date = found
+        if found_date == day:
+            return path, offset, found_date
+        if nearest is None or found_date > nearest[2]:
+            nearest = (path, offset, found_date)
+    if nearest is not None:
+        return nearest
+
+    for path in archive_paths_before(LOG_FILE_PATH, day):
+        found = find_day_header(path, day)
+        if found is not None:
+            return path, *found
+    return None
+
+
+if __name__ == "__main__":
+    note_trace.start(__file__)
+    requested = parse_date(" ".join(sys.argv[1:]))
+    if requested is None:
+        print("Expected a date like 3-07-25, 3/7/25 or 2025-03-07")
+        sys.exit(1)
+
+    # The search maps the files on disk, so buffered edits go out first.
+    note_files.flush()
+    with note_trace.phase("search"):
+        location = locate_day(requested)
+    if location is None:
+        print(f"No thought log entries on or before {requested:%-m-%d-%y}")
+        sys.exit(1)
+
+    path, offset, found_date = location
+    line = line_number_at(path, offset)
+    try:
+        with note_trace.phase("zed"):
+            subprocess.run(
+                [find_zed_binary(), str(NOTES_PATH), f"{path}:{line}"], check=True
+            )
+    except (FileNotFoundError, subprocess.CalledProcessError) as error:
+        print(f"Could not open thought log in Zed: {error}", file=sys.stderr)
+        sys.exit(1)
+
+    if found_date == requested:
+        print(f"Opened thought log at {found_date:%-m-%d-%y}")
+    else:
+        print(
+            f"No entries on {requested:%-m-%d-%y}; "
+            f"opened the nearest earlier day, {found_date:%-m-%d-%y}"
+        )
@@ -12,14 +12,23 @@
 # @raycast.description Opens thought log in Zed at a fresh timestamp for immediate entry.
 # @raycast.author Colin Mason
 
+from note_daemon import forward_to_daemon
+
+if __name__ == "__main__":
+    forward_to_daemon(__file__)
+
 import os
 import re
-import shutil
 import subprocess
 import sys
 from datetime import datetime
 from pathlib import Path
-from zoneinfo import ZoneInfo
+
+import note_files
+import note_trace
+from thought_log_store import find_zed_binary, rewrite_head, rotate_thought_log
+
+note_trace.start(__file__)
 
 # Constants
 LOG_FILE_PATH = Path(
@@ -31,44 +40,31 @@ LOG_FILE_PATH = Path(
 NOTES_PATH = Path(
     os.environ.get("DAILY_NOTES_PATH", str(LOG_FILE_PATH.parent))
 ).expanduser()
-ZED_CANDIDATES = (
-    "/opt/homebrew/bin/zed",
-    "/Applications/Zed.app/Contents/MacOS/cli",
-    "/usr/local/bin/zed",
-)
-NOTES_TZ = ZoneInfo("America/New_York")
+NOTES_TZ = "America/New_York"
 
 
-def find_zed_binary():
-    """Find Zed without depending on the sparse PATH used by GUI launchers."""
-    configured = os.environ.get("ZED_CLI")
-    if configured:
-        return configured
+def notes_now():
+    """
+    Return the current time in the notes' time zone.
 
-    from_path = shutil.which("zed")
-    if from_path:
-        return from_path
+    zoneinfo is only loaded when the machine's local zone is a different one.
+    """
+    if os.environ.get("TZ", NOTES_TZ) == NOTES_TZ and os.path.realpath(
+        "/etc/localtime"
+    ).endswith(f"/{NOTES_TZ}"):
+        return datetime.now()
 
-    for candidate in ZED_CANDIDATES:
-        if os.path.exists(candidate):
-            return candidate
+    from zoneinfo import ZoneInfo
 
-    raise FileNotFoundError("Could not find the Zed CLI")
+    return datetime.now(ZoneInfo(NOTES_TZ))
 
 # Get the current date and time
-now = datetime.now(NOTES_TZ)
+now = notes_now()
 current_date = now.strftime("%-m-%d-%y")
 current_time = now.strftime("%-I:%M %p")
 header = f"{current_date}\n---\n"
 timestamp = f"{current_time} - \n\n\n"
 
-# Read the existing log file
-if LOG_FILE_PATH.exists():
-    with LOG_FILE_PATH.open("r") as file:
-        content = file.read()
-else:
-    content = ""
-
 # Use regex to find today's date header (more flexible for whitespace)
 # Pattern matches: date, newline, dashes (with optional trailing spaces), newline
 date_header_pattern = re.compile(
@@ -126,69 +122,94 @@ def clean_previous_day_empty_timestamps(file_content):
     return file_content, count_removed, previous_date
 
 
-# Check if today's date is already in the log file
-header_match = date_header_pattern.search(content)
+def report_cleaned_timestamps(removed_count, prev_date):
+    """Say how many empty timestamps were cleaned from the previous day."""
+    if removed_count == 1:
+        print(f"Cleaned 1 empty timestamp from {prev_date}")
+    elif removed_count > 1:
+        print(f"Cleaned {removed_count} empty timestamps from {prev_date}")
 
-if header_match:
-    # Today's date already exists - insert timestamp right after the header
-    header_end = header_match.end()
-    remaining_content = content[header_end:]
 
-    # Check if there's already an empty timestamp (ends with "- " or "-  " with only whitespace after)
-    empty_timestamp_pattern = r'(\d{1,2}:\d{2} [AP]M\s*-\s*)\s*$'
+def clean_archived_day(section):
+    """Clean the previous day's empty timestamps as it is archived."""
+    section, removed_count, prev_date = clean_previous_day_empty_timestamps(section)
+    report_cleaned_timestamps(removed_count, prev_date)
+    return section
 
-    # Get just the first line after the header (most recent timestamp)
-    first_line = remaining_content.split('\n')[0] if remaining_content else ""
 
-    if re.match(empty_timestamp_pattern, first_line.strip()):  # Check if first timestamp is empty
-        # Delete ALL consecutive empty timestamps at the top
-        lines = remaining_content.split('\n')
-        lines_to_skip = 0
+def insert_fresh_timestamp(content):
+    """Insert a fresh timestamp under today's header in the head of the log."""
+    # Check if today's date is already in the log file
+    header_match = date_header_pattern.search(content)
 
-        # Count how many empty timestamp blocks to remove (each is 3 lines: timestamp + 2 blank lines)
-        i = 0
-        while i < len(lines):
-            line = lines[i].strip()
-            if re.match(empty_timestamp_pattern, line):
-                # This is an empty timestamp, skip it and the next 2 blank lines
-                lines_to_skip += 3
-                i += 3
-            else:
-                # Found a non-empty line, stop
-                break
+    if header_match:
+        # Today's date already exists - insert timestamp right after the header
+        header_end = header_match.end()
+        remaining_content = content[header_end:]
+
+        # Check if there's already an empty timestamp (ends with "- " or "-  " with only whitespace after)
+        empty_timestamp_pattern = r'(\d{1,2}:\d{2} [AP]M\s*-\s*)\s*$'
+
+        # Get just the first line after the header (most recent timestamp)
+        first_line = remaining_content.split('\n')[0] if remaining_content else ""
+
+        if re.match(empty_timestamp_pattern, first_line.strip()):  # Check if first timestamp is empty
+            # Delete ALL consecutive empty timestamps at the top
+            lines = remaining_content.split('\n')
+            lines_to_skip = 0
 
-        # Rejoin from the point where non-empty content begins
-        remaining_content = '\n'.join(lines[lines_to_skip:]) if lines_to_skip < len(lines) else ''
+            # Count how many empty timestamp blocks to remove (each is 3 lines: timestamp + 2 blank lines)
+            i = 0
+            while i < len(lines):
+                line = lines[i].strip()
+                if re.match(empty_timestamp_pattern, line):
+                    # This is an empty timestamp, skip it and the next 2 blank lines
+                    lines_to_skip += 3
+                    i += 3
+                else:
+                    # Found a non-empty line, stop
+                    break
 
-        # Strip any leading newlines since timestamp already includes proper spacing
-        remaining_content = remaining_content.lstrip('\n')
+            # Rejoin from the point where non-empty content begins
+            remaining_content = '\n'.join(lines[lines_to_skip:]) if lines_to_skip < len(lines) else ''
 
-        # Insert the new timestamp right after the header
-        content = content[:header_end] + timestamp + remaining_content
+            # Strip any leading newlines since timestamp already includes proper spacing
+            remaining_content = remaining_content.lstrip('\n')
 
-        num_removed = lines_to_skip // 3
-        if num_removed == 1:
-            print("Replaced empty timestamp with new one")
+            # Insert the new timestamp right after the header
+            content = content[:header_end] + timestamp + remaining_content
+
+            num_removed = lines_to_skip // 3
+            if num_removed == 1:
+                print("Replaced empty timestamp with new one")
+            else:
+                print(f"Replaced {num_removed} empty timestamps with new one")
         else:
-            print(f"Replaced {num_removed} empty timestamps with new one")
+            # Insert the new timestamp right after the header
+            content = content[:header_end] + timestamp + remaining_content
     else:
-        # Insert the new timestamp right after the header
-        content = content[:header_end] + timestamp + remaining_content
-else:
-    # Today's date doesn't exist - prepend new date header and timestamp
-    # First, clean up any empty timestamps from the previous day
-    content, removed_count, prev_date = clean_previous_day_empty_timestamps(content)
-    if removed_count > 0:
-        if removed_count == 1:
-            print(f"Cleaned 1 empty timestamp from {prev_date}")
-        else:
-            print(f"Cleaned {removed_count} empty timestamps from {prev_date}")
+        # Today's date doesn't exist - prepend new date header and timestamp
+        # First, clean up any empty timestamps from the previous day
+        content, removed_count, prev_date = clean_previous_day_empty_timestamps(content)
+        report_cleaned_timestamps(removed_count, prev_date)
+
+        content = header + timestamp + content
+
+    return content
 
-    content = header + timestamp + content
 
-# Write the updated content back to the log file
-with LOG_FILE_PATH.open("w") as file:
-    file.write(content)
+# Archive older days first so the rest of the script only sees the hot file.
+# The previous day may be among them, so it is cleaned on the way out.
+with note_trace.phase("rotate"):
+    rotated_count = rotate_thought_log(LOG_FILE_PATH, now.date(), clean_archived_day)
+if rotated_count > 0:
+    print(f"Archived {rotated_count} older day(s) from the thought log")
+
+
+# Only the newest day section is read and rewritten; the rest of the log is
+# streamed across unchanged.
+with note_trace.phase("rewrite"):
+    content = rewrite_head(LOG_FILE_PATH, insert_fresh_timestamp)
 
 # The new timestamp is always the first line after today's header. Passing the
 # directory first keeps the file attached to a real Zed worktree, and passing
@@ -200,15 +221,19 @@ if updated_header is None:
 
 timestamp_line = content.count("\n", 0, updated_header.end()) + 1
 
+# Zed reads the file from disk, so it can't wait for write-behind.
+note_files.flush(LOG_FILE_PATH)
+
 try:
-    subprocess.run(
-        [
-            find_zed_binary(),
-            str(NOTES_PATH),
-            f"{LOG_FILE_PATH}:{timestamp_line}",
-        ],
-        check=True,
-    )
+    with note_trace.phase("zed"):
+        subprocess.run(
+            [
+                find_zed_binary(),
+                str(NOTES_PATH),
+                f"{LOG_FILE_PATH}:{timestamp_line}",
+            ],
+            check=True,
+        )
 except (FileNotFoundError, subprocess.CalledProcessError) as error:
     print(f"Could not open thought log in Zed: {error}", file=sys.stderr)
     raise SystemExit(1) from error
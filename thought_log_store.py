@@ -0,0 +1,434 @@
+"""
+Storage and editor helpers shared by the thought log scripts.
+"""
+
+import os
+import re
+from datetime import datetime
+from pathlib import Path
+
+import note_trace
+from note_files import copy_range, locked, note_exists, note_size, open_note, replace_file
+from note_state import state_path
+
+# Matches a day header ("M-DD-YY" followed by a "---" line) at a line start.
+DAY_HEADER_PATTERN = re.compile(r"^(\d{1,2}-\d{2}-\d{2})\n---\s*\n", re.MULTILINE)
+DAY_HEADER_BYTES_PATTERN = re.compile(rb"^\d{1,2}-\d{2}-\d{2}\n---[^\S\n]*\n", re.MULTILINE)
+ARCHIVE_NAME_PATTERN = re.compile(r"thought log (\d{4}-\d{2})\.txt")
+
+# Rotation is opt-in: "month" keeps only the current month in the hot file, and
+# a byte limit additionally rotates the oldest days once the file grows past it.
+ROTATE_MODE = os.environ.get("THOUGHT_LOG_ROTATE", "").strip().lower()
+MAX_BYTES = int(os.environ.get("THOUGHT_LOG_MAX_BYTES", "0").strip() or 0)
+# Logs that can't be brought under MAX_BYTES today, by real path, so later
+# entries skip re-reading them until the day changes.
+ROTATION_STATE_FILE = "thought-log-rotation.json"
+HEAD_PROBE_BYTES = 64 * 1024
+HEAD_CHUNK_BYTES = 64 * 1024
+LINE_COUNT_CHUNK_BYTES = 1024 * 1024
+HEADER_LINE_BYTES = len("12-31-99\n---")
+ZED_CANDIDATES = (
+    "/opt/homebrew/bin/zed",
+    "/Applications/Zed.app/Contents/MacOS/cli",
+    "/usr/local/bin/zed",
+)
+
+
+def find_zed_binary():
+    """Find Zed without depending on the sparse PATH used by GUI launchers."""
+    configured = os.environ.get("ZED_CLI")
+    if configured:
+        return configured
+
+    import shutil
+
+    from_path = shutil.which("zed")
+    if from_path:
+        return from_path
+
+    for candidate in ZED_CANDIDATES:
+        if os.path.exists(candidate):
+            return candidate
+
+    raise FileNotFoundError("Could not find the Zed CLI")
+
+
+def parse_day(date_text):
+    """
+    Parse an "M-DD-YY" header into a date, or None if it is not a real date.
+    """
+    try:
+        return datetime.strptime(date_text, "%m-%d-%y").date()
+    except ValueError:
+        return None
+
+
+def archive_directory(log_path):
+    """
+    Return the directory that holds the per-month thought log archives.
+    """
+    configured = os.environ.get("THOUGHT_LOG_ARCHIVE_PATH")
+    if configured:
+        return Path(configured).expanduser()
+    return Path(log_path).parent / "thought log archive"
+
+
+def archive_path(log_path, day):
+    """
+    Return the archive file for the month containing the given day.
+    """
+    return archive_directory(log_path) / f"thought log {day:%Y-%m}.txt"
+
+
+def archive_paths_before(log_path, day):
+    """
+    Return the archive files for months before the given day's, newest first.
+    """
+    try:
+        names = os.listdir(archive_directory(log_path))
+    except FileNotFoundError:
+        return []
+
+    months = []
+    for name in names:
+        match = ARCHIVE_NAME_PATTERN.fullmatch(name)
+        if match and match.group(1) < f"{day:%Y-%m}":
+            months.append(match.group(1))
+    return [
+        archive_path(log_path, datetime.strptime(month, "%Y-%m"))
+        for month in sorted(months, reverse=True)
+    ]
+
+
+def rotation_enabled():
+    """
+    Return True if the thought log should be rotated into monthly archives.
+    """
+    return ROTATE_MODE == "month" or MAX_BYTES > 0
+
+
+def load_size_limit_blocks():
+    """
+    Return {real log path: ISO day} for logs the size limit can't shrink today.
+    """
+    import json
+
+    try:
+        with open(state_path(ROTATION_STATE_FILE), "r") as file:
+            blocks = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    return blocks if isinstance(blocks, dict) else {}
+
+
+def remember_size_limit_block(log_path, today, blocked):
+    """
+    Record whether nothing more can be archived to bring the log under MAX_BYTES.
+
+    Once only today's section and undated text are left, nothing more can
+    move until the day changes.
+    """
+    import json
+
+    blocks = load_size_limit_blocks()
+    key = os.path.realpath(log_path)
+    if blocked:
+        if blocks.get(key) == today.isoformat():
+            return
+        blocks[key] = today.isoformat()
+    elif blocks.pop(key, None) is None:
+        return
+    path = state_path(ROTATION_STATE_FILE)
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}")
+    with open(temp_path, "w") as file:
+        json.dump(blocks, file)
+    os.replace(temp_path, path)
+
+
+def needs_rotation(log_path, today):
+    """
+    Cheaply decide whether the hot file holds anything that should be archived.
+
+    Only the head of the file is read: the newest day comes first, so if it is
+    from an earlier month then every section in the file is. A log over
+    MAX_BYTES that rotation already couldn't shrink today is left alone.
+    """
+    try:
+        size = note_size(log_path)
+    except FileNotFoundError:
+        return False
+    if MAX_BYTES > 0 and size > MAX_BYTES:
+        blocked_on = load_size_limit_blocks().get(os.path.realpath(log_path))
+        if blocked_on != today.isoformat():
+            return True
+    if ROTATE_MODE != "month":
+        return False
+
+    with open_note(log_path) as file:
+        head = file.read(HEAD_PROBE_BYTES).decode("utf-8", errors="ignore")
+    match = DAY_HEADER_PATTERN.search(head)
+    newest = parse_day(match.group(1)) if match else None
+    return newest is not None and (newest.year, newest.month) != (today.year, today.month)
+
+
+def split_day_sections(content):
+    """
+    Split log content into its preamble and a newest-first list of day sections.
+
+    Returns:
+        tuple: (preamble, [(date or None, section_text), ...])
+    """
+    matches = list(DAY_HEADER_PATTERN.finditer(content))
+    if not matches:
+        return content, []
+
+    sections = []
+    for index, match in enumerate(matches):
+        end = matches[index + 1].start() if index + 1 < len(matches) else len(content)
+        sections.append((parse_day(match.group(1)), content[match.start():end]))
+    return content[: matches[0].start()], sections
+
+
+def rotate_thought_log(log_path, today, clean_newest=None):
+    """
+    Move day sections that no longer belong in the hot file into monthly archives.
+
+    Archives are kept newest-first like the log itself, so rotated sections are
+    prepended to any archive that already exists for their month.
+
+    Args:
+        log_path: Path to the hot thought log file.
+        today (date): The current day in the notes timezone.
+        clean_newest (callable, optional): Given the newest day section's text
+            and returning it cleaned up, when that section is archived.
+
+    Returns:
+        int: The number of day sections moved out of the hot file.
+    """
+    if not rotation_enabled() or not needs_rotation(log_path, today):
+        return 0
+
+    with locked(log_path):
+        return move_stale_sections(log_path, today, clean_newest)
+
+
+def move_stale_sections(log_path, today, clean_newest=None):
+    """
+    Do the rotation for rotate_thought_log; the caller holds the log's lock.
+    """
+    with open_note(log_path) as file:
+        content = file.read().decode()
+    note_trace.count_bytes(read=len(content.encode()))
+    preamble, sections = split_day_sections(content)
+
+    keep, moved = [], []
+    for day, text in sections:
+        stale = (
+            ROTATE_MODE == "month"
+            and day is not None
+            and (day.year, day.month) != (today.year, today.month)
+        )
+        (moved if stale else keep).append((day, text))
+
+    if MAX_BYTES > 0:
+        size = len(preamble.encode()) + sum(len(text.encode()) for _, text in keep)
+        # Oldest first. Never archive today's section, which is the one being
+        # written to, or an undated one, which has no month to go to.
+        for index in range(len(keep) - 1, -1, -1):
+            if size <= MAX_BYTES:
+                break
+            day, text = keep[index]
+            if day is None or day == today:
+                continue
+            del keep[index]
+            moved.insert(0, (day, text))
+            size -= len(text.encode())
+        remember_size_limit_block(log_path, today, size > MAX_BYTES)
+
+    if not moved:
+        return 0
+    if clean_newest is not None and moved[0] == sections[0]:
+        moved[0] = (moved[0][0], clean_newest(moved[0][1]))
+
+    by_month = {}
+    for day, text in moved:
+        by_month.setdefault((day.year, day.month), []).append(text)
+
+    # Archives are written before the hot file is trimmed, so an interruption
+    # can only duplicate days, never lose them.
+    for (year, month), texts in by_month.items():
+        target = archive_path(log_path, datetime(year, month, 1))
+        target.parent.mkdir(parents=True, exist_ok=True)
+        existing = b""
+        if note_exists(target):
+            with open_note(target) as file:
+                existing = file.read()
+        replace_file(target, lambda file: file.write("".join(texts).encode() + existing))
+
+    remaining = preamble + "".join(text for _, text in keep)
+    replace_file(log_path, lambda file: file.write(remaining.encode()))
+    return len(moved)
+
+
+def read_head(file):
+    """
+    Read the preamble and the newest day section from the start of the log.
+
+    Today's header and the previous day's section are always the first section,
+    so reading stops at the start of the second day header (or at EOF) and the
+    rest of the log is never loaded.
+
+    Args:
+        file: A binary file object positioned at the start of the log.
+
+    Returns:
+        bytes: The head of the file, ending on a line boundary.
+    """
+    buffer = bytearray()
+    search_from = 0
+    seen_first = False
+    while True:
+        chunk = file.read(HEAD_CHUNK_BYTES)
+        buffer += chunk
+        for match in DAY_HEADER_BYTES_PATTERN.finditer(buffer, search_from):
+            if seen_first:
+                return bytes(buffer[: match.start()])
+            seen_first = True
+            search_from = match.end()
+        if not chunk:
+            return bytes(buffer)
+        # A header can straddle the chunk boundary, so rescan a little overlap.
+        search_from = max(search_from, len(buffer) - 256)
+
+
+def rewrite_head(log_path, rewrite):
+    """
+    Rewrite the head of the thought log and stream the untouched tail after it.
+
+    The log stays locked from reading the head until the new file is in place.
+    The new file is assembled in a temp file next to the log and swapped in, so
+    peak memory is bounded by the head no matter how large the log grows, and
+    a crash never leaves a half-written log behind.
+
+    Args:
+        log_path: Path to the thought log file. It may not exist yet.
+        rewrite: Called with the decoded head; returns the replacement head.
+
+    Returns:
+        str: The new head, for working out line numbers in the written file.
+    """
+    with locked(log_path):
+        try:
+            source = open_note(log_path)
+        except FileNotFoundError:
+            source = None
+
+        try:
+            head = read_head(source) if source else b""
+            new_head = rewrite(head.decode()).encode()
+
+            def write(destination):
+                destination.write(new_head)
+                if source:
+                    copy_range(source, destination, len(head))
+
+            written = replace_file(log_path, write)
+        finally:
+            if source:
+                source.close()
+
+    note_trace.count_bytes(read=written - len(new_head) + len(head), written=written)
+    return new_head.decode()
+
+
+def header_at_or_after(data, position, end):
+    """
+    Find the first valid day header starting in data[position:end].
+
+    Only the bytes between the probe and that header are examined, by jumping
+    between "---" lines with find() and checking the line before each one.
+
+    Returns:
+        tuple: (start, end, date) of the header, or None if there is none.
+    """
+    search_from = max(position - 1, 0)
+    # A header starting just before `end` has its "---" line just after it.
+    limit = min(len(data), end + HEADER_LINE_BYTES)
+    while True:
+        dashes = data.find(b"\n---", search_from, limit)
+        if dashes < 0:
+            return None
+        line_start = data.rfind(b"\n", 0, dashes) + 1
+        if line_start >= end:
+            return None
+        search_from = dashes + 1
+        if line_start < position:
+            continue
+        match = DAY_HEADER_BYTES_PATTERN.match(data, line_start)
+        if match is None:
+            continue
+        day = parse_day(data[line_start:dashes].decode("ascii"))
+        if day is not None:
+            return line_start, match.end(), day
+
+
+def find_day_header(log_path, day):
+    """
+    Binary-search a newest-first log for a day's header without reading it all.
+
+    The file is memory-mapped and each probe only touches the pages between
+    the probe offset and the next header, so a lookup costs O(log n) probes.
+
+    Returns:
+        tuple: (offset, date) of the day's header. If the day has no section,
+        the newest older day is returned instead, or None if there is none.
+    """
+    import mmap
+
+    try:
+        file = open(log_path, "rb")
+    except FileNotFoundError:
+        return None
+
+    with file:
+        size = os.fstat(file.fileno()).st_size
+        if size == 0:
+            return None
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            low, high = 0, size
+            older = None
+            while low < high:
+                middle = (low + high) // 2
+                header = header_at_or_after(data, middle, high)
+                if header is None:
+                    high = middle
+                    continue
+                start, end, found = header
+                if found == day:
+                    return start, found
+                if found > day:
+                    low = end
+                else:
+                    older = (start, found)
+                    high = middle
+            return older
+
+
+def line_number_at(log_path, offset):
+    """
+    Return the 1-based line number of a byte offset.
+
+    Editors take line numbers, so this is the one step that reads everything
+    before the offset; it counts newlines in fixed-size chunks of the map.
+    """
+    import mmap
+
+    with open(log_path, "rb") as file:
+        if offset == 0:
+            return 1
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            newlines = 0
+            for chunk_start in range(0, offset, LINE_COUNT_CHUNK_BYTES):
+                chunk_end = min(chunk_start + LINE_COUNT_CHUNK_BYTES, offset)
+                newlines += data[chunk_start:chunk_end].count(b"\n")
+    return newlines + 1
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+
+# Required parameters:
+# @raycast.schemaVersion 1
+# @raycast.title todoist backfill
+# @raycast.mode fullOutput
+
+# Optional parameters:
+# @raycast.icon 🗄️
+# @raycast.argument1 { "type": "text", "placeholder": "first day already in Todoist | reset" }
+# @raycast.argument2 { "type": "text", "placeholder": "dry-run", "optional": true }
+
+# Documentation:
+# @raycast.description Sends completions from older daily notes' done sections to Todoist in bulk, resuming where it left off.
+# @raycast.author masonc789
+# @raycast.authorURL https://raycast.com/masonc789
+
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from itertools import islice
+
+import note_trace
+from daily_note import parse_completed_task, parse_daily_note_filename, parse_sections
+from note_analytics import note_paths
+from note_daemon import flush_daemon_writes
+from note_state import state_path
+from todoist_client import (
+    SYNC_COMMAND_LIMIT,
+    TodoistRateLimitError,
+    get_todoist_token,
+    send_sync_commands,
+)
+
+CHECKPOINT_FILE = "todoist-backfill.json"
+# Todoist allows about 1000 Sync requests per 15 minutes; stay under that.
+BACKFILL_RATE = float(os.environ.get("TODOIST_BACKFILL_RATE", "1"))
+BACKFILL_BURST = 5
+# Each completion is an item_add plus an item_complete.
+BATCH_SIZE = SYNC_COMMAND_LIMIT // 2
+# Command uuids are derived from each line, so a replayed batch is ignored by Todoist.
+UUID_NAMESPACE = uuid.UUID("5b0c6e3e-7d0a-4f43-9d55-2f1c2a8e9b71")
+
+
+class TokenBucket:
+    """
+    Allows `rate` requests per second on average, in bursts of up to `capacity`.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def wait(self):
+        """
+        Block until a request may be sent, then spend a token on it.
+        """
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            time.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """
+        Wait as long as Todoist asked, starting again with an empty bucket.
+        """
+        time.sleep(seconds)
+        self.tokens = 0
+        self.updated = time.monotonic()
+
+
+def parse_cutoff(text: str):
+    """
+    Parse a date typed as M-DD-YY (like the note names) or YYYY-MM-DD.
+
+    Returns:
+        date: The parsed date, or None if the text is not a date.
+    """
+    for date_format in ("%m-%d-%y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(text, date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+def done_lines(before, after=None, retry=frozenset()):
+    """
+    Stream the timestamped done lines of every note dated before a day,
+    oldest note first, reading one note at a time.
+
+    Args:
+        before (date): Notes from this day on are left alone.
+        after (tuple): A checkpointed (note day ISO, line index); lines up to
+            and including it are skipped.
+        retry (set): Positions up to the checkpoint that failed before and
+            are streamed again.
+
+    Yields:
+        tuple: ((note day ISO, line index), task name, completion datetime)
+    """
+    retry_days = {day for day, _ in retry}
+    notes = []
+    for path in note_paths():
+        day = parse_daily_note_filename(os.path.basename(path))
+        if day < before:
+            notes.append((day, path))
+
+    for day, path in sorted(notes):
+        day_key = day.isoformat()
+        if after is not None and day_key < after[0] and day_key not in retry_days:
+            continue
+        with open(path, "rb") as file:
+            data = file.read()
+        done = parse_sections(data).get("done")
+        if done is None:
+            continue
+        lines = data.splitlines()
+        for index in range(done.start_line, done.end_line):
+            position = (day_key, index)
+            if after is not None and position <= after and position not in retry:
+                continue
+            parsed = parse_completed_task(lines[index].decode("utf-8", errors="replace"))
+            if parsed is not None:
+                yield (position, *parsed)
+
+
+def backfill_commands(position, task_name: str, completed_at):
+    """
+    Return the Sync item_add/item_complete pair for one done line.
+
+    The task is due on the day it was completed and is completed at the
+    line's own timestamp, not at the time of the backfill.
+    """
+    key = f"{position[0]}:{position[1]}:{task_name}"
+    temp_id = str(uuid.uuid5(UUID_NAMESPACE, f"{key}:temp"))
+    return [
+        {
+            "type": "item_add",
+            "temp_id": temp_id,
+            "uuid": str(uuid.uuid5(UUID_NAMESPACE, f"{key}:add")),
+            "args": {"content": task_name, "due": {"date": completed_at.date().isoformat()}},
+        },
+        {
+            "type": "item_complete",
+            "uuid": str(uuid.uuid5(UUID_NAMESPACE, f"{key}:complete")),
+            "args": {
+                "id": temp_id,
+                "date_completed": completed_at.astimezone(timezone.utc).strftime(
+                    "%Y-%m-%dT%H:%M:%SZ"
+                ),
+            },
+        },
+    ]
+
+
+def load_checkpoint():
+    """
+    Return the saved progress, or an empty checkpoint.
+    """
+    try:
+        with open(state_path(CHECKPOINT_FILE), "r") as file:
+            checkpoint = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    return checkpoint if isinstance(checkpoint, dict) else {}
+
+
+def save_checkpoint(checkpoint):
+    """
+    Persist progress after a batch is answered: the last position read, the
+    positions Todoist turned down, and how many completions it accepted.
+    """
+    path = state_path(CHECKPOINT_FILE)
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}")
+    with open(temp_path, "w") as file:
+        json.dump(checkpoint, file)
+    os.replace(temp_path, path)
+
+
+def send_batch(commands, token: str, bucket: TokenBucket):
+    """
+    Send one batch, waiting out HTTP 429 responses for as long as Todoist asks.
+
+    Returns:
+        dict: Each command's sync_status, by uuid.
+    """
+    while True:
+        bucket.wait()
+        try:
+            return send_sync_commands(commands, token)
+        except TodoistRateLimitError as error:
+            print(f"Rate limited; waiting {error.retry_after:.0f}s.")
+            bucket.pause(error.retry_after)
+
+
+if __name__ == "__main__":
+    note_trace.start(__file__)
+    # Show progress as it happens, even when stdout is a pipe.
+    sys.stdout.reconfigure(line_buffering=True)
+    words = " ".join(sys.argv[1:]).split()
+    if words == ["reset"]:
+        try:
+            os.unlink(state_path(CHECKPOINT_FILE))
+        except FileNotFoundError:
+            pass
+        print("Backfill progress cleared.")
+        sys.exit(0)
+    before = parse_cutoff(words[0]) if words else None
+    dry_run = words[1:] == ["dry-run"]
+    if before is None or not (len(words) == 1 or dry_run):
+        print("Usage: <first day already in Todoist> [dry-run] | reset")
+        sys.exit(1)
+
+    # Notes are read from disk below, so buffered edits go out first.
+    flush_daemon_writes()
+    checkpoint = load_checkpoint()
+    after = tuple(checkpoint["position"]) if checkpoint.get("position") else None
+    failed = {tuple(position) for position in checkpoint.get("failed") or []}
+    lines = done_lines(before, after, failed)
+    if after is not None:
+        print(f"Resuming after {after[0]} line {after[1] + 1}.")
+    if failed:
+        print(f"Retrying {len(failed)} completion(s) Todoist turned down before.")
+
+    if dry_run:
+        days, count = set(), 0
+        for position, _, _ in lines:
+            days.add(position[0])
+            count += 1
+        print(f"Would send {count} completion(s) from {len(days)} note(s).")
+        sys.exit(0)
+
+    token = get_todoist_token()
+    bucket = TokenBucket(BACKFILL_RATE, BACKFILL_BURST)
+    sent, requests, failures = 0, 0, []
+    with note_trace.phase("todoist"):
+        while True:
+            batch = list(islice(lines, BATCH_SIZE))
+            if not batch:
+                break
+            commands = [
+                command for line in batch for command in backfill_commands(*line)
+            ]
+            try:
+                status = send_batch(commands, token, bucket)
+            except Exception as error:
+                # Nothing past the checkpoint counts as sent; the batch is
+                # replayed with the same uuids next time.
+                print(f"Stopped: {error}")
+                print(f"Sent {sent} completion(s) this run; run again to resume.")
+                sys.exit(1)
+            requests += 1
+
+            for index, (position, task_name, _) in enumerate(batch):
+                failed.discard(position)
+                for command in commands[2 * index : 2 * index + 2]:
+                    outcome = status.get(command["uuid"])
+                    if outcome != "ok":
+                        failed.add(position)
+                        failures.append(
+                            f"{position[0]} line {position[1] + 1} '{task_name}': "
+                            f"{command['type']} {outcome}"
+                        )
+                        break
+                else:
+                    sent += 1
+            # A batch of retries alone can end before the checkpoint.
+            after = max(after, batch[-1][0]) if after is not None else batch[-1][0]
+            save_checkpoint(
+                {
+                    "position": list(after),
+                    "failed": sorted(list(position) for position in failed),
+                    "sent": checkpoint.get("sent", 0) + sent,
+                }
+            )
+    note_trace.note(sent=sent, failed=len(failures), requests=requests)
+
+    print(f"Sent {sent} completion(s) in {requests} request(s).")
+    if failures:
+        print(f"Todoist turned down {len(failures)}; they are retried on the next run:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
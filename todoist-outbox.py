@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+# Required parameters:
+# @raycast.schemaVersion 1
+# @raycast.title todoist outbox
+# @raycast.mode fullOutput
+
+# Optional parameters:
+# @raycast.icon 📤
+# @raycast.argument1 { "type": "text", "placeholder": "flush | drop <id>", "optional": true }
+
+# Documentation:
+# @raycast.description Lists, flushes or drops completions queued for Todoist.
+# @raycast.author masonc789
+# @raycast.authorURL https://raycast.com/masonc789
+
+from note_daemon import forward_to_daemon
+
+if __name__ == "__main__":
+    forward_to_daemon(__file__)
+
+import sys
+
+import note_trace
+from todoist_client import (
+    finish_completions,
+    flush_outbox,
+    get_todoist_token,
+    pending_completions,
+)
+
+
+def print_pending(entries):
+    """
+    Print one line per queued completion.
+
+    Args:
+        entries (list): Pending outbox entries.
+    """
+    if not entries:
+        print("Todoist outbox is empty.")
+        return
+    for entry in entries:
+        # Sent through Sync with no answer; only a Sync replay may record it.
+        marker = "  (sent, unconfirmed)" if entry.get("sync_in_doubt") else ""
+        print(f"{entry['id'][:8]}  {entry['queued_at']}  {entry['content']}{marker}")
+    print(f"{len(entries)} completion(s) queued.")
+
+
+if __name__ == "__main__":
+    note_trace.start(__file__)
+    words = " ".join(sys.argv[1:]).split()
+    command = words[0].lower() if words else "list"
+
+    if command == "list":
+        print_pending(pending_completions())
+    elif command == "flush":
+        try:
+            with note_trace.phase("todoist"):
+                recorded_ids, errors = flush_outbox(get_todoist_token())
+        except Exception as error:
+            print(f"Flush failed: {error}")
+            sys.exit(1)
+        print(f"Recorded {len(recorded_ids)} completion(s) in Todoist.")
+        for error in errors:
+            print(error)
+        print_pending(pending_completions())
+    elif command == "drop" and len(words) == 2:
+        matches = [entry for entry in pending_completions() if entry["id"].startswith(words[1])]
+        if len(matches) != 1:
+            print(f"Expected one queued completion matching '{words[1]}', found {len(matches)}.")
+            sys.exit(1)
+        finish_completions(matches, "dropped")
+        print(f"Dropped '{matches[0]['content']}' from the Todoist outbox.")
+    else:
+        print("Usage: [list] | flush | drop <id>")
+        sys.exit(1)
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+
+# Required parameters:
+# @raycast.schemaVersion 1
+# @raycast.title todoist reconcile
+# @raycast.mode fullOutput
+
+# Optional parameters:
+# @raycast.icon 🔁
+# @raycast.argument1 { "type": "text", "placeholder": "repair", "optional": true }
+
+# Documentation:
+# @raycast.description Compares today's done section with the tasks Todoist recorded as completed, and optionally repairs both.
+# @raycast.author masonc789
+# @raycast.authorURL https://raycast.com/masonc789
+
+from note_daemon import forward_to_daemon
+
+if __name__ == "__main__":
+    forward_to_daemon(__file__)
+
+import sys
+from collections import Counter
+from datetime import date, datetime
+
+import note_trace
+from daily_note import (
+    Edit,
+    apply_edits,
+    format_completed_task,
+    get_daily_note_path,
+    index_sections,
+    parse_completed_task,
+    read_section_lines,
+)
+from note_files import locked, note_size
+from todoist_client import (
+    get_todoist_token,
+    log_completed_tasks_to_todoist,
+    pending_completions,
+    sync_completed_snapshot,
+)
+
+
+def done_section_tasks(note_path: str):
+    """
+    Return the timestamped completions in the note's 'done' section.
+
+    Args:
+        note_path (str): The path to the daily note file.
+
+    Returns:
+        list: (task name, completion datetime) tuples in file order.
+
+    Raises:
+        ValueError: If the 'done' section is not found in the daily note file.
+    """
+    done_section = index_sections(note_path).get("done")
+    if done_section is None:
+        raise ValueError("Could not find 'done' section in daily note.")
+    tasks = []
+    for _, _, line in read_section_lines(note_path, done_section):
+        parsed = parse_completed_task(line)
+        if parsed is not None:
+            tasks.append(parsed)
+    return tasks
+
+
+def diff_completions(note_tasks, todoist_tasks):
+    """
+    Match completions by task name, counting repeats, in both directions.
+
+    Args:
+        note_tasks (list): (name, datetime) tuples from the done section.
+        todoist_tasks (list): (name, datetime) tuples recorded by Todoist.
+
+    Returns:
+        tuple: (note completions missing from Todoist, Todoist completions
+        missing from the note), each a list of (name, datetime) tuples.
+    """
+    def unmatched(tasks, others):
+        spare = Counter(name for name, _ in others)
+        missing = []
+        for name, completed_at in tasks:
+            if spare[name]:
+                spare[name] -= 1
+            else:
+                missing.append((name, completed_at))
+        return missing
+
+    return unmatched(note_tasks, todoist_tasks), unmatched(todoist_tasks, note_tasks)
+
+
+def print_tasks(title: str, tasks):
+    """
+    Print a titled list of completions with their times.
+    """
+    print(f"{title} ({len(tasks)}):")
+    for name, completed_at in tasks:
+        print(f"  {completed_at:%-I:%M %p}  {name}")
+
+
+if __name__ == "__main__":
+    note_trace.start(__file__)
+    argument = " ".join(sys.argv[1:]).strip().lower()
+    if argument not in ("", "repair"):
+        print("Usage: [repair]")
+        sys.exit(1)
+
+    note_path = get_daily_note_path()
+    try:
+        with note_trace.phase("parse"):
+            note_tasks = done_section_tasks(note_path)
+    except (ValueError, FileNotFoundError) as e:
+        print(e)
+        sys.exit(1)
+
+    try:
+        with note_trace.phase("todoist"):
+            completed, transferred = sync_completed_snapshot(
+                get_todoist_token(), date.today()
+            )
+    except Exception as error:
+        print(f"Could not read Todoist: {error}")
+        sys.exit(1)
+    note_trace.note(transferred=transferred)
+    todoist_tasks = sorted(
+        (
+            (entry["content"], datetime.fromisoformat(entry["completed_at"]))
+            for entry in completed.values()
+        ),
+        key=lambda task: task[1],
+    )
+
+    missing_from_todoist, missing_from_note = diff_completions(note_tasks, todoist_tasks)
+    # Completions still in the outbox are on their way, not missing.
+    queued = Counter(entry["content"] for entry in pending_completions())
+    in_outbox, still_missing = [], []
+    for name, completed_at in missing_from_todoist:
+        if queued[name]:
+            queued[name] -= 1
+            in_outbox.append((name, completed_at))
+        else:
+            still_missing.append((name, completed_at))
+
+    print(
+        f"Done section: {len(note_tasks)}; Todoist: {len(todoist_tasks)} "
+        f"({transferred} change(s) fetched)."
+    )
+    if not (still_missing or missing_from_note or in_outbox):
+        print("Everything matches.")
+        sys.exit(0)
+    if in_outbox:
+        print_tasks("Queued in the Todoist outbox", in_outbox)
+    if still_missing:
+        print_tasks("Missing from Todoist", still_missing)
+    if missing_from_note:
+        print_tasks("Missing from the done section", missing_from_note)
+
+    if argument != "repair":
+        sys.exit(0)
+
+    if missing_from_note:
+        text = "".join(
+            format_completed_task(name, completed_at)
+            for name, completed_at in missing_from_note
+        )
+        with note_trace.phase("rewrite"), locked(note_path):
+            end_of_file = note_size(note_path)
+            apply_edits(note_path, [Edit(end_of_file, end_of_file, text)])
+        print(f"Added {len(missing_from_note)} completion(s) to the done section.")
+    if still_missing:
+        try:
+            with note_trace.phase("todoist"):
+                log_completed_tasks_to_todoist([name for name, _ in still_missing])
+        except Exception as error:
+            print(f"Todoist failed: {error}")
+            sys.exit(1)
+        print(f"Logged {len(still_missing)} completion(s) in Todoist.")
@@ -0,0 +1,1103 @@
+"""
+Todoist logging shared by the task scripts.
+
+Completions are written to a local append-only outbox before any network call,
+then drained in as few Sync requests as possible. Anything that cannot be sent
+stays queued and goes out with the next flush, so completions are never lost
+while offline.
+
+Every read-modify-write of the outbox holds its lock, so a completion queued
+by another command while the outbox is being compacted is never lost.
+
+Every Sync attempt is logged in the outbox before it is sent. If it is not
+known to have failed cleanly, the completion is "in doubt": Todoist may
+already have applied it. Such a completion is only ever replayed through
+Sync, whose command uuids let Todoist ignore the repeat. It never goes
+through REST or `td`, which would create a second task.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, time as day_time, timedelta, timezone
+from urllib.parse import urlencode, urlsplit
+
+import note_trace
+from note_files import locked
+from note_state import state_path
+
+TODOIST_API = os.environ.get("TODOIST_API_URL", "https://api.todoist.com/api/v1")
+TD_BINARIES = ("td", "/opt/homebrew/bin/td", "/usr/local/bin/td")
+HTTP_TIMEOUT = 10
+OUTBOX_FILE = "todoist-outbox.jsonl"
+TOKEN_CACHE_FILE = "todoist-token.json"
+STATUS_FILE = "todoist-status.json"
+BREAKER_FILE = "todoist-breaker.json"
+SNAPSHOT_FILE = "todoist-completed.json"
+
+
+def number_from_environment(name: str, default):
+    """
+    Read a number from the environment, falling back to the default when the
+    variable is unset or malformed.
+    """
+    try:
+        return type(default)(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+# One budget shared by every attempt (token lookup, Sync, REST, td) per delivery.
+DELIVERY_DEADLINE = number_from_environment("TODOIST_DEADLINE", 15.0)
+# A path is skipped for BREAKER_COOLDOWN seconds after this many failures in a row.
+BREAKER_THRESHOLD = 3
+BREAKER_COOLDOWN = 5 * 60
+DELIVERY_ORDER = ("sync", "rest", "td")
+TOKEN_CACHE_TTL = number_from_environment("TODOIST_TOKEN_TTL", 7 * 24 * 60 * 60)
+# Todoist accepts at most 100 commands per Sync request; each completion is an
+# item_add plus an item_close.
+SYNC_COMMAND_LIMIT = 100
+# Seconds to wait after HTTP 429 when Todoist doesn't say how long.
+RATE_LIMIT_WAIT = 60
+
+# Keep-alive connections shared by every request this process makes, keyed by
+# (scheme, host). The note daemon keeps them open between commands too.
+_connections = {}
+
+
+class TodoistUnsentError(RuntimeError):
+    """
+    Raised when a request certainly had no effect: it never reached Todoist,
+    or Todoist turned it away with a 4xx status.
+    """
+
+
+class TodoistAuthError(TodoistUnsentError):
+    """
+    Raised when Todoist rejects the token with HTTP 401.
+    """
+
+
+class TodoistRateLimitError(TodoistUnsentError):
+    """
+    Raised when Todoist answers HTTP 429; retry_after is the wait it asked for
+    in seconds.
+    """
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TodoistRejectedError(TodoistUnsentError):
+    """
+    Raised when Todoist turns a request away with any other 4xx status; body
+    is the full response body.
+    """
+
+    def __init__(self, message: str, status: int, body: str):
+        super().__init__(message)
+        self.status = status
+        self.body = body
+
+
+class TodoistTokenError(RuntimeError):
+    """
+    Raised when no Todoist token can be found.
+    """
+
+
+def time_left(deadline):
+    """
+    Return the timeout for the next attempt, capped at HTTP_TIMEOUT.
+
+    Raises:
+        RuntimeError: If the deadline has already passed.
+    """
+    if deadline is None:
+        return HTTP_TIMEOUT
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise RuntimeError("deadline exceeded")
+    return min(HTTP_TIMEOUT, left)
+
+
+def find_td():
+    """
+    Return an absolute path to the `td` CLI, or None if it is not installed.
+    """
+    for candidate in TD_BINARIES:
+        if os.path.isabs(candidate) and os.path.isfile(candidate) and os.access(candidate, os.X_OK):
+            return candidate
+        import shutil
+
+        found = shutil.which(candidate)
+        if found:
+            return found
+    return None
+
+
+def get_todoist_token(deadline=None):
+    """
+    Resolve a Todoist API token without embedding one in this public script.
+
+    Prefer the process environment (Raycast inherits launchd env). Fall back to
+    `td auth token view`, which reads the OS credential store. A token from
+    `td` is cached so the CLI only runs again once the cache expires or the
+    API rejects the token.
+    """
+    token = token_from_environment()
+    if token:
+        return token
+
+    token = read_cached_token()
+    if token:
+        return token
+
+    with note_trace.phase("todoist_token_td"):
+        return fetch_token_from_td(deadline)
+
+
+def token_from_environment():
+    """
+    Return the token set in TODOIST_API_TOKEN or TODOIST_API_KEY, or None.
+    """
+    for key in ("TODOIST_API_TOKEN", "TODOIST_API_KEY"):
+        token = os.environ.get(key, "").strip()
+        if token:
+            return token
+    return None
+
+
+def fetch_token_from_td(deadline=None):
+    """
+    Ask `td` for the token and cache it.
+    """
+
+    td = find_td()
+    if not td:
+        raise TodoistTokenError("no TODOIST_API_TOKEN and td is not on PATH")
+
+    try:
+        result = subprocess.run(
+            [td, "--no-spinner", "auth", "token", "view"],
+            capture_output=True,
+            text=True,
+            timeout=time_left(deadline),
+        )
+    except subprocess.TimeoutExpired as error:
+        raise TodoistTokenError("td auth token view timed out") from error
+    token = (result.stdout or "").strip()
+    if result.returncode != 0 or not token:
+        detail = (result.stderr or result.stdout or "td auth token view failed").strip()
+        raise TodoistTokenError(detail)
+
+    try:
+        write_cached_token(token)
+    except OSError:
+        pass  # The cache is only an optimization.
+    return token
+
+
+def read_cached_token():
+    """
+    Return the cached `td` token, or None if there is none or it has expired.
+    """
+    try:
+        with open(state_path(TOKEN_CACHE_FILE), "r") as file:
+            cached = json.load(file)
+        if time.time() - cached["fetched_at"] < TOKEN_CACHE_TTL:
+            return cached["token"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+def write_cached_token(token: str):
+    """
+    Cache a token in a file only the current user can read.
+    """
+    path = state_path(TOKEN_CACHE_FILE)
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}")
+    descriptor = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(descriptor, "w") as file:
+        json.dump({"token": token, "fetched_at": time.time()}, file)
+    os.replace(temp_path, path)
+
+
+def forget_cached_token():
+    """
+    Remove the cached token so the next lookup asks `td` again.
+    """
+    try:
+        os.unlink(state_path(TOKEN_CACHE_FILE))
+    except FileNotFoundError:
+        pass
+
+
+def get_connection(scheme: str, host: str):
+    """
+    Return the pooled connection for a host, creating it if needed.
+    """
+    import http.client
+
+    connection = _connections.get((scheme, host))
+    if connection is None:
+        if scheme == "https":
+            connection = http.client.HTTPSConnection(host, timeout=HTTP_TIMEOUT)
+        else:
+            connection = http.client.HTTPConnection(host, timeout=HTTP_TIMEOUT)
+        _connections[(scheme, host)] = connection
+    return connection
+
+
+def drop_connection(scheme: str, host: str):
+    """
+    Close and forget a pooled connection so the next request reconnects.
+    """
+    connection = _connections.pop((scheme, host), None)
+    if connection is not None:
+        connection.close()
+
+
+def socket_closed(sock):
+    """
+    Return True if an idle keep-alive socket has been closed by the server.
+
+    An idle socket has nothing to read until the server hangs up, so a
+    readable one is at EOF or was reset.
+    """
+    import select
+
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+    except (OSError, ValueError):
+        return True
+    return bool(readable)
+
+
+def todoist_request(
+    method, url, token, payload=None, form=None, deadline=None, replayable=False
+):
+    """
+    Send an authenticated request to the Todoist API and return parsed JSON or None.
+
+    Requests reuse a keep-alive connection. A reused socket the server has
+    already closed is replaced before sending. If a reused socket still turns
+    out to be dead, the request is sent once more on a fresh connection, but
+    only when it never fully went out, or when it is a GET or `replayable`.
+    Pass `replayable` only for requests Todoist deduplicates, such as Sync
+    commands with fixed uuids; resending a REST POST could create a second
+    task.
+
+    Raises:
+        TodoistUnsentError: If the request failed before it was fully sent or
+            was rejected with a 4xx status, so it cannot have taken effect.
+        RuntimeError: If the outcome is unknown, such as a timeout waiting for
+            the response or a 5xx status.
+    """
+    import http.client
+
+    headers = {"Authorization": f"Bearer {token}"}
+    data = None
+    if form is not None:
+        headers["Content-Type"] = "application/x-www-form-urlencoded"
+        data = urlencode(form).encode()
+    elif payload is not None:
+        headers["Content-Type"] = "application/json"
+        data = json.dumps(payload).encode()
+
+    parts = urlsplit(url)
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+    while True:
+        connection = get_connection(parts.scheme, parts.netloc)
+        if connection.sock is not None and socket_closed(connection.sock):
+            drop_connection(parts.scheme, parts.netloc)
+            connection = get_connection(parts.scheme, parts.netloc)
+        reused = connection.sock is not None
+        connection.timeout = time_left(deadline)
+        if reused:
+            connection.sock.settimeout(connection.timeout)
+        # Todoist only acts on a request once all of it has arrived, so a
+        # failure while sending is a clean failure.
+        sent = False
+        try:
+            connection.request(method, path, body=data, headers=headers)
+            sent = True
+            response = connection.getresponse()
+            body = response.read()
+        except (
+            http.client.RemoteDisconnected,
+            http.client.CannotSendRequest,
+            BrokenPipeError,
+            ConnectionResetError,
+        ) as error:
+            drop_connection(parts.scheme, parts.netloc)
+            if reused and (not sent or replayable or method == "GET"):
+                continue  # Stale keep-alive socket; reconnect once.
+            error_type = RuntimeError if sent else TodoistUnsentError
+            raise error_type(f"network error: {error}") from error
+        except (OSError, http.client.HTTPException) as error:
+            drop_connection(parts.scheme, parts.netloc)
+            error_type = RuntimeError if sent else TodoistUnsentError
+            raise error_type(f"network error: {error}") from error
+        break
+
+    if response.status >= 400:
+        detail = body.decode("utf-8", errors="replace")[:200].strip()
+        if response.status == 401:
+            if token == read_cached_token():
+                forget_cached_token()
+            raise TodoistAuthError(f"HTTP 401 {detail}".strip())
+        if response.status == 429:
+            try:
+                retry_after = max(float(response.getheader("Retry-After", "")), 0)
+            except ValueError:
+                retry_after = RATE_LIMIT_WAIT
+            raise TodoistRateLimitError(f"HTTP 429 {detail}".strip(), retry_after)
+        message = f"HTTP {response.status} {detail}".strip()
+        if response.status < 500:
+            raise TodoistRejectedError(
+                message, response.status, body.decode("utf-8", errors="replace")
+            )
+        raise RuntimeError(message)
+
+    if not body:
+        return None
+    return json.loads(body.decode())
+
+
+def read_outbox():
+    """
+    Return every outbox record in the order it was written.
+
+    A line cut short by a crash mid-append is skipped rather than failing the
+    whole queue.
+    """
+    try:
+        with open(state_path(OUTBOX_FILE), "r") as file:
+            lines = file.readlines()
+    except FileNotFoundError:
+        return []
+
+    records = []
+    for line in lines:
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            continue
+    return records
+
+
+def append_outbox(records):
+    """
+    Append records to the outbox in a single write, holding the outbox lock.
+    """
+    data = "".join(json.dumps(record) + "\n" for record in records)
+    path = state_path(OUTBOX_FILE)
+    with locked(path), open(path, "a") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def compact_outbox():
+    """
+    Atomically rewrite the outbox with only the records of pending completions.
+
+    The caller holds the outbox lock, so nothing is appended meanwhile.
+    """
+    pending_ids = {entry["id"] for entry in pending_completions()}
+    data = "".join(
+        json.dumps(record) + "\n"
+        for record in read_outbox()
+        if record.get("id") in pending_ids
+    )
+    path = state_path(OUTBOX_FILE)
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}")
+    with open(temp_path, "w") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+
+def pending_completions():
+    """
+    Return queued completions that have been neither recorded nor dropped.
+
+    Each entry's "sync_in_doubt" is True if a Sync request carrying it may
+    have been applied: it was sent and never cleanly failed.
+    """
+    queued, finished, sync_attempts = {}, set(), {}
+    for record in read_outbox():
+        op = record.get("op")
+        if op == "queue":
+            queued[record["id"]] = record
+        elif op in ("recorded", "dropped"):
+            finished.add(record["id"])
+        elif op == "sync_sent":
+            sync_attempts[record["id"]] = sync_attempts.get(record["id"], 0) + 1
+        elif op == "sync_unsent":
+            sync_attempts[record["id"]] = sync_attempts.get(record["id"], 0) - 1
+    return [
+        {**entry, "sync_in_doubt": sync_attempts.get(entry_id, 0) > 0}
+        for entry_id, entry in queued.items()
+        if entry_id not in finished
+    ]
+
+
+def enqueue_completion(task_name: str):
+    """
+    Durably queue a completed task before any attempt to send it.
+
+    Returns:
+        dict: The queued entry.
+    """
+    return enqueue_completions([task_name])[0]
+
+
+def enqueue_completions(task_names):
+    """
+    Durably queue several completed tasks, in order, with one write.
+
+    The Sync uuids and temp_id are generated once here and reused on every
+    send, so replaying an entry never creates a second task.
+
+    Returns:
+        list: The queued entries.
+    """
+    now = datetime.now()
+    entries = [
+        {
+            "op": "queue",
+            "id": str(uuid.uuid4()),
+            "content": task_name,
+            "due": now.date().isoformat(),
+            "queued_at": now.isoformat(timespec="seconds"),
+            "temp_id": str(uuid.uuid4()),
+            "add_uuid": str(uuid.uuid4()),
+            "close_uuid": str(uuid.uuid4()),
+        }
+        for task_name in task_names
+    ]
+    append_outbox(entries)
+    return entries
+
+
+def finish_completions(entries, op: str, **details):
+    """
+    Mark entries as recorded or dropped, then drop their records from the outbox.
+    """
+    if not entries:
+        return
+    with locked(state_path(OUTBOX_FILE)):
+        append_outbox([{"op": op, "id": entry["id"], **details} for entry in entries])
+        compact_outbox()
+
+
+def completion_commands(entry):
+    """
+    Return the Sync item_add/item_close command pair for a queued entry.
+    """
+    return [
+        {
+            "type": "item_add",
+            "temp_id": entry["temp_id"],
+            "uuid": entry["add_uuid"],
+            "args": {
+                "content": entry["content"],
+                "due": {"date": entry["due"]},
+            },
+        },
+        {
+            "type": "item_close",
+            "uuid": entry["close_uuid"],
+            "args": {"id": entry["temp_id"]},
+        },
+    ]
+
+
+def log_completed_via_sync(entries, token: str, deadline=None):
+    """
+    Create and close every entry's task in one Sync request.
+
+    The attempt is logged in the outbox before it is sent. It is marked as
+    cleanly failed only when Todoist certainly did not apply it, so a crash
+    or timeout mid-request leaves the entries in doubt.
+
+    Returns:
+        tuple: (entries recorded, list of per-entry error strings)
+
+    Raises:
+        RuntimeError: If the request itself fails.
+    """
+    commands = [command for entry in entries for command in completion_commands(entry)]
+    append_outbox([{"op": "sync_sent", "id": entry["id"]} for entry in entries])
+    try:
+        result = todoist_request(
+            "POST",
+            f"{TODOIST_API}/sync",
+            token,
+            form={"commands": json.dumps(commands)},
+            deadline=deadline,
+            replayable=True,
+        )
+    except TodoistUnsentError:
+        append_outbox([{"op": "sync_unsent", "id": entry["id"]} for entry in entries])
+        raise
+    if not isinstance(result, dict):
+        raise RuntimeError("empty Sync response")
+
+    status = result.get("sync_status") or {}
+    temp_id_mapping = result.get("temp_id_mapping") or {}
+    recorded, rejected, errors = [], [], []
+    for entry in entries:
+        add_status = status.get(entry["add_uuid"])
+        close_status = status.get(entry["close_uuid"])
+        if add_status != "ok":
+            if isinstance(add_status, dict):
+                rejected.append(entry)  # An error object: the task was never created.
+            errors.append(f"item_add failed: {add_status}")
+            continue
+        if close_status != "ok":
+            task_id = temp_id_mapping.get(entry["temp_id"])
+            if not task_id:
+                errors.append(f"item_close failed: {close_status}")
+                continue
+            try:
+                close_completed_task(task_id, token, deadline)
+            except Exception as error:
+                errors.append(f"close: {error}")
+                continue
+        recorded.append(entry)
+    if rejected:
+        append_outbox([{"op": "sync_unsent", "id": entry["id"]} for entry in rejected])
+    return recorded, errors
+
+
+def close_completed_task(task_id: str, token: str, deadline=None):
+    """
+    Close an existing Todoist task by id.
+    """
+    todoist_request("POST", f"{TODOIST_API}/tasks/{task_id}/close", token, deadline=deadline)
+
+
+def log_completed_via_rest(entry, token: str, deadline=None):
+    """
+    Create a task due on the completion day, then close it, using REST.
+    """
+    created = todoist_request(
+        "POST",
+        f"{TODOIST_API}/tasks",
+        token,
+        payload={"content": entry["content"], "due_date": entry["due"]},
+        deadline=deadline,
+    )
+    if not isinstance(created, dict) or not created.get("id"):
+        raise RuntimeError("create task returned no id")
+    close_completed_task(created["id"], token, deadline)
+
+
+def log_completed_via_td(entry, deadline=None):
+    """
+    Create a task due on the completion day and complete it with the official `td` CLI.
+    """
+    td = find_td()
+    if not td:
+        raise RuntimeError("td is not installed")
+
+    add = subprocess.run(
+        [td, "--no-spinner", "task", "add", entry["content"], "--due", entry["due"], "--json"],
+        capture_output=True,
+        text=True,
+        timeout=time_left(deadline),
+    )
+    if add.returncode != 0:
+        detail = (add.stderr or add.stdout or "td task add failed").strip()
+        raise RuntimeError(detail)
+
+    try:
+        created = json.loads(add.stdout)
+        task_id = created.get("id")
+    except json.JSONDecodeError as error:
+        raise RuntimeError("td task add returned non-JSON") from error
+    if not task_id:
+        raise RuntimeError("td task add returned no id")
+
+    complete = subprocess.run(
+        [td, "--no-spinner", "task", "complete", f"id:{task_id}"],
+        capture_output=True,
+        text=True,
+        timeout=time_left(deadline),
+    )
+    if complete.returncode != 0:
+        detail = (complete.stderr or complete.stdout or "td task complete failed").strip()
+        raise RuntimeError(detail)
+
+
+def flush_outbox(token: str, deadline=None):
+    """
+    Drain every pending completion through Sync, packing as many as fit per request.
+
+    Returns:
+        tuple: (ids of entries recorded, list of error strings)
+
+    Raises:
+        RuntimeError: If a Sync request fails; earlier batches stay recorded.
+    """
+    pending = pending_completions()
+    batch_size = SYNC_COMMAND_LIMIT // 2
+    recorded_ids, errors = set(), []
+    for start in range(0, len(pending), batch_size):
+        recorded, batch_errors = log_completed_via_sync(
+            pending[start : start + batch_size], token, deadline
+        )
+        finish_completions(recorded, "recorded", via="sync")
+        recorded_ids.update(entry["id"] for entry in recorded)
+        errors.extend(batch_errors)
+    return recorded_ids, errors
+
+
+def log_completed_task_to_todoist(task_name: str):
+    """
+    Record the task as completed today in Todoist.
+
+    The task is queued in the outbox first, then delivered right away.
+
+    Raises:
+        RuntimeError: If every path failed; the task stays queued for retry.
+    """
+    log_completed_tasks_to_todoist([task_name])
+
+
+def log_completed_tasks_to_todoist(task_names):
+    """
+    Record several tasks as completed today, in one Sync request when it works.
+
+    Raises:
+        RuntimeError: If any task could not be recorded; it stays queued for retry.
+    """
+    deliver_completions(enqueue_completions(task_names))
+
+
+def deliver_in_background(entries):
+    """
+    Hand the delivery of already queued entries to one detached worker process.
+
+    The worker records its outcome in the status file and posts a
+    notification if delivery fails.
+    """
+    subprocess.Popen(
+        [
+            sys.executable,
+            os.path.abspath(__file__),
+            "deliver",
+            *(entry["id"] for entry in entries),
+        ],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def warm_up_delivery():
+    """
+    Resolve the token and open the API connection ahead of a delivery, so
+    neither has to wait once the completions are queued.
+
+    Raises:
+        Exception: Whatever the lookup or connection raised; the delivery
+            itself tries again.
+    """
+    get_todoist_token(time.monotonic() + DELIVERY_DEADLINE)
+    parts = urlsplit(TODOIST_API)
+    connection = get_connection(parts.scheme, parts.netloc)
+    if connection.sock is None:
+        try:
+            connection.connect()
+        except OSError:
+            drop_connection(parts.scheme, parts.netloc)
+            raise
+
+
+def deliver_via_sync(entries, deadline):
+    """
+    Flush the whole outbox through Sync and check that these entries went out.
+    """
+    token = get_todoist_token(deadline)
+    try:
+        recorded_ids, errors = flush_outbox(token, deadline)
+    except TodoistAuthError:
+        if token_from_environment():
+            raise  # Looking it up again would return the same token.
+        # The cached `td` token went stale; resolve a fresh one and retry once.
+        recorded_ids, errors = flush_outbox(get_todoist_token(deadline), deadline)
+    if any(entry["id"] not in recorded_ids for entry in entries):
+        raise RuntimeError("; ".join(errors) or "not recorded")
+
+
+def deliver_via_rest(entries, deadline):
+    """
+    Record these entries one at a time through REST.
+    """
+    token = get_todoist_token(deadline)
+    for entry in entries:
+        log_completed_via_rest(entry, token, deadline)
+        finish_completions([entry], "recorded", via="rest")
+
+
+def deliver_via_td(entries, deadline):
+    """
+    Record these entries one at a time through the `td` CLI.
+    """
+    for entry in entries:
+        log_completed_via_td(entry, deadline)
+        finish_completions([entry], "recorded", via="td")
+
+
+DELIVERY_METHODS = {
+    "sync": deliver_via_sync,
+    "rest": deliver_via_rest,
+    "td": deliver_via_td,
+}
+
+
+def load_breaker():
+    """
+    Return the persisted per-path failure counts, cool-downs and latencies.
+    """
+    try:
+        with open(state_path(BREAKER_FILE), "r") as file:
+            breaker = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    return breaker if isinstance(breaker, dict) else {}
+
+
+def save_breaker(breaker):
+    """
+    Persist the circuit breaker state.
+    """
+    path = state_path(BREAKER_FILE)
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}")
+    with open(temp_path, "w") as file:
+        json.dump(breaker, file)
+    os.replace(temp_path, path)
+
+
+def delivery_order(breaker):
+    """
+    Order the delivery paths fastest-first by their recent successful latency.
+
+    Paths without a recorded success keep their default place after the
+    measured ones, so Sync, then REST, then `td` until something is known.
+    """
+    def key(method):
+        latency = breaker.get(method, {}).get("latency")
+        return (latency is None, latency or 0, DELIVERY_ORDER.index(method))
+
+    return sorted(DELIVERY_ORDER, key=key)
+
+
+def record_attempt(breaker, method: str, elapsed, ok: bool):
+    """
+    Update one path's breaker state after an attempt.
+    """
+    state = breaker.setdefault(method, {})
+    if ok:
+        previous = state.get("latency")
+        state["latency"] = elapsed if previous is None else 0.7 * previous + 0.3 * elapsed
+        state["failures"] = 0
+        state["open_until"] = 0
+    else:
+        state["failures"] = state.get("failures", 0) + 1
+        if state["failures"] >= BREAKER_THRESHOLD:
+            state["open_until"] = time.time() + BREAKER_COOLDOWN
+
+
+def deliver_completions(entries):
+    """
+    Make sure these entries are recorded in Todoist within one shared deadline.
+
+    Tries Sync (which also flushes the rest of the outbox), REST and `td`,
+    fastest path first, skipping any path whose circuit breaker is open
+    after repeated recent failures. Each later path only gets the entries
+    that are still queued, and REST and `td` only get those that no Sync
+    request may already have recorded. Token comes from the environment or
+    `td`.
+
+    Raises:
+        RuntimeError: If every path failed; unrecorded entries stay queued.
+    """
+    deadline = time.monotonic() + DELIVERY_DEADLINE
+    breaker = load_breaker()
+    errors = []
+
+    def still_pending():
+        pending = {item["id"]: item for item in pending_completions()}
+        return [pending[entry["id"]] for entry in entries if entry["id"] in pending]
+
+    try:
+        for method in delivery_order(breaker):
+            if breaker.get(method, {}).get("open_until", 0) > time.time():
+                errors.append(f"{method}: skipped after repeated failures")
+                continue
+            if deadline <= time.monotonic():
+                errors.append(f"{method}: deadline exceeded")
+                continue
+            remaining = still_pending()
+            if not remaining:
+                return  # An earlier partial attempt recorded the rest.
+            if method != "sync":
+                # Only a Sync replay is deduplicated by Todoist.
+                remaining = [entry for entry in remaining if not entry["sync_in_doubt"]]
+                if not remaining:
+                    errors.append(f"{method}: skipped, Sync may have recorded them")
+                    continue
+
+            started = time.monotonic()
+            try:
+                with note_trace.phase(f"todoist_{method}"):
+                    DELIVERY_METHODS[method](remaining, deadline)
+            except TodoistTokenError as error:
+                errors.append(f"{method}: {error}")  # Not the path's fault.
+            except Exception as error:
+                record_attempt(breaker, method, time.monotonic() - started, False)
+                errors.append(f"{method}: {error}")
+            else:
+                record_attempt(breaker, method, time.monotonic() - started, True)
+                note_trace.note(todoist_path=method)
+    finally:
+        try:
+            save_breaker(breaker)
+        except OSError:
+            pass
+
+    if not still_pending():
+        return
+    raise RuntimeError("; ".join(errors) + "; queued for retry")
+
+
+def send_sync_commands(commands, token: str, deadline=None):
+    """
+    Send up to SYNC_COMMAND_LIMIT commands in one Sync request.
+
+    Returns:
+        dict: Each command's sync_status ("ok" or an error object), by uuid.
+    """
+    if len(commands) > SYNC_COMMAND_LIMIT:
+        raise ValueError(f"at most {SYNC_COMMAND_LIMIT} commands per Sync request")
+    result = todoist_request(
+        "POST",
+        f"{TODOIST_API}/sync",
+        token,
+        form={"commands": json.dumps(commands)},
+        deadline=deadline,
+        replayable=True,
+    )
+    if not isinstance(result, dict):
+        raise RuntimeError("empty Sync response")
+    return result.get("sync_status") or {}
+
+
+def fetch_item_changes(token: str, sync_token: str = "*", deadline=None):
+    """
+    Ask Sync for the tasks that changed since a sync_token.
+
+    Args:
+        token (str): The Todoist API token.
+        sync_token (str): The token from the previous call, or "*" for a full
+            sync of every active task.
+
+    Returns:
+        tuple: (changed task objects, the sync_token to send next time)
+    """
+    result = todoist_request(
+        "POST",
+        f"{TODOIST_API}/sync",
+        token,
+        form={"sync_token": sync_token, "resource_types": json.dumps(["items"])},
+        deadline=deadline,
+        replayable=True,  # A read; it changes nothing.
+    )
+    if not isinstance(result, dict) or not result.get("sync_token"):
+        raise RuntimeError("Sync returned no sync_token")
+    return result.get("items") or [], result["sync_token"]
+
+
+def fetch_completed_on(token: str, day, deadline=None):
+    """
+    Return every task completed on a local calendar day, following pagination.
+    """
+    since, until = (
+        datetime.combine(moment, day_time.min).astimezone(timezone.utc)
+        for moment in (day, day + timedelta(days=1))
+    )
+    items, cursor = [], None
+    while True:
+        query = {
+            "since": since.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "until": until.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "limit": 200,
+        }
+        if cursor:
+            query["cursor"] = cursor
+        result = todoist_request(
+            "GET",
+            f"{TODOIST_API}/tasks/completed/by_completion_date?{urlencode(query)}",
+            token,
+            deadline=deadline,
+        )
+        if not isinstance(result, dict):
+            raise RuntimeError("empty completed tasks response")
+        items.extend(result.get("items") or [])
+        cursor = result.get("next_cursor")
+        if not cursor:
+            return items
+
+
+def local_completion_time(item):
+    """
+    Return when a task was completed, as a naive local datetime, or None if
+    it is not completed.
+    """
+    completed_at = item.get("completed_at")
+    if not completed_at or item.get("checked") is False:
+        return None
+    stamp = datetime.fromisoformat(completed_at.replace("Z", "+00:00"))
+    if stamp.tzinfo is not None:
+        stamp = stamp.astimezone().replace(tzinfo=None)
+    return stamp
+
+
+def load_completed_snapshot():
+    """
+    Return the stored sync_token and completed-task snapshot, or an empty one.
+    """
+    try:
+        with open(state_path(SNAPSHOT_FILE), "r") as file:
+            snapshot = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    return snapshot if isinstance(snapshot, dict) else {}
+
+
+def save_completed_snapshot(snapshot):
+    """
+    Persist the sync_token and completed-task snapshot.
+    """
+    path = state_path(SNAPSHOT_FILE)
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}")
+    with open(temp_path, "w") as file:
+        json.dump(snapshot, file)
+    os.replace(temp_path, path)
+
+
+def sync_completed_snapshot(token: str, day, deadline=None):
+    """
+    Bring the local snapshot of a day's completed tasks up to date.
+
+    The first run takes a sync_token from a full Sync and reads the day's
+    completions once. The same happens if Todoist stops accepting the stored
+    token. Every other run asks Sync only for tasks changed since the token.
+
+    Args:
+        token (str): The Todoist API token.
+        day (date): The local day whose completions are kept.
+
+    Returns:
+        tuple: ({task id: {"content", "completed_at"}}, number of changed
+        tasks transferred)
+    """
+    snapshot = load_completed_snapshot()
+    sync_token = snapshot.get("sync_token")
+    completed = snapshot.get("completed") or {}
+    changes = None
+    if sync_token:
+        try:
+            changes, sync_token = fetch_item_changes(token, sync_token, deadline)
+        except TodoistRejectedError as error:
+            # Only a stored sync_token Todoist no longer accepts is worth a full
+            # resync; throttling and network errors would only make it worse.
+            if error.status != 400 or "sync_token" not in error.body:
+                raise
+    if changes is None:
+        # Take the token first, so completions made meanwhile arrive as changes.
+        _, sync_token = fetch_item_changes(token, "*", deadline)
+        changes = fetch_completed_on(token, day, deadline)
+        completed = {}
+
+    for item in changes:
+        task_id = str(item.get("id") or item.get("task_id"))
+        completed_at = local_completion_time(item)
+        if item.get("is_deleted") or completed_at is None:
+            completed.pop(task_id, None)
+        else:
+            completed[task_id] = {
+                "content": item.get("content", ""),
+                "completed_at": completed_at.isoformat(timespec="minutes"),
+            }
+    completed = {
+        task_id: entry
+        for task_id, entry in completed.items()
+        if entry["completed_at"][:10] == day.isoformat()
+    }
+    save_completed_snapshot({"sync_token": sync_token, "completed": completed})
+    return completed, len(changes)
+
+
+def write_status(entries, error):
+    """
+    Record the outcome of a background delivery for later inspection.
+    """
+    status = {
+        "ids": [entry["id"] for entry in entries],
+        "content": "; ".join(entry["content"] for entry in entries),
+        "ok": error is None,
+        "error": None if error is None else str(error),
+        "finished_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    path = state_path(STATUS_FILE)
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}")
+    with open(temp_path, "w") as file:
+        json.dump(status, file)
+    os.replace(temp_path, path)
+
+
+def notify(title: str, message: str):
+    """
+    Post a macOS notification, ignoring platforms without osascript.
+    """
+    script = f"display notification {json.dumps(message)} with title {json.dumps(title)}"
+    try:
+        subprocess.run(["osascript", "-e", script], capture_output=True, timeout=HTTP_TIMEOUT)
+    except (OSError, subprocess.SubprocessError):
+        pass
+
+
+def run_delivery_worker(entry_ids):
+    """
+    Deliver queued entries in a detached worker and report how it went.
+    """
+    entries = [item for item in pending_completions() if item["id"] in entry_ids]
+    if not entries:
+        return  # Already delivered by another flush.
+
+    try:
+        deliver_completions(entries)
+    except Exception as error:
+        write_status(entries, error)
+        names = ", ".join(f"'{entry['content']}'" for entry in entries)
+        notify("Todoist failed", f"{names}: {error}")
+    else:
+        write_status(entries, None)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 3 and sys.argv[1] == "deliver":
+        run_delivery_worker(sys.argv[2:])